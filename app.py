@@ -1,8 +1,11 @@
 """Aplicação web FastAPI para exportação de tarefas Bitrix24."""
+import asyncio
+import hmac
 import logging
+from contextlib import asynccontextmanager, nullcontext
 from typing import Optional
 from fastapi import FastAPI, Request, Form, HTTPException, status
-from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
@@ -12,14 +15,28 @@ import os
 from auth import authenticate_user, require_auth, get_current_user_from_session
 from users_config import get_user, get_allowed_departments_for_user, USERS
 from web_services import (
-    export_tasks_to_excel_bytes,
-    get_available_departments,
+    export_tasks_to_file,
+    export_tasks_streaming,
     filter_departments_by_user_access,
-    filter_collaborator_names_by_user_access,
+    collaborator_names_for_user,
+    search_collaborator_names_for_user,
+    iter_file_chunks,
 )
-from excel_handler import read_collaborators_sheet
+from collaborators_registry import get_collaborators_snapshot
+from bitrix_client import BitrixClient
+from bitrix_directory import get_bitrix_directory
 from date_filters import get_date_range_for_preset, PRESET_OPTIONS
-from config import COLLABORATORS_SHEET_PATH, FALLBACK_DEPARTMENTS
+from export_writers import EXPORT_FORMATS, get_export_writer
+from export_stats import ExportStats, activate, finish_export_stats, finish_streamed_export, stream_with_stats
+from export_profiling import export_profiler
+from config import (
+    COLLABORATORS_SHEET_PATH,
+    EVENT_LOOP_MONITOR_INTERVAL,
+    FALLBACK_DEPARTMENTS,
+    METRICS_ENABLED,
+    METRICS_TOKEN,
+)
+from metrics import monitor_event_loop, render_metrics
 import excel_handler as _excel_handler
 
 # Configurar logging
@@ -32,11 +49,25 @@ logger = logging.getLogger(__name__)
 # Sessão: no Render, SESSION_SECRET pode vir vazia; getenv("X", default) devolve "" e não o default — isso quebra o SessionMiddleware (500 no /dashboard).
 _SESSION_SECRET = (os.getenv("SESSION_SECRET") or "").strip() or "change-this-secret-key-in-production"
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Medição do atraso do event loop (métrica event_loop_lag_seconds) enquanto o servidor estiver no ar."""
+    monitor = None
+    if EVENT_LOOP_MONITOR_INTERVAL > 0:
+        monitor = asyncio.create_task(monitor_event_loop(EVENT_LOOP_MONITOR_INTERVAL))
+    try:
+        yield
+    finally:
+        if monitor is not None:
+            monitor.cancel()
+
+
 # Inicializar FastAPI com middleware de sessão
 middleware = [
     Middleware(SessionMiddleware, secret_key=_SESSION_SECRET)
 ]
-app = FastAPI(title="Bitrix24 Exporter", version="1.0.0", middleware=middleware)
+app = FastAPI(title="Bitrix24 Exporter", version="1.0.0", middleware=middleware, lifespan=lifespan)
 
 # Log de diagnóstico: confirma qual módulo de Excel está carregado (inclui "Data de Conclusão", "Data do lançamento", etc.)
 logger.info(
@@ -104,26 +135,51 @@ async def logout(request: Request):
     return RedirectResponse(url="/login", status_code=302)
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint(request: Request):
+    """Métricas do processo no formato texto do Prometheus (sem sessão; exige METRICS_TOKEN, sem ele fica desligado)."""
+    if not METRICS_ENABLED or not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not hmac.compare_digest(
+        request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"
+    ):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de métricas inválido")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/api/collaborators")
 async def api_collaborators(request: Request):
     """Retorna a lista de nomes dos colaboradores que o usuário pode acessar (admin = todos, supervisor = só do seu departamento)."""
     user = require_auth(request)
     try:
-        collaborators_map = read_collaborators_sheet(COLLABORATORS_SHEET_PATH)
-        names = filter_collaborator_names_by_user_access(collaborators_map, user)
+        snapshot = get_collaborators_snapshot(COLLABORATORS_SHEET_PATH)
+        names = collaborator_names_for_user(snapshot, user)
         return {"names": names}
     except Exception as e:
         logger.error(f"Erro ao carregar colaboradores para API: {e}")
         return {"names": []}
 
 
+@app.get("/api/collaborators/search")
+async def api_collaborators_search(request: Request, q: str = "", limit: int = 20):
+    """Autocompletar de colaboradores: nomes que combinam com o texto digitado (respeita o acesso do usuário)."""
+    user = require_auth(request)
+    limit = max(1, min(limit, 100))
+    try:
+        snapshot = get_collaborators_snapshot(COLLABORATORS_SHEET_PATH)
+        return {"names": search_collaborator_names_for_user(snapshot, user, q, limit)}
+    except Exception as e:
+        logger.error(f"Erro na busca de colaboradores: {e}")
+        return {"names": []}
+
+
 @app.get("/api/departments")
 async def api_departments(request: Request):
     """Retorna a lista de departamentos para o dropdown (requer login)."""
     user = require_auth(request)
     try:
-        collaborators_map = read_collaborators_sheet(COLLABORATORS_SHEET_PATH)
-        all_departments = get_available_departments(collaborators_map)
+        snapshot = get_collaborators_snapshot(COLLABORATORS_SHEET_PATH)
+        all_departments = list(snapshot.departments)
         if not all_departments:
             depts_from_users = set(d.upper() for d in FALLBACK_DEPARTMENTS)
             for u in USERS.values():
@@ -137,6 +193,40 @@ async def api_departments(request: Request):
         return {"departments": []}
 
 
+@app.post("/api/directory/resolve")
+def api_directory_resolve(request: Request, ids: str = Form(...)):
+    """
+    Resolve IDs de usuários do Bitrix para nome/departamento (somente admin).
+
+    IDs fora da planilha e do diretório sincronizado são consultados em uma única chamada batch.
+    Campo "ids": lista separada por vírgulas ou espaços.
+    """
+    user = require_auth(request)
+    if user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso restrito a administradores")
+    directory = get_bitrix_directory()
+    if directory is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Diretório do Bitrix desabilitado (BITRIX_DIRECTORY_ENABLED=0)",
+        )
+    try:
+        user_ids = sorted({int(v) for v in ids.replace(",", " ").split()})
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="IDs devem ser números inteiros")
+
+    client = BitrixClient()
+    lookup_map = directory.merged_map(client, get_collaborators_snapshot(COLLABORATORS_SHEET_PATH).collaborators_map)
+    found = {uid: lookup_map[uid] for uid in user_ids if uid in lookup_map}
+    unseen = [uid for uid in user_ids if uid not in found]
+    if unseen:
+        found.update(directory.resolve_ids(client, unseen))
+    return {
+        "users": {str(uid): found[uid] for uid in user_ids if uid in found},
+        "unresolved": [uid for uid in user_ids if uid not in found],
+    }
+
+
 @app.get("/dashboard", response_class=HTMLResponse)
 async def dashboard(request: Request):
     """Dashboard principal."""
@@ -144,8 +234,8 @@ async def dashboard(request: Request):
     
     # Carregar departamentos e lista de colaboradores para o dropdown
     try:
-        collaborators_map = read_collaborators_sheet(COLLABORATORS_SHEET_PATH)
-        all_departments = get_available_departments(collaborators_map)
+        snapshot = get_collaborators_snapshot(COLLABORATORS_SHEET_PATH)
+        all_departments = list(snapshot.departments)
         if not all_departments:
             depts_from_users = set(d.upper() for d in FALLBACK_DEPARTMENTS)
             for u in USERS.values():
@@ -153,7 +243,7 @@ async def dashboard(request: Request):
                     depts_from_users.update(d.upper() for d in u.allowed_departments)
             all_departments = sorted(depts_from_users)
         available_departments = filter_departments_by_user_access(all_departments, user)
-        collaborator_names = filter_collaborator_names_by_user_access(collaborators_map, user)
+        collaborator_names = collaborator_names_for_user(snapshot, user)
     except Exception as e:
         logger.error(f"Erro ao carregar colaboradores/departamentos: {e}")
         collaborator_names = []
@@ -174,6 +264,7 @@ async def dashboard(request: Request):
             "is_admin": user.role == "admin",
             "all_collaborators_label": all_collaborators_label,
             "preset_options": PRESET_OPTIONS,
+            "export_formats": EXPORT_FORMATS,
         },
     )
 
@@ -201,6 +292,24 @@ def convert_datetime_local_to_iso8601(dt_str: Optional[str]) -> Optional[str]:
     return dt_str
 
 
+class ExportStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse de uma exportação em streaming que encerra as estatísticas quando a resposta
+    termina, inclusive se o cliente desconectar antes de o corpo ser lido (o gerador de
+    stream_with_stats nem chega a rodar, e exports_in_flight ficaria incrementado).
+    """
+
+    def __init__(self, stats: ExportStats, content, **kwargs):
+        super().__init__(content, **kwargs)
+        self.export_stats = stats
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            finish_streamed_export(self.export_stats)
+
+
 @app.post("/export")
 async def export_tasks(
     request: Request,
@@ -209,11 +318,19 @@ async def export_tasks(
     activity_preset: str = Form(None),
     activity_from: str = Form(None),
     activity_to: str = Form(None),
-    status_filter: str = Form(None)
+    status_filter: str = Form(None),
+    no_cache: str = Form(None),
+    export_format: str = Form("xlsx"),
+    profile: str = Form(None)
 ):
-    """Exporta tarefas para Excel."""
+    """Exporta tarefas (Excel por padrão; CSV e NDJSON são enviados em streaming)."""
     user = require_auth(request)
     
+    try:
+        writer = get_export_writer(export_format)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
     # Supervisores: sem filtro = restringir ao primeiro (e único) departamento permitido
     if user.role != "admin" and user.allowed_departments and not dept and not (user_substring or "").strip():
         dept = user.allowed_departments[0]
@@ -251,46 +368,78 @@ async def export_tasks(
     logger.info(f"  - Data Inicial (ACTIVITY_DATE): {activity_from_iso or 'Não especificada'}")
     logger.info(f"  - Data Final (ACTIVITY_DATE): {activity_to_iso or 'Não especificada'}")
     logger.info(f"  - Status: {status_filter or 'Todos'}")
+    logger.info(f"  - Formato: {writer.name}")
+    logger.info(f"  - Ignorar cache: {'Sim' if no_cache else 'Não'}")
+    if profile and user.role == "admin":
+        logger.info("  - Profile: Sim")
     logger.info("=" * 60)
     
+    export_kwargs = dict(
+        user=user,
+        dept=dept if dept else None,
+        user_substring=user_substring if user_substring else None,
+        activity_from=activity_from_iso,
+        activity_to=activity_to_iso,
+        status=status_filter if status_filter else None,
+        collaborators_file=COLLABORATORS_SHEET_PATH,
+        export_format=writer.name,
+        use_cache=not no_cache
+    )
+    
+    stats = ExportStats(user=user.username, format=writer.name)
+    # Profile (cProfile) pedido pelo formulário: só para administradores
+    profiler = export_profiler(stats.export_id, requested=bool(profile) and user.role == "admin")
     try:
-        # Exportar tarefas
-        excel_bytes, num_rows = export_tasks_to_excel_bytes(
-            user=user,
-            dept=dept if dept else None,
-            user_substring=user_substring if user_substring else None,
-            activity_from=activity_from_iso,
-            activity_to=activity_to_iso,
-            status=status_filter if status_filter else None,
-            collaborators_file=COLLABORATORS_SHEET_PATH
-        )
-        
         # Gerar nome do arquivo
         from datetime import datetime
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"Exportacao_Tarefas_{timestamp}.xlsx"
+        filename = f"Exportacao_Tarefas_{timestamp}.{writer.extension}"
+        headers = {"Content-Disposition": f"attachment; filename={filename}", "X-Export-Id": stats.export_id}
+        
+        if writer.streaming:
+            # CSV/NDJSON: linhas enviadas ao cliente à medida que são produzidas
+            # (as estatísticas só vão para o log, pois os headers saem antes das linhas)
+            with activate(stats), profiler or nullcontext():
+                chunks = export_tasks_streaming(**export_kwargs)
+            if profiler is not None:
+                chunks = profiler.wrap_stream(chunks)
+            logger.info(f"Usuário {user.username}: exportação {writer.name} em streaming iniciada ({stats.export_id})")
+            return ExportStreamingResponse(stats, stream_with_stats(stats, chunks), media_type=writer.media_type, headers=headers)
+        
+        # Exportar tarefas
+        with activate(stats):
+            with profiler or nullcontext():
+                export_file, num_rows = export_tasks_to_file(**export_kwargs)
+            if profiler is not None:
+                profiler.finish()
+        finish_export_stats(stats)
+        headers["X-Export-Stats"] = stats.header_value()
         
         logger.info(f"Usuário {user.username} exportou {num_rows} linhas")
         
-        # Se não houver linhas, ainda retornar o Excel (vazio mas com estrutura)
+        # Se não houver linhas, ainda retornar o arquivo (vazio mas com estrutura)
         if num_rows == 0:
             logger.warning(f"Exportação gerou 0 linhas. Filtros: dept={dept}, user={user_substring}, "
                          f"from={activity_from_iso}, to={activity_to_iso}, status={status_filter}")
         
         return StreamingResponse(
-            excel_bytes,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+            iter_file_chunks(export_file),
+            media_type=writer.media_type,
+            headers=headers
         )
         
     except Exception as e:
-        logger.error(f"Erro na exportação: {e}", exc_info=True)
+        stats.context["error"] = type(e).__name__
+        if profiler is not None:
+            with activate(stats):
+                profiler.finish()
+        finish_export_stats(stats)
+        logger.error(f"Erro na exportação {stats.export_id}: {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao exportar tarefas: {str(e)}"
         )
 
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8080)
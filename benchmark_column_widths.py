@@ -0,0 +1,62 @@
+"""Benchmark do cálculo de largura das colunas do Excel: método antigo x compute_column_widths.
+
+O método antigo converte todas as células para str (astype(str).map(len).max()) em todas as
+colunas. O atual usa larguras fixas para colunas de formato conhecido, comprimento vetorizado
+(.str.len()) e amostra com percentil em DataFrames grandes.
+
+Uso:
+    python benchmark_column_widths.py                # 200 mil linhas
+    python benchmark_column_widths.py --rows 500000
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmark_excel_memory import synthetic_rows
+from excel_handler import EXCEL_EXPORT_COLUMNS, compute_column_widths, _column_width
+
+
+def legacy_column_widths(df: pd.DataFrame) -> dict:
+    """Cálculo anterior (referência): converte todas as células em str."""
+    return {
+        col: _column_width(col, df[col].astype(str).map(len).max() if len(df) > 0 else 0)
+        for col in df.columns
+    }
+
+
+def _timed(func, df: pd.DataFrame, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do cálculo de largura das colunas")
+    parser.add_argument("--rows", type=int, default=200000, help="Número de linhas (padrão: 200000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições (usa o melhor tempo)")
+    args = parser.parse_args()
+
+    df = pd.DataFrame(list(synthetic_rows(args.rows)), columns=EXCEL_EXPORT_COLUMNS)
+
+    print("=" * 60)
+    print(f"BENCHMARK DE LARGURA DAS COLUNAS ({args.rows} linhas)")
+    print("=" * 60)
+    legacy_time, legacy = _timed(legacy_column_widths, df, args.repeat)
+    fast_time, fast = _timed(compute_column_widths, df, args.repeat)
+    print(f"antigo (astype(str).map(len)) : {legacy_time:8.3f}s")
+    print(f"atual (compute_column_widths) : {fast_time:8.3f}s  ({legacy_time / max(fast_time, 1e-9):.1f}x)")
+
+    diffs = {col: (legacy[col], fast[col]) for col in EXCEL_EXPORT_COLUMNS if legacy[col] != fast[col]}
+    if diffs:
+        print("\nColunas com largura diferente (antigo, atual):")
+        for col, (old, new) in diffs.items():
+            print(f"  {col}: {old} -> {new}")
+
+
+if __name__ == "__main__":
+    main()
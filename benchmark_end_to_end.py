@@ -0,0 +1,398 @@
+"""Benchmark ponta a ponta das exportações do CLI (main.py) contra um portal sintético local.
+
+Para cada escala, gera um portal sintético (synthetic_portal.py), serve-o com fake_bitrix_server.py
+neste processo e roda main.py de verdade (mesmos argumentos do CLI, arquivo gravado em disco) em um
+subprocesso por cenário, para que o pico de RSS de cada exportação seja independente.
+
+Cenários (cada um com e sem filtro de data de atividade):
+- dept: um departamento (--dept GI)
+- user: um colaborador (--user, o que mais tem tarefas como responsável)
+- portal: todos os colaboradores da planilha
+
+Para cada exportação são registrados o tempo total e por etapa (as mesmas etapas de
+export_stats), as requisições HTTP ao Bitrix por método, o pico de RSS e o tamanho do arquivo.
+Os resultados são gravados em JSON (.cache/benchmarks/end_to_end_<data>.json) e comparados com
+uma execução anterior de mesma configuração: tempos, memória ou requisições que pioram além do
+limite (--threshold) são apontados como regressão e o script termina com código 1.
+
+Uso:
+    python benchmark_end_to_end.py                               # escalas small e medium
+    python benchmark_end_to_end.py --scales production --scenarios portal,portal_dated
+    python benchmark_end_to_end.py --latency 0.05 --repeat 3     # simula a latência do portal real
+    python benchmark_end_to_end.py --baseline .cache/benchmarks/end_to_end_20260101_120000.json
+    python benchmark_end_to_end.py --compare ANTIGO.json NOVO.json   # só compara dois resultados
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmark_excel_memory import _peak_rss_mb
+
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(_PROJECT_DIR, ".cache", "benchmarks")
+
+# Volume de cada escala (production = PRODUCTION_SCALE de synthetic_portal)
+SCALES = {
+    "small": {"users": 50, "tasks": 2000, "entries": 6000},
+    "medium": {"users": 200, "tasks": 10000, "entries": 60000},
+    "production": {"users": 500, "tasks": 50000, "entries": 300000},
+}
+DEFAULT_SCALES = ("small", "medium")
+
+# Departamento do cenário dept e janela do filtro de data (um trimestre do período do portal sintético)
+BENCH_DEPT = "GI"
+ACTIVE_FROM = "2025-04-01T00:00:00-03:00"
+ACTIVE_TO = "2025-06-30T23:59:59-03:00"
+SCENARIOS = ("dept", "dept_dated", "user", "user_dated", "portal", "portal_dated")
+
+# Métricas comparadas com a execução anterior e variação absoluta mínima para contar como regressão
+# (evita apontar ruído em cenários muito rápidos)
+REGRESSION_FLOORS = {"seconds": 0.5, "peak_rss_mb": 10.0, "http_calls": 1}
+STAGE_FLOOR_SECONDS = 0.5
+
+
+def pick_user_name(portal) -> str:
+    """
+    Nome do colaborador da planilha com mais tarefas como responsável, desde que o nome não seja
+    parte do nome de outro colaborador (o filtro --user é por substring).
+    """
+    from task_processor import _normalize_for_match
+
+    sheet = set(portal.sheet_users)
+    counts: Dict[int, int] = {}
+    for facts in portal.facts.values():
+        if facts.responsible_id in sheet:
+            counts[facts.responsible_id] = counts.get(facts.responsible_id, 0) + 1
+    names = [_normalize_for_match(portal.users[uid]["name"]) for uid in portal.sheet_users]
+    for uid in sorted(counts, key=lambda u: (-counts[u], u)):
+        name = portal.users[uid]["name"]
+        if sum(_normalize_for_match(name) in other for other in names) == 1:
+            return name
+    raise ValueError("Nenhum colaborador com nome único no portal sintético")
+
+
+def scenario_args(scenario: str, user_name: str) -> List[str]:
+    """Argumentos de main.py do cenário."""
+    kind, _, dated = scenario.partition("_")
+    args: List[str] = []
+    if kind == "dept":
+        args += ["--dept", BENCH_DEPT]
+    elif kind == "user":
+        args += ["--user", user_name]
+    if dated:
+        args += ["--active-from", ACTIVE_FROM, "--active-to", ACTIVE_TO]
+    return args
+
+
+def run_single(argv: List[str]) -> Dict[str, Any]:
+    """Roda main.py com argv no processo atual e devolve as estatísticas da exportação."""
+    import logging
+
+    import main as cli
+
+    records: List[Dict[str, Any]] = []
+
+    class _StatsHandler(logging.Handler):
+        def emit(self, record: logging.LogRecord) -> None:
+            stats = getattr(record, "export_stats", None)
+            if stats is not None:
+                records.append(stats)
+
+    logging.getLogger("export_stats").addHandler(_StatsHandler())
+    sys.argv = ["main.py", *argv]
+    cli.main()
+    if not records:
+        raise RuntimeError("A exportação terminou sem registrar estatísticas")
+    stats = records[-1]
+    output = argv[argv.index("--output") + 1]
+    return {
+        "seconds": stats["seconds"],
+        "rows": stats["rows"],
+        "stages": stats["stages"],
+        "http_calls": sum(stats["http_calls"].values()),
+        "http_calls_by_method": stats["http_calls"],
+        "batch_commands": stats["batch_commands"],
+        "http_errors": sum(stats["http_errors"].values()),
+        "bytes_received": stats["bytes_received"],
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "output_bytes": os.path.getsize(output),
+    }
+
+
+def _run_child(argv: List[str], env: Dict[str, str], log_path: str) -> Dict[str, Any]:
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single", json.dumps(argv)],
+            stdout=subprocess.PIPE,
+            stderr=log,
+            text=True,
+            cwd=_PROJECT_DIR,
+            env=env,
+        )
+    if proc.returncode != 0:
+        with open(log_path, encoding="utf-8", errors="replace") as log:
+            tail = log.read()[-800:]
+        raise RuntimeError(f"main.py terminou com código {proc.returncode}:\n{tail}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_scale(scale: str, scenarios: List[str], args: argparse.Namespace, work_dir: str) -> List[Dict[str, Any]]:
+    """Gera o portal da escala, sobe o servidor local e roda os cenários."""
+    from excel_handler import read_collaborators_sheet
+    from fake_bitrix_server import FakeBitrixServer
+    from synthetic_portal import generate_portal
+
+    volume = SCALES[scale]
+    portal = generate_portal(users=volume["users"], tasks=volume["tasks"], entries=volume["entries"], seed=args.seed)
+    sheet_path = os.path.join(work_dir, f"colaboradores_{scale}.xlsx")
+    portal.write_collaborators_sheet(sheet_path)
+    read_collaborators_sheet(sheet_path)  # grava a cópia compilada antes do primeiro cenário
+    user_name = pick_user_name(portal)
+    print(f"\n[{scale}] portal: {portal.summary()} | colaborador do cenário user: {user_name}")
+
+    results = []
+    server = FakeBitrixServer(
+        portal, latency=args.latency, command_latency=args.command_latency, seed=args.seed
+    )
+    with server:
+        env = dict(
+            os.environ,
+            BITRIX_WEBHOOK_BASE=server.webhook_base,
+            BITRIX_DIRECTORY_ENABLED="0",
+            BITRIX_RESPONSE_CACHE_ENABLED="0",
+            EXPORT_PROFILE="0",
+        )
+        for scenario in scenarios:
+            output = os.path.join(work_dir, f"{scale}_{scenario}.{args.format}")
+            argv = scenario_args(scenario, user_name) + [
+                "--input", sheet_path, "--output", output, "--format", args.format,
+            ]
+            runs = []
+            for _ in range(args.repeat):
+                try:
+                    runs.append(_run_child(argv, env, os.path.join(work_dir, f"{scale}_{scenario}.log")))
+                except RuntimeError as e:
+                    print(f"[ERRO] {scale}/{scenario}: {e}")
+                    # A falha fica no relatório: sem ela o cenário sumiria e a comparação não veria nada
+                    results.append({"scale": scale, "scenario": scenario, "args": scenario_args(scenario, user_name), "error": str(e)})
+                    runs = []
+                    break
+            if not runs:
+                continue
+            # Melhor tempo entre as repetições (menos afetado por ruído da máquina)
+            result = min(runs, key=lambda r: r["seconds"])
+            result = {"scale": scale, "scenario": scenario, "args": scenario_args(scenario, user_name), **result}
+            results.append(result)
+            print(_format_result(result))
+    return results
+
+
+def _format_result(result: Dict[str, Any]) -> str:
+    stages = " ".join(f"{name}={seconds:.2f}" for name, seconds in result["stages"].items())
+    return (
+        f"  {result['scenario']:13s} | {result['seconds']:7.2f}s | {result['rows']:7d} linhas | "
+        f"{result['http_calls']:6d} req | pico RSS {result['peak_rss_mb']:7.1f} MB | "
+        f"{result['output_bytes'] / 1024:8.0f} KB | {stages}"
+    )
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        proc = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=_PROJECT_DIR, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return proc.stdout.strip() or None
+
+
+def save_results(report: Dict[str, Any], path: str) -> None:
+    """Grava o relatório em JSON (escrita atômica)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def latest_baseline(results_dir: str, config: Dict[str, Any], exclude: Optional[str] = None) -> Optional[str]:
+    """Resultado mais recente em results_dir com a mesma configuração (escala, latência, formato, semente)."""
+    candidates = sorted(glob.glob(os.path.join(results_dir, "end_to_end_*.json")), reverse=True)
+    for path in candidates:
+        if exclude and os.path.abspath(path) == os.path.abspath(exclude):
+            continue
+        try:
+            if load_results(path).get("config") == config:
+                return path
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def _regressed(base: float, current: float, threshold: float, floor: float) -> bool:
+    return current > base * (1 + threshold) and current - base >= floor
+
+
+def compare_results(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float
+) -> Tuple[List[str], List[str]]:
+    """
+    Compara dois relatórios cenário a cenário.
+
+    Args:
+        baseline: Relatório de referência
+        current: Relatório novo
+        threshold: Piora relativa tolerada (ex: 0.2 = 20%)
+
+    Cenários que falharam no relatório novo, ou que estão na referência e faltam no novo, contam
+    como regressão.
+
+    Returns:
+        (regressões, melhorias), uma linha de texto por métrica
+    """
+    base_by_key = {(r["scale"], r["scenario"]): r for r in baseline.get("results", [])}
+    current_keys = {(r["scale"], r["scenario"]) for r in current.get("results", [])}
+    regressions: List[str] = [
+        f"{key[0]}/{key[1]}: ausente no resultado novo"
+        for key in base_by_key if key not in current_keys
+    ]
+    improvements: List[str] = []
+    for result in current.get("results", []):
+        key = (result["scale"], result["scenario"])
+        base = base_by_key.get(key)
+        label = f"{key[0]}/{key[1]}"
+        if "error" in result:
+            regressions.append(f"{label}: falhou ({result['error']})")
+            continue
+        if base is None:
+            continue
+        if "error" in base:
+            improvements.append(f"{label}: voltou a funcionar (falhou na referência)")
+            continue
+        checks = [(metric, base.get(metric), result.get(metric), floor) for metric, floor in REGRESSION_FLOORS.items()]
+        checks += [
+            (f"stage:{stage}", base.get("stages", {}).get(stage), seconds, STAGE_FLOOR_SECONDS)
+            for stage, seconds in result.get("stages", {}).items()
+        ]
+        for metric, old, new, floor in checks:
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            line = f"{label} {metric}: {old} -> {new} ({change:+.0%})"
+            if _regressed(old, new, threshold, floor):
+                regressions.append(line)
+            elif _regressed(new, old, threshold, floor):
+                improvements.append(line)
+        if base.get("rows") != result.get("rows"):
+            regressions.append(f"{label} rows: {base.get('rows')} -> {result.get('rows')} (resultado diferente)")
+    return regressions, improvements
+
+
+def report_comparison(baseline_path: str, baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> bool:
+    """Mostra a comparação; retorna True se houver regressão."""
+    regressions, improvements = compare_results(baseline, current, threshold)
+    print("\n" + "=" * 60)
+    print(f"COMPARAÇÃO COM {os.path.basename(baseline_path)} (commit {baseline.get('git_commit')}, limite {threshold:.0%})")
+    print("=" * 60)
+    for line in improvements:
+        print(f"  [melhora]   {line}")
+    for line in regressions:
+        print(f"  [REGRESSÃO] {line}")
+    if not regressions:
+        print("  Nenhuma regressão acima do limite.")
+    return bool(regressions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ponta a ponta das exportações contra um portal sintético")
+    parser.add_argument("--scales", default=",".join(DEFAULT_SCALES), help=f"Escalas separadas por vírgula ({', '.join(SCALES)})")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Cenários separados por vírgula ({', '.join(SCENARIOS)})")
+    parser.add_argument("--format", default="xlsx", help="Formato do arquivo exportado (padrão: xlsx)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Atraso por requisição do servidor local em segundos (padrão: 0)")
+    parser.add_argument("--command-latency", type=float, default=0.0, help="Atraso por comando dentro de batch (padrão: 0)")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do portal sintético (padrão: 0)")
+    parser.add_argument("--repeat", type=int, default=1, help="Repetições por cenário; vale o melhor tempo (padrão: 1)")
+    parser.add_argument("--results-dir", default=RESULTS_DIR, help="Pasta dos resultados JSON (padrão: .cache/benchmarks)")
+    parser.add_argument("--output", default=None, help="Arquivo JSON do resultado (padrão: <results-dir>/end_to_end_<data>.json)")
+    parser.add_argument("--baseline", default=None, help="Resultado de referência (padrão: o mais recente com a mesma configuração)")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Piora relativa tolerada antes de apontar regressão (padrão: 0.2)")
+    parser.add_argument("--compare", nargs=2, metavar=("REFERENCIA", "NOVO"), help="Apenas comparar dois resultados gravados")
+    parser.add_argument("--single", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        print(json.dumps(run_single(json.loads(args.single))))
+        return
+
+    if args.compare:
+        baseline_path, current_path = args.compare
+        regressed = report_comparison(baseline_path, load_results(baseline_path), load_results(current_path), args.threshold)
+        sys.exit(1 if regressed else 0)
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in SCALES] + [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"Escalas/cenários desconhecidos: {', '.join(unknown)}")
+
+    config = {
+        "scales": {s: SCALES[s] for s in scales},
+        "scenarios": scenarios,
+        "format": args.format,
+        "latency": args.latency,
+        "command_latency": args.command_latency,
+        "seed": args.seed,
+    }
+    print("=" * 60)
+    print(f"BENCHMARK PONTA A PONTA - EXPORTAÇÃO ({', '.join(scales)})")
+    print("=" * 60)
+
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="bench_e2e_") as work_dir:
+        for scale in scales:
+            results.extend(run_scale(scale, scenarios, args, work_dir))
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+    output = args.output or os.path.join(args.results_dir, f"end_to_end_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    save_results(report, output)
+    print(f"\nResultados gravados em {output}")
+    failed = [f"{r['scale']}/{r['scenario']}" for r in results if "error" in r]
+
+    baseline_path = args.baseline or latest_baseline(args.results_dir, config, exclude=output)
+    if baseline_path is None:
+        print("Nenhum resultado anterior com a mesma configuração para comparar.")
+        if failed:
+            print(f"[ERRO] Cenários com falha: {', '.join(failed)}")
+            sys.exit(1)
+        return
+    if report_comparison(baseline_path, load_results(baseline_path), report, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
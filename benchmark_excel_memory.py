@@ -0,0 +1,127 @@
+"""Benchmark de memória da escrita do Excel: modo DataFrame (openpyxl normal) x modo streaming.
+
+Cada modo roda em um subprocesso separado para que o pico de memória (RSS) de um não
+contamine o outro. As linhas são sintéticas, com o mesmo conjunto de colunas de
+EXCEL_EXPORT_COLUMNS e tamanhos de texto parecidos com os de uma exportação real.
+
+Uso:
+    python benchmark_excel_memory.py                 # 500 mil linhas, os dois modos
+    python benchmark_excel_memory.py --rows 100000 --mode streaming
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator
+
+
+def _peak_rss_mb() -> float:
+    """Pico de RSS do processo atual em MB (0 se indisponível, ex: Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def synthetic_rows(count: int) -> Iterator[Dict[str, Any]]:
+    """Gera linhas de exportação sintéticas (várias linhas por tarefa, como lançamentos de tempo)."""
+    for i in range(count):
+        task_id = 100000 - (i * 7919) % 90000  # fora de ordem, com repetições
+        yield {
+            "Task_ID": task_id,
+            "Título": f"Tarefa {task_id} - revisão de contrato e alinhamento com o cliente",
+            "Status": "Em andamento" if i % 3 else "Concluída",
+            "Data de Conclusão": "" if i % 3 else "28/04/2025 13:56",
+            "Deadline": "2025-05-10T18:00:00+03:00",
+            "Criada_Em": "01/04/2025 09:12",
+            "Responsável": f"Colaborador {i % 500}",
+            "Participantes": ", ".join(f"Colaborador {(i + k) % 500}" for k in range(1, 4)),
+            "Tempo_Estimado": "8h",
+            "Tempo_Total_Gasto": "5h 30min",
+            "Tempo_Lançamento": "1h 15min",
+            "Quem_Lançou": f"Colaborador {(i * 3) % 500}",
+            "Data do lançamento": "28/04/2025 13:56",
+            "Comentário_Lançamento": "Ajustes solicitados na reunião de acompanhamento semanal",
+            "Departamentos_Selecionados": "COMERCIAL, DTC",
+            "Atividade_em": "2025-04-28T13:56:00+03:00",
+        }
+
+
+def run_single(mode: str, rows: int, trace: bool = False) -> Dict[str, Any]:
+    """Executa um modo no processo atual e retorna as métricas."""
+    import logging
+    logging.disable(logging.WARNING)
+    from excel_handler import write_tasks_excel
+
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with tempfile.TemporaryFile() as output:
+        if mode == "dataframe":
+            write_tasks_excel(list(synthetic_rows(rows)), output, streaming=False)
+        else:
+            write_tasks_excel(synthetic_rows(rows), output, streaming=True)
+        size = output.tell()
+    elapsed = time.perf_counter() - start
+    traced_peak = 0
+    if trace:
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "mode": mode,
+        "rows": rows,
+        "seconds": round(elapsed, 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "peak_python_mb": round(traced_peak / (1024 * 1024), 1),
+        "output_mb": round(size / (1024 * 1024), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memória da escrita do Excel")
+    parser.add_argument("--rows", type=int, default=500000, help="Número de linhas (padrão: 500000)")
+    parser.add_argument("--mode", choices=["dataframe", "streaming", "all"], default="all")
+    parser.add_argument(
+        "--trace", action="store_true",
+        help="Medir também o pico de alocações Python (tracemalloc; deixa a execução bem mais lenta)"
+    )
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.mode, args.rows, args.trace)))
+        return
+
+    modes = ["dataframe", "streaming"] if args.mode == "all" else [args.mode]
+    print("=" * 60)
+    print(f"BENCHMARK DE MEMORIA - ESCRITA DO EXCEL ({args.rows} linhas)")
+    print("=" * 60)
+    for mode in modes:
+        cmd = [sys.executable, os.path.abspath(__file__), "--single", "--mode", mode, "--rows", str(args.rows)]
+        if args.trace:
+            cmd.append("--trace")
+        proc = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        if proc.returncode != 0:
+            print(f"[ERRO] modo {mode}: {proc.stderr.strip()[-500:]}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(
+            f"{mode:10s} | tempo: {result['seconds']:8.2f}s | pico RSS: {result['peak_rss_mb']:8.1f} MB | "
+            f"pico Python: {result['peak_python_mb']:8.1f} MB | arquivo: {result['output_mb']:6.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
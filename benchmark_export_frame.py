@@ -0,0 +1,61 @@
+"""Benchmark da montagem das linhas: combine_tasks_with_time_entries (linha a linha) x combine_tasks_frame (por coluna).
+
+Usa as mesmas tarefas e lançamentos sintéticos de benchmark_pipeline_memory, mede as duas
+montagens em blocos de --batch tarefas (como build_export_frame) e confere que as linhas são
+idênticas.
+
+Uso:
+    python benchmark_export_frame.py                  # ~200 mil linhas
+    python benchmark_export_frame.py --rows 50000 --batch 1000
+"""
+import argparse
+import logging
+import time
+
+from benchmark_pipeline_memory import synthetic_time_entries
+from benchmark_task_fields import _CannedClient, synthetic_tasks
+from config import EXPORT_FRAME_BATCH_TASKS
+from export_frame import combine_tasks_frame
+from task_processor import enrich_tasks
+from web_services import combine_tasks_with_time_entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da montagem das linhas da exportação")
+    parser.add_argument("--rows", type=int, default=200000, help="Número aproximado de linhas (padrão: 200000)")
+    parser.add_argument(
+        "--batch", type=int, default=EXPORT_FRAME_BATCH_TASKS,
+        help=f"Tarefas por montagem (padrão: EXPORT_FRAME_BATCH_TASKS={EXPORT_FRAME_BATCH_TASKS})"
+    )
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    import pandas as pd
+
+    tasks = synthetic_tasks(max(args.rows // 2, 1))
+    entries_map = synthetic_time_entries(tasks)
+    collaborators_map = {uid: {"name": f"Colaborador {uid}", "dept": f"DEPTO {uid % 7}"} for uid in range(1, 501)}
+    enriched = enrich_tasks(_CannedClient(tasks), [int(t["id"]) for t in tasks], [], collaborators_map)
+    batches = [enriched[i:i + args.batch] for i in range(0, len(enriched), args.batch)]
+
+    print("=" * 60)
+    print(f"MONTAGEM DAS LINHAS ({len(enriched)} tarefas, blocos de {args.batch})")
+    print("=" * 60)
+    start = time.perf_counter()
+    rows = [row for batch in batches for row in combine_tasks_with_time_entries(batch, entries_map, collaborators_map)]
+    rows_time = time.perf_counter() - start
+    print(f"  linha a linha : {rows_time:7.2f}s ({len(rows)} linhas)")
+
+    start = time.perf_counter()
+    frame = pd.concat([combine_tasks_frame(b, entries_map, collaborators_map) for b in batches], ignore_index=True)
+    frame_time = time.perf_counter() - start
+    print(f"  por coluna    : {frame_time:7.2f}s ({len(frame)} linhas)")
+    print(f"  ganho: {rows_time / max(frame_time, 1e-9):.1f}x")
+
+    mismatches = sum(1 for a, b in zip(rows, frame.to_dict("records")) if dict(a) != b)
+    mismatches += abs(len(rows) - len(frame))
+    print(f"  linhas diferentes: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
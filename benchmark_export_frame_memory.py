@@ -0,0 +1,132 @@
+"""Benchmark de memória do Excel com montagem por coluna (export_frame): lotes em streaming x DataFrame único.
+
+Usa as mesmas tarefas e lançamentos sintéticos de benchmark_export_frame, monta as linhas em lotes
+de --batch tarefas com combine_tasks_frame e grava o Excel com write_tasks_excel. Cada modo roda em
+um subprocesso separado (pico de RSS independente):
+
+- stream: cada lote vira tuplas e é descartado antes do próximo, como iter_export_frame_rows
+- concat: os lotes são concatenados num DataFrame com a exportação inteira antes da escrita
+  (o comportamento anterior de build_export_frame)
+
+O crescimento de memória é o pico alocado durante a montagem e a escrita (tracemalloc), sem contar
+tarefas e lançamentos, que os dois modos têm em memória. O script sai com código 1 se o modo stream
+crescer mais que o concat.
+
+Uso:
+    python benchmark_export_frame_memory.py                  # ~200 mil linhas, os dois modos
+    python benchmark_export_frame_memory.py --rows 50000 --batch 1000 --mode stream
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict
+
+from benchmark_excel_memory import _peak_rss_mb
+from benchmark_pipeline_memory import synthetic_time_entries
+from benchmark_task_fields import _CannedClient, synthetic_tasks
+from config import EXPORT_FRAME_BATCH_TASKS
+
+
+def run_single(mode: str, rows: int, batch: int) -> Dict[str, Any]:
+    """Executa um modo no processo atual e retorna as métricas."""
+    import logging
+    logging.disable(logging.WARNING)
+    import pandas as pd
+    from excel_handler import write_tasks_excel
+    from export_frame import combine_tasks_frame
+    from task_processor import enrich_tasks
+
+    tasks = synthetic_tasks(max(rows // 2, 1))
+    entries_map = synthetic_time_entries(tasks)
+    collaborators_map = {uid: {"name": f"Colaborador {uid}", "dept": f"DEPTO {uid % 7}"} for uid in range(1, 501)}
+    enriched = enrich_tasks(_CannedClient(tasks), [int(t["id"]) for t in tasks], [], collaborators_map)
+    del tasks
+    gc.collect()
+    # tracemalloc em vez de RSS: a memória liberada pela montagem das tarefas é reaproveitada na escrita
+    # e esconderia o crescimento
+    tracemalloc.start()
+
+    def _batches():
+        for i in range(0, len(enriched), batch):
+            yield combine_tasks_frame(enriched[i:i + batch], entries_map, collaborators_map)
+
+    def _streamed():
+        for frame in _batches():
+            yield from frame.itertuples(index=False, name=None)
+
+    start = time.perf_counter()
+    with tempfile.TemporaryFile() as output:
+        if mode == "stream":
+            write_tasks_excel(_streamed(), output)
+        else:
+            frame = pd.concat(list(_batches()), ignore_index=True)
+            write_tasks_excel(frame.itertuples(index=False, name=None), output)
+        output_bytes = output.tell()
+    elapsed = time.perf_counter() - start
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "mode": mode,
+        "tasks": len(enriched),
+        "seconds": round(elapsed, 2),
+        "output_bytes": output_bytes,
+        "growth_mb": round(traced_peak / (1024 * 1024), 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memória do Excel com montagem por coluna")
+    parser.add_argument("--rows", type=int, default=200000, help="Número aproximado de linhas (padrão: 200000)")
+    parser.add_argument(
+        "--batch", type=int, default=EXPORT_FRAME_BATCH_TASKS,
+        help=f"Tarefas por montagem (padrão: EXPORT_FRAME_BATCH_TASKS={EXPORT_FRAME_BATCH_TASKS})"
+    )
+    parser.add_argument("--mode", choices=["stream", "concat", "all"], default="all")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.mode, args.rows, args.batch)))
+        return
+
+    modes = ["concat", "stream"] if args.mode == "all" else [args.mode]
+    print("=" * 60)
+    print(f"BENCHMARK DE MEMORIA - EXCEL POR COLUNA (~{args.rows} linhas, lotes de {args.batch})")
+    print("=" * 60)
+    results = {}
+    for mode in modes:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single", "--mode", mode,
+             "--rows", str(args.rows), "--batch", str(args.batch)],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        if proc.returncode != 0:
+            print(f"[ERRO] modo {mode}: {proc.stderr.strip()[-500:]}")
+            sys.exit(1)
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results[mode] = result
+        print(
+            f"{mode:7s} | {result['tasks']} tarefas | tempo (com tracemalloc): {result['seconds']:6.2f}s | "
+            f"arquivo: {result['output_bytes'] / 1024:8.0f} KB | crescimento na escrita: {result['growth_mb']:7.1f} MB | "
+            f"pico RSS: {result['peak_rss_mb']:7.1f} MB"
+        )
+
+    if "stream" in results and "concat" in results:
+        if results["stream"]["growth_mb"] > results["concat"]["growth_mb"]:
+            print("FALHA: a montagem em lotes usou mais memória que o DataFrame único")
+            sys.exit(1)
+        print("OK: a montagem em lotes não acumula a exportação inteira")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,474 @@
+"""Teste de carga da aplicação web (app.py): vários usuários simultâneos em /dashboard, /api/collaborators e /export.
+
+Por padrão sobe tudo localmente: um portal sintético servido por fake_bitrix_server.py (com latência
+parecida com a do portal real) e o app.py no uvicorn, em um subprocesso, apontando para ele. Cada
+usuário virtual usa uma conta de USERS (users_config.py), com a sessão assinada com o mesmo
+SESSION_SECRET do app (não precisa das senhas), e repete uma mistura de requisições até o fim do
+teste. Também pode medir um app já no ar (--url), entrando com --login usuario:senha ou assinando
+a sessão com --session-secret.
+
+Relatório:
+- latência (p50/p90/p95/p99/máx), vazão e taxa de erro por endpoint;
+- sonda: GET / (só um redirecionamento) a cada 100 ms; se ela fica lenta, o event loop está bloqueado;
+- bloqueio do event loop medido dentro do servidor (métrica event_loop_lag_seconds de /metrics):
+  tempo total bloqueado, maior atraso e medições acima de 100 ms.
+
+O script termina com código 1 se a taxa de erro passar de --max-error-rate ou o maior atraso do
+event loop passar de --max-loop-lag (ex: um handler async que faz a exportação inteira sem liberar o loop).
+
+Uso:
+    python benchmark_load.py                                  # 10 usuários virtuais por 30 s
+    python benchmark_load.py --concurrency 25 --duration 60 --tasks 20000 --bitrix-latency 0.1
+    python benchmark_load.py --url https://meu-app.onrender.com --login juliana.paes:SENHA --concurrency 5
+    python benchmark_load.py --json .cache/benchmarks/load.json
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from base64 import b64encode
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from metrics import LOOP_LAG_BUCKETS
+
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Mistura de requisições de cada usuário virtual (peso relativo)
+ACTION_WEIGHTS = (("dashboard", 3), ("collaborators", 3), ("export", 1))
+# Filtro de data das exportações com data (datetime-local, como o formulário; período do portal sintético)
+EXPORT_FROM = "2025-04-01T00:00"
+EXPORT_TO = "2025-06-30T23:59"
+PROBE_INTERVAL = 0.1
+SLOW_LAG_SECONDS = 0.1
+
+
+def session_cookie(secret: str, username: str) -> str:
+    """Cookie de sessão do SessionMiddleware (Starlette) para um usuário de USERS, assinado com secret."""
+    import itsdangerous
+
+    from users_config import USERS
+
+    user = USERS[username]
+    data = {"username": user.username, "full_name": user.full_name, "role": user.role}
+    payload = b64encode(json.dumps(data).encode("utf-8"))
+    return itsdangerous.TimestampSigner(secret).sign(payload).decode("utf-8")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    # Nearest-rank
+    index = min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+
+class LocalStack:
+    """Portal sintético + fake_bitrix_server + app.py (uvicorn em subprocesso) numa porta livre."""
+
+    def __init__(self, args: argparse.Namespace, work_dir: str):
+        self.args = args
+        self.work_dir = work_dir
+        self.session_secret = secrets.token_hex(16)
+        self.metrics_token = secrets.token_hex(16)
+        self.base_url = ""
+        self.departments: List[str] = []
+        self._server = None
+        self._process: Optional[subprocess.Popen] = None
+        self._log = None
+
+    def start(self) -> "LocalStack":
+        from fake_bitrix_server import FakeBitrixServer
+        from synthetic_portal import generate_portal
+
+        args = self.args
+        portal = generate_portal(users=args.portal_users, tasks=args.tasks, seed=args.seed)
+        sheet_path = os.path.join(self.work_dir, "Planilha de colaboradores.xlsx")
+        portal.write_collaborators_sheet(sheet_path)
+        self.departments = sorted({info["dept"].upper() for info in portal.collaborators_map().values()})
+        self._server = FakeBitrixServer(portal, latency=args.bitrix_latency, seed=args.seed).start()
+
+        port = _free_port()
+        self.base_url = f"http://127.0.0.1:{port}"
+        env = dict(
+            os.environ,
+            BITRIX_WEBHOOK_BASE=self._server.webhook_base,
+            COLABORADORES_PLANILHA=sheet_path,
+            SESSION_SECRET=self.session_secret,
+            BITRIX_DIRECTORY_ENABLED="0",
+            EXPORT_CACHE_DIR=os.path.join(self.work_dir, "exports"),
+            BITRIX_RESPONSE_CACHE_PATH=os.path.join(self.work_dir, "bitrix_responses.sqlite3"),
+            EXPORT_PROFILE="0",
+            METRICS_ENABLED="1",
+            METRICS_TOKEN=self.metrics_token,
+        )
+        self._log = open(os.path.join(self.work_dir, "app.log"), "w", encoding="utf-8")
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=_PROJECT_DIR, env=env, stdout=self._log, stderr=subprocess.STDOUT,
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"app.py terminou ao iniciar (código {self._process.returncode}):\n{self.log_tail()}")
+            try:
+                if requests.get(f"{self.base_url}/login", timeout=2).status_code == 200:
+                    return self
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"app.py não respondeu em 60 s:\n{self.log_tail()}")
+
+    def log_tail(self, size: int = 1500) -> str:
+        self._log.flush()
+        with open(self._log.name, encoding="utf-8", errors="replace") as f:
+            return f.read()[-size:]
+
+    def stop(self) -> None:
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        if self._server is not None:
+            self._server.stop()
+        if self._log is not None:
+            self._log.close()
+
+
+def _login(base_url: str, username: str, password: str) -> requests.Session:
+    session = requests.Session()
+    response = session.post(
+        f"{base_url}/login", data={"username": username, "password": password}, allow_redirects=False, timeout=30
+    )
+    if response.status_code != 302 or "/dashboard" not in response.headers.get("location", ""):
+        raise RuntimeError(f"Login de {username} falhou (HTTP {response.status_code})")
+    return session
+
+
+class LoadTest:
+    """Usuários virtuais (threads) repetindo a mistura de requisições até o fim do teste, mais a sonda do event loop."""
+
+    def __init__(self, base_url: str, sessions: List[Tuple[str, requests.Session]], args: argparse.Namespace, departments: List[str]):
+        self.base_url = base_url.rstrip("/")
+        self.sessions = sessions
+        self.args = args
+        self.departments = departments or ["COMERCIAL", "DTC", "GI", "RNA"]
+        self.samples: Dict[str, List[Tuple[float, bool, int]]] = {}
+        self.probe: List[float] = []
+        self.probe_errors = 0
+        self._lock = threading.Lock()
+        self._deadline = 0.0
+
+    def _record(self, name: str, seconds: float, ok: bool, status_code: int) -> None:
+        with self._lock:
+            self.samples.setdefault(name, []).append((seconds, ok, status_code))
+
+    def _request(self, name: str, session: requests.Session, method: str, path: str, **kwargs: Any) -> None:
+        started = time.perf_counter()
+        try:
+            response = session.request(method, f"{self.base_url}{path}", timeout=self.args.timeout, **kwargs)
+            _ = response.content  # exportações: conta o download inteiro
+            ok = response.status_code < 400
+            status_code = response.status_code
+        except requests.RequestException:
+            ok, status_code = False, 0
+        self._record(name, time.perf_counter() - started, ok, status_code)
+
+    def _export_form(self, role: str, rng: random.Random) -> Dict[str, str]:
+        form = {"export_format": self.args.export_format}
+        if role == "admin":
+            form["dept"] = rng.choice(self.departments)
+        if rng.random() < 0.5:
+            form["activity_from"] = EXPORT_FROM
+            form["activity_to"] = EXPORT_TO
+        if not self.args.cache:
+            form["no_cache"] = "1"
+        return form
+
+    def _virtual_user(self, index: int) -> None:
+        from users_config import USERS
+
+        username, session = self.sessions[index % len(self.sessions)]
+        role = USERS[username].role if username in USERS else "supervisor"
+        rng = random.Random(self.args.seed * 1000 + index)
+        actions = [name for name, weight in ACTION_WEIGHTS for _ in range(weight)]
+        while time.monotonic() < self._deadline:
+            action = rng.choice(actions)
+            if action == "dashboard":
+                self._request("GET /dashboard", session, "GET", "/dashboard")
+            elif action == "collaborators":
+                self._request("GET /api/collaborators", session, "GET", "/api/collaborators")
+            else:
+                self._request("POST /export", session, "POST", "/export", data=self._export_form(role, rng))
+            if self.args.think > 0:
+                time.sleep(rng.uniform(0, 2 * self.args.think))
+
+    def _probe(self) -> None:
+        session = requests.Session()
+        while time.monotonic() < self._deadline:
+            started = time.perf_counter()
+            try:
+                session.get(f"{self.base_url}/", allow_redirects=False, timeout=self.args.timeout)
+                self.probe.append(time.perf_counter() - started)
+            except requests.RequestException:
+                self.probe_errors += 1
+            time.sleep(max(PROBE_INTERVAL - (time.perf_counter() - started), 0.0))
+
+    def run(self) -> float:
+        """Roda o teste; retorna a duração real em segundos."""
+        self._deadline = time.monotonic() + self.args.duration
+        threads = [threading.Thread(target=self._probe, name="probe", daemon=True)]
+        threads += [
+            threading.Thread(target=self._virtual_user, args=(i,), name=f"vu-{i}", daemon=True)
+            for i in range(self.args.concurrency)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+
+def _latency_summary(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    return {
+        "p50": round(_percentile(values, 0.50), 4),
+        "p90": round(_percentile(values, 0.90), 4),
+        "p95": round(_percentile(values, 0.95), 4),
+        "p99": round(_percentile(values, 0.99), 4),
+        "max": round(values[-1], 4) if values else 0.0,
+    }
+
+
+_LAG_LINE = re.compile(r'^bitrix_exporter_event_loop_lag_seconds_(bucket|sum|count)(?:\{le="([^"]+)"\})? (\S+)$')
+
+
+def read_loop_lag(base_url: str, token: str = "") -> Optional[Dict[str, Any]]:
+    """Histograma event_loop_lag_seconds de /metrics ({"buckets": {le: n}, "sum", "count"}), ou None se indisponível."""
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    try:
+        response = requests.get(f"{base_url}/metrics", headers=headers, timeout=30)
+    except requests.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    # A métrica existe (linha # TYPE) mesmo antes da primeira medição, mas sem amostras
+    if "# TYPE bitrix_exporter_event_loop_lag_seconds histogram" not in response.text:
+        return None
+    lag: Dict[str, Any] = {"buckets": {}, "sum": 0.0, "count": 0.0}
+    for line in response.text.splitlines():
+        match = _LAG_LINE.match(line)
+        if not match:
+            continue
+        kind, le, value = match.groups()
+        if kind == "bucket":
+            lag["buckets"][le] = float(value)
+        else:
+            lag[kind] = float(value)
+    return lag
+
+
+def _loop_lag_delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    # Buckets cumulativos: medições com atraso <= limite
+    bounds = sorted(
+        (float(le), after["buckets"][le] - before["buckets"].get(le, 0.0)) for le in after["buckets"] if le != "+Inf"
+    )
+    samples = after["count"] - before["count"]
+    fast = next((n for bound, n in bounds if bound >= SLOW_LAG_SECONDS), samples)
+    # Maior atraso: limite do primeiro bucket que contém todas as medições do teste (None = acima do último)
+    max_lag = next((bound for bound, n in bounds if n >= samples), None)
+    return {
+        "samples": int(samples),
+        "blocked_seconds": round(after["sum"] - before["sum"], 3),
+        "max_lag_seconds_le": max_lag,
+        "slow_samples": int(samples - fast),
+    }
+
+
+def build_report(test: LoadTest, elapsed: float, loop_lag: Optional[Dict[str, Any]], args: argparse.Namespace) -> Dict[str, Any]:
+    endpoints = {}
+    total = errors = 0
+    for name, samples in sorted(test.samples.items()):
+        failures = sum(1 for _, ok, _ in samples if not ok)
+        statuses: Dict[str, int] = {}
+        for _, _, status_code in samples:
+            statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+        endpoints[name] = {
+            "requests": len(samples),
+            "errors": failures,
+            "error_rate": round(failures / len(samples), 4),
+            "per_second": round(len(samples) / elapsed, 2),
+            "latency": _latency_summary([s[0] for s in samples]),
+            "status": statuses,
+        }
+        total += len(samples)
+        errors += failures
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "url": args.url or "local",
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "think": args.think,
+            "export_format": args.export_format,
+            "cache": args.cache,
+            "tasks": None if args.url else args.tasks,
+            "bitrix_latency": None if args.url else args.bitrix_latency,
+            "workers": None if args.url else args.workers,
+        },
+        "elapsed": round(elapsed, 2),
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "endpoints": endpoints,
+        "probe": {"requests": len(test.probe), "errors": test.probe_errors, "latency": _latency_summary(test.probe)},
+        "event_loop": loop_lag,
+    }
+
+
+def _max_lag_text(lag: Dict[str, Any]) -> str:
+    if lag["max_lag_seconds_le"] is None:
+        return f"> {LOOP_LAG_BUCKETS[-1]}s"
+    return f"<= {lag['max_lag_seconds_le']}s"
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print("\n" + "=" * 100)
+    print(f"{'endpoint':24s} {'req':>6s} {'req/s':>7s} {'erros':>6s} {'p50':>8s} {'p90':>8s} {'p95':>8s} {'p99':>8s} {'máx':>8s}")
+    print("-" * 100)
+    rows = list(report["endpoints"].items()) + [("sonda GET / (loop)", report["probe"])]
+    for name, data in rows:
+        lat = data["latency"]
+        per_second = data.get("per_second", "")
+        print(
+            f"{name:24s} {data['requests']:6d} {per_second!s:>7s} {data['errors']:6d} "
+            f"{lat['p50']:8.3f} {lat['p90']:8.3f} {lat['p95']:8.3f} {lat['p99']:8.3f} {lat['max']:8.3f}"
+        )
+    print("-" * 100)
+    print(f"Total: {report['requests']} requisições em {report['elapsed']}s, taxa de erro {report['error_rate']:.2%}")
+    lag = report["event_loop"]
+    if lag is None:
+        print("Event loop: métrica event_loop_lag_seconds indisponível (METRICS_ENABLED=0, METRICS_TOKEN ou versão antiga)")
+    else:
+        print(
+            f"Event loop: {lag['blocked_seconds']}s bloqueado em {lag['samples']} medições, "
+            f"{lag['slow_samples']} acima de {SLOW_LAG_SECONDS * 1000:.0f} ms, maior atraso {_max_lag_text(lag)}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da aplicação web (app.py)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Usuários virtuais simultâneos (padrão: 10)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Duração do teste em segundos (padrão: 30)")
+    parser.add_argument("--think", type=float, default=0.2, help="Pausa média entre requisições de um usuário (padrão: 0.2 s)")
+    parser.add_argument("--users", default=None, help="Contas de USERS usadas, separadas por vírgula (padrão: todas)")
+    parser.add_argument("--export-format", default="xlsx", help="Formato das exportações (padrão: xlsx)")
+    parser.add_argument("--cache", action="store_true", help="Permitir o cache de exportações (padrão: no_cache em todas)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Timeout de cada requisição (padrão: 300 s)")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do portal e da mistura de requisições (padrão: 0)")
+    local = parser.add_argument_group("app local (padrão)")
+    local.add_argument("--tasks", type=int, default=5000, help="Tarefas do portal sintético (padrão: 5000)")
+    local.add_argument("--portal-users", type=int, default=100, help="Usuários do portal sintético (padrão: 100)")
+    local.add_argument("--bitrix-latency", type=float, default=0.05, help="Latência por requisição ao Bitrix local (padrão: 0.05 s)")
+    local.add_argument("--workers", type=int, default=1, help="Workers do uvicorn (padrão: 1)")
+    remote = parser.add_argument_group("app já no ar")
+    remote.add_argument("--url", default=None, help="URL do app (ex: https://meu-app.onrender.com)")
+    remote.add_argument("--login", action="append", default=[], metavar="USUARIO:SENHA", help="Entrar com estas credenciais (repetível)")
+    remote.add_argument("--session-secret", default=None, help="SESSION_SECRET do app, para assinar as sessões sem senha")
+    remote.add_argument("--metrics-token", default="", help="METRICS_TOKEN do app, para ler o atraso do event loop")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Taxa de erro máxima aceita (padrão: 0.01)")
+    parser.add_argument("--max-loop-lag", type=float, default=0.5, help="Maior atraso aceito do event loop em segundos (padrão: 0.5)")
+    parser.add_argument("--json", default=None, help="Gravar o relatório em JSON neste arquivo")
+    args = parser.parse_args()
+
+    from users_config import USERS
+
+    usernames = [u.strip() for u in (args.users or ",".join(USERS)).split(",") if u.strip()]
+    unknown = [u for u in usernames if u not in USERS]
+    if unknown and not args.login:
+        parser.error(f"Usuários desconhecidos: {', '.join(unknown)}")
+
+    stack = None
+    work_dir = tempfile.mkdtemp(prefix="bench_load_")
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+            departments: List[str] = []
+            if args.login:
+                sessions = []
+                for credential in args.login:
+                    username, _, password = credential.partition(":")
+                    sessions.append((username, _login(base_url, username, password)))
+            elif args.session_secret:
+                sessions = [(u, requests.Session()) for u in usernames]
+                for username, session in sessions:
+                    session.cookies.set("session", session_cookie(args.session_secret, username))
+            else:
+                parser.error("Com --url, informe --login usuario:senha ou --session-secret")
+        else:
+            print(f"Subindo portal sintético ({args.tasks} tarefas, latência {args.bitrix_latency}s) e app.py...")
+            stack = LocalStack(args, work_dir).start()
+            base_url, departments = stack.base_url, stack.departments
+            sessions = [(u, requests.Session()) for u in usernames]
+            for username, session in sessions:
+                session.cookies.set("session", session_cookie(stack.session_secret, username))
+            args.metrics_token = stack.metrics_token
+
+        print(f"{args.concurrency} usuários virtuais ({', '.join(u for u, _ in sessions)}) por {args.duration:.0f}s em {base_url}")
+        lag_before = read_loop_lag(base_url, args.metrics_token)
+        test = LoadTest(base_url, sessions, args, departments)
+        elapsed = test.run()
+        lag_after = read_loop_lag(base_url, args.metrics_token)
+        loop_lag = _loop_lag_delta(lag_before, lag_after) if lag_before and lag_after else None
+        if args.workers > 1 and loop_lag is not None and not args.url:
+            print("Aviso: com vários workers, /metrics mostra só o worker que respondeu")
+    finally:
+        if stack is not None:
+            stack.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = build_report(test, elapsed, loop_lag, args)
+    print_report(report)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Relatório gravado em {args.json}")
+
+    failed = False
+    if report["error_rate"] > args.max_error_rate:
+        print(f"[ALERTA] Taxa de erro {report['error_rate']:.2%} acima de {args.max_error_rate:.2%}")
+        failed = True
+    if loop_lag is not None and (loop_lag["max_lag_seconds_le"] or float("inf")) > args.max_loop_lag:
+        print(
+            f"[ALERTA] Event loop bloqueado: maior atraso {_max_lag_text(loop_lag)} (limite {args.max_loop_lag}s), "
+            f"algum handler async faz trabalho síncrono pesado"
+        )
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark de memória do pipeline de exportação: registros compactos (records.py) x dicionários.
+
+Monta uma exportação sintética completa (enrich_tasks -> lançamentos -> combine_tasks_with_time_entries)
+e mantém tarefas e linhas em memória, como no modo DataFrame do Excel. Cada modo roda em um
+subprocesso separado (pico de RSS independente):
+
+- compact: TaskRecord / TimeEntryRecord / ExportRow, como o pipeline atual
+- dict: mesmas tarefas e linhas convertidas para dicionários comuns, uma tarefa por vez
+  (o formato usado antes dos registros compactos)
+
+Uso:
+    python benchmark_pipeline_memory.py                  # ~200 mil linhas, os dois modos
+    python benchmark_pipeline_memory.py --rows 50000 --mode compact
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+from benchmark_excel_memory import _peak_rss_mb
+from benchmark_task_fields import _CannedClient, synthetic_tasks
+
+
+def _current_rss_mb() -> float:
+    """RSS atual em MB (Linux, via /proc; 0 se indisponível)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0.0
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def synthetic_time_entries(tasks: List[Dict[str, Any]], seed: int = 0) -> Dict[int, List[Dict[str, Any]]]:
+    """Lançamentos no formato de task.elapseditem.getlist: 1 a 3 por tarefa (média 2)."""
+    rng = random.Random(seed)
+    entries_map = {}
+    for i, task in enumerate(tasks):
+        task_id = int(task["id"])
+        entries_map[task_id] = [
+            {
+                "ID": str(task_id * 10 + k),
+                "TASK_ID": str(task_id),
+                "USER_ID": str(rng.randint(1, 500)),
+                "SECONDS": str(rng.choice([900, 1800, 3600, 5400])),
+                "MINUTES": "0",
+                "COMMENT_TEXT": rng.choice(["", "Reunião de alinhamento", "Ajustes solicitados pelo cliente"]),
+                "CREATED_DATE": f"2025-04-{1 + k:02d}T13:56:00+03:00",
+            }
+            for k in range(i % 3 + 1)
+        ]
+    return entries_map
+
+
+def run_single(mode: str, rows: int) -> Dict[str, Any]:
+    """Executa um modo no processo atual e retorna as métricas."""
+    import logging
+    logging.disable(logging.WARNING)
+    from task_processor import enrich_tasks
+    from web_services import combine_tasks_with_time_entries
+
+    tasks = synthetic_tasks(max(rows // 2, 1))
+    entries_map = synthetic_time_entries(tasks)
+    client = _CannedClient(tasks)
+    collaborators_map = {uid: {"name": f"Colaborador {uid}", "dept": f"DEPTO {uid % 7}"} for uid in range(1, 501)}
+    task_ids = [int(t["id"]) for t in tasks]
+    gc.collect()
+    baseline = _current_rss_mb()
+
+    start = time.perf_counter()
+    enriched = enrich_tasks(client, task_ids, [], collaborators_map)
+    if mode == "dict":
+        for i, task in enumerate(enriched):
+            enriched[i] = dict(task)
+        export_rows = []
+        for task in enriched:
+            export_rows.extend(dict(row) for row in combine_tasks_with_time_entries([task], entries_map, collaborators_map))
+    else:
+        export_rows = combine_tasks_with_time_entries(enriched, entries_map, collaborators_map)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+
+    return {
+        "mode": mode,
+        "tasks": len(enriched),
+        "rows": len(export_rows),
+        "seconds": round(elapsed, 2),
+        "retained_mb": round(_current_rss_mb() - baseline, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memória do pipeline de exportação")
+    parser.add_argument("--rows", type=int, default=200000, help="Número aproximado de linhas (padrão: 200000)")
+    parser.add_argument("--mode", choices=["dict", "compact", "all"], default="all")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.mode, args.rows)))
+        return
+
+    modes = ["dict", "compact"] if args.mode == "all" else [args.mode]
+    print("=" * 60)
+    print(f"BENCHMARK DE MEMORIA - PIPELINE DE EXPORTACAO (~{args.rows} linhas)")
+    print("=" * 60)
+    for mode in modes:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single", "--mode", mode, "--rows", str(args.rows)],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        if proc.returncode != 0:
+            print(f"[ERRO] modo {mode}: {proc.stderr.strip()[-500:]}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(
+            f"{mode:8s} | {result['rows']} linhas | tempo: {result['seconds']:6.2f}s | "
+            f"tarefas+linhas: {result['retained_mb']:7.1f} MB | pico RSS: {result['peak_rss_mb']:7.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
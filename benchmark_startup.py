@@ -0,0 +1,95 @@
+"""Benchmark de inicialização: tempo de import dos pontos de entrada e leitura da planilha de colaboradores.
+
+Cada medição roda em um subprocesso novo (import "frio", sem módulos já carregados) e é
+repetida algumas vezes; o resultado é a mediana.
+
+Uso:
+    python benchmark_startup.py
+    python benchmark_startup.py --input "minha_planilha.xlsx" --repeat 7
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCENARIOS = [
+    ("import main", "import main"),
+    ("import app", "import app"),
+    ("import pandas", "import pandas"),
+    (
+        "main + planilha",
+        "import main; from excel_handler import read_collaborators_sheet; read_collaborators_sheet({path!r})",
+    ),
+    (
+        "pandas carregado?",
+        "import main, sys; from excel_handler import read_collaborators_sheet; "
+        "read_collaborators_sheet({path!r}); print('pandas' in sys.modules)",
+    ),
+]
+
+
+def _run(code: str) -> tuple:
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", "import logging; logging.disable(logging.CRITICAL); " + code],
+        capture_output=True,
+        text=True,
+        cwd=PROJECT_DIR,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip()[-500:])
+    return elapsed, proc.stdout.strip()
+
+
+def _parse_times(path: str, repeat: int) -> None:
+    """Tempo de leitura da planilha (processo atual, módulos já importados), por leitor disponível."""
+    import logging
+    logging.disable(logging.CRITICAL)
+    import excel_handler
+
+    readers = [("read_collaborators_sheet", excel_handler.read_collaborators_sheet)]
+    for name in ("_parse_collaborators_sheet", "_read_collaborators_pandas"):
+        if hasattr(excel_handler, name):
+            readers.append((name, getattr(excel_handler, name)))
+
+    for name, reader in readers:
+        reader(path)  # aquecimento (imports preguiçosos)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            reader(path)
+            times.append(time.perf_counter() - start)
+        print(f"  {name:32s} {statistics.median(times) * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização e leitura da planilha")
+    parser.add_argument("--input", type=str, default="Planilha de colaboradores.xlsx", help="Planilha de colaboradores")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetições por cenário (mediana)")
+    args = parser.parse_args()
+    path = os.path.abspath(args.input)
+
+    print("=" * 60)
+    print("BENCHMARK DE INICIALIZACAO (subprocesso novo por medição)")
+    print("=" * 60)
+    for label, code in SCENARIOS:
+        code = code.format(path=path)
+        times = []
+        output = ""
+        for _ in range(args.repeat):
+            elapsed, output = _run(code)
+            times.append(elapsed)
+        suffix = f"  -> {output}" if output else ""
+        print(f"  {label:32s} {statistics.median(times) * 1000:8.1f} ms{suffix}")
+
+    print("\nLeitura da planilha (módulos já carregados):")
+    _parse_times(path, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Microbenchmark da leitura de campos das tarefas: sondagem com normalize_task_field x TaskFieldAccessor.
+
+Gera tarefas sintéticas no formato de tasks.task.get (chaves camelCase, como o Bitrix retorna) e
+mede o tempo de leitura dos campos usados por enrich_tasks nos dois modos, conferindo que os
+resultados são idênticos. Também mede enrich_tasks completo com as mesmas tarefas.
+
+Uso:
+    python benchmark_task_fields.py                # 50 mil tarefas
+    python benchmark_task_fields.py --tasks 200000
+"""
+import argparse
+import logging
+import random
+import time
+from typing import Any, Dict, List
+
+from task_processor import TaskFieldAccessor, enrich_tasks, extract_task_fields, normalize_task_field
+
+
+def synthetic_tasks(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Tarefas com os campos (e alguns extras) que tasks.task.get devolve."""
+    rng = random.Random(seed)
+    tasks = []
+    for i in range(count):
+        task_id = 100000 + i
+        responsible = rng.randint(1, 500)
+        tasks.append({
+            "id": str(task_id),
+            "parentId": None,
+            "title": f"Tarefa sintética {task_id}",
+            "description": "",
+            "mark": None,
+            "priority": "1",
+            "multitask": "N",
+            "notViewed": "N",
+            "replicate": "N",
+            "stageId": "0",
+            "createdBy": str(rng.randint(1, 500)),
+            "createdDate": "2025-04-28T13:56:00+03:00",
+            "responsibleId": str(responsible),
+            "changedBy": str(responsible),
+            "changedDate": "2025-04-29T10:00:00+03:00",
+            "statusChangedDate": "2025-04-29T10:00:00+03:00",
+            "closedBy": None,
+            "closedDate": "2025-04-29T10:00:00+03:00" if i % 3 == 0 else None,
+            "activityDate": "2025-04-29T10:00:00+03:00",
+            "dateStart": None,
+            "deadline": "2025-05-10T18:00:00+03:00" if i % 2 else None,
+            "startDatePlan": None,
+            "endDatePlan": None,
+            "guid": "{00000000-0000-0000-0000-000000000000}",
+            "xmlId": None,
+            "commentsCount": str(rng.randint(0, 20)),
+            "allowChangeDeadline": "Y",
+            "allowTimeTracking": "Y",
+            "taskControl": "N",
+            "addInReport": "N",
+            "timeEstimate": str(rng.choice([0, 3600, 7200])),
+            "timeSpentInLogs": str(rng.randint(0, 100000)),
+            "matchWorkTime": "N",
+            "forumTopicId": "0",
+            "groupId": "0",
+            "siteId": "s1",
+            "subordinate": "N",
+            "exchangeModified": None,
+            "status": rng.choice(["2", "3", "5"]),
+            "accomplices": [str(rng.randint(1, 500)) for _ in range(rng.randint(0, 3))],
+            "auditors": [],
+        })
+    return tasks
+
+
+def legacy_extract(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Leitura anterior (referência): cadeias de normalize_task_field como estavam em enrich_tasks."""
+    return {
+        "id": normalize_task_field(task, "id") or normalize_task_field(task, "ID") or None,
+        "time_spent_in_logs": normalize_task_field(task, "timeSpentInLogs") or normalize_task_field(task, "TIME_SPENT_IN_LOGS") or None,
+        "time_estimate": normalize_task_field(task, "timeEstimate") or normalize_task_field(task, "TIME_ESTIMATE") or normalize_task_field(task, "estimate") or normalize_task_field(task, "ESTIMATE") or None,
+        "created_date": normalize_task_field(task, "createdDate") or normalize_task_field(task, "CREATED_DATE") or normalize_task_field(task, "DATE_CREATE") or None,
+        "closed_date": normalize_task_field(task, "closedDate") or normalize_task_field(task, "CLOSED_DATE") or None,
+        "title": normalize_task_field(task, "title") or normalize_task_field(task, "TITLE") or None,
+        "status": normalize_task_field(task, "status") or normalize_task_field(task, "STATUS") or None,
+        "deadline": normalize_task_field(task, "deadline") or normalize_task_field(task, "DEADLINE") or None,
+        "activity_date": normalize_task_field(task, "activityDate") or normalize_task_field(task, "ACTIVITY_DATE") or None,
+        "responsible_id": normalize_task_field(task, "responsibleId") or normalize_task_field(task, "RESPONSIBLE_ID") or None,
+        "accomplices": normalize_task_field(task, "accomplices") or normalize_task_field(task, "ACCOMPLICES") or normalize_task_field(task, "members") or normalize_task_field(task, "MEMBERS") or None,
+    }
+
+
+class _CannedClient:
+    """Cliente que devolve as tarefas sintéticas no formato do batch (sem rede)."""
+
+    # Sem cache de respostas nem de detalhes (enrich_tasks consulta client.response_cache)
+    response_cache = None
+
+    def __init__(self, tasks: List[Dict[str, Any]]):
+        self._by_id = {int(t["id"]): t for t in tasks}
+
+    def _batch(self, commands: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [{"task": self._by_id[c["params"]["taskId"]]} for c in commands]
+
+    _send_batches = _batch
+
+
+def _timed(label: str, func, tasks: List[Dict[str, Any]]):
+    start = time.perf_counter()
+    result = [func(t) for t in tasks]
+    elapsed = time.perf_counter() - start
+    print(f"  {label:34s} {elapsed:7.3f}s  ({elapsed / len(tasks) * 1e6:6.2f} µs/tarefa)")
+    return elapsed, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark da leitura de campos das tarefas")
+    parser.add_argument("--tasks", type=int, default=50000, help="Número de tarefas sintéticas (padrão: 50000)")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    tasks = synthetic_tasks(args.tasks)
+    # Algumas tarefas com formato diferente (MAIÚSCULAS) para exercitar o fallback
+    upper = [{k.upper(): v for k, v in t.items()} for t in synthetic_tasks(max(args.tasks // 100, 1), seed=1)]
+
+    print("=" * 60)
+    print(f"LEITURA DE CAMPOS ({args.tasks} tarefas)")
+    print("=" * 60)
+    legacy_time, legacy = _timed("normalize_task_field (anterior)", legacy_extract, tasks)
+    _timed("extract_task_fields (sem formato)", extract_task_fields, tasks)
+    accessor = TaskFieldAccessor(tasks[0])
+    fast_time, fast = _timed("TaskFieldAccessor.extract", accessor.extract, tasks)
+    print(f"  ganho: {legacy_time / max(fast_time, 1e-9):.1f}x")
+
+    mismatches = sum(1 for a, b in zip(legacy, fast) if a != b)
+    mismatches += sum(1 for t in upper if accessor.extract(t) != legacy_extract(t))
+    print(f"  resultados diferentes: {mismatches}")
+
+    client = _CannedClient(tasks)
+    collaborators_map = {uid: {"name": f"Colaborador {uid}", "dept": f"DEPTO {uid % 7}"} for uid in range(1, 501)}
+    start = time.perf_counter()
+    enriched = enrich_tasks(client, [int(t["id"]) for t in tasks], [], collaborators_map)
+    print(f"\nenrich_tasks completo: {time.perf_counter() - start:.3f}s ({len(enriched)} tarefas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""Gravação e reprodução (record/replay) das chamadas HTTP do BitrixClient em um arquivo compactado.
+
+Com BITRIX_CASSETTE_MODE=record, cada requisição ao Bitrix24 (método, parâmetros, status, corpo da
+resposta e duração) é gravada em BITRIX_CASSETTE (JSON Lines com gzip). A URL do webhook não é
+gravada e o token é removido de parâmetros e respostas, então o arquivo pode ser copiado para
+outra máquina. Com BITRIX_CASSETTE_MODE=replay, o BitrixClient responde a partir do arquivo, sem
+rede: uma exportação lenta gravada em produção pode ser repetida, medida e otimizada localmente, e
+os scripts test_*.py que usam o BitrixClient rodam sempre com os mesmos dados.
+
+Requisições iguais são respondidas na ordem em que foram gravadas (ex: uma falha seguida da
+retentativa); depois da última, a última resposta se repete. Um batch que não foi gravado
+exatamente igual é montado comando a comando a partir dos batches gravados, então a reprodução
+não depende de como os comandos foram divididos (ex: outro EXPORT_CHUNK_TASKS). Uma requisição
+(ou comando de batch) que não está no arquivo gera CassetteMissError. BITRIX_CASSETTE_TIMING > 0 reproduz a duração original de cada
+resposta multiplicada pelo fator (1 = mesmo tempo do portal).
+
+O arquivo só fica completo quando o processo termina (ou em close_cassette_recorder); até lá a
+gravação vai para um arquivo temporário na mesma pasta.
+
+Resumo de um arquivo gravado:
+    python bitrix_cassette.py .cache/bitrix_cassette.jsonl.gz
+"""
+import argparse
+import atexit
+import gzip
+import http.client
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+from config import BITRIX_CASSETTE, BITRIX_CASSETTE_MODE, BITRIX_CASSETTE_TIMING
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+CASSETTE_MODES = ("record", "replay")
+REDACTED = "***"
+# Parâmetros que nunca são gravados (comparação sem diferenciar maiúsculas)
+SECRET_PARAMS = frozenset({"auth", "access_token", "refresh_token", "application_token", "client_secret", "password"})
+# Webhook usado pelo BitrixClient em modo replay quando BITRIX_WEBHOOK_BASE não está configurado
+REPLAY_WEBHOOK_BASE = "http://cassette.invalid/rest/0/replay/"
+
+
+class CassetteMissError(LookupError):
+    """Requisição sem resposta gravada no cassette (modo replay)."""
+
+
+def _api_method(url: str) -> str:
+    # A URL é sempre <webhook>/<método>; só o método vai para o arquivo
+    return url.rstrip("/").rsplit("/", 1)[-1]
+
+
+def _redact(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            k: REDACTED if str(k).lower() in SECRET_PARAMS else _redact(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [_redact(v) for v in value]
+    return value
+
+
+def _request_key(http_method: str, api_method: str, payload: Any) -> str:
+    return json.dumps([http_method, api_method, _redact(payload)], sort_keys=True, ensure_ascii=False, default=str)
+
+
+def webhook_secret(webhook_base: str) -> Optional[str]:
+    """Token do webhook (último segmento de .../rest/<usuário>/<token>/), ou None se não houver."""
+    parts = [p for p in urlparse(webhook_base).path.split("/") if p]
+    if len(parts) >= 3 and parts[-3] == "rest":
+        return parts[-1]
+    return None
+
+
+class CassetteRecorder:
+    """
+    Transporte HTTP do BitrixClient que repassa as requisições (requests) e grava cada uma no cassette.
+
+    Atributos:
+        path: Arquivo final (.jsonl.gz)
+        count: Requisições gravadas
+    """
+
+    def __init__(self, path: str, transport: Any = requests):
+        self.path = path
+        self.count = 0
+        self._transport = transport
+        self._secrets: List[str] = []
+        self._lock = threading.Lock()
+        self._file = None
+        self._tmp_path: Optional[str] = None
+        self._closed = False
+        atexit.register(self.close)
+
+    def add_secret(self, secret: Optional[str]) -> None:
+        """Texto removido das respostas gravadas (ex: token do webhook)."""
+        if secret and len(secret) >= 6 and secret not in self._secrets:
+            self._secrets.append(secret)
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> requests.Response:
+        return self._perform("GET", url, params or {}, lambda: self._transport.get(url, params=params, timeout=timeout))
+
+    def post(self, url: str, json: Any = None, timeout: Optional[float] = None) -> requests.Response:
+        return self._perform("POST", url, json, lambda: self._transport.post(url, json=json, timeout=timeout))
+
+    def _perform(self, http_method: str, url: str, payload: Any, send: Callable[[], requests.Response]) -> requests.Response:
+        api_method = _api_method(url)
+        started = time.perf_counter()
+        entry: Dict[str, Any] = {"http": http_method, "method": api_method, "request": _redact(payload)}
+        try:
+            response = send()
+        except requests.RequestException as e:
+            entry["error"] = "timeout" if isinstance(e, requests.Timeout) else "connection"
+            entry["message"] = self._scrub(str(e))
+            entry["elapsed"] = round(time.perf_counter() - started, 4)
+            self._write(entry)
+            raise
+        entry["status"] = response.status_code
+        entry["body"] = self._scrub(response.content.decode("utf-8", errors="replace"))
+        entry["elapsed"] = round(time.perf_counter() - started, 4)
+        self._write(entry)
+        return response
+
+    def _scrub(self, text: str) -> str:
+        for secret in self._secrets:
+            text = text.replace(secret, REDACTED)
+        return text
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._closed:
+                return
+            if self._file is None:
+                directory = os.path.dirname(os.path.abspath(self.path))
+                os.makedirs(directory, exist_ok=True)
+                fd, self._tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                os.close(fd)
+                self._file = gzip.open(self._tmp_path, "wt", encoding="utf-8")
+                header = {"version": CASSETTE_VERSION, "recorded_at": datetime.now().isoformat(timespec="seconds")}
+                self._file.write(json.dumps(header) + "\n")
+            self._file.write(line)
+            self.count += 1
+
+    def close(self) -> Optional[str]:
+        """
+        Fecha a gravação e move o arquivo para path (uma única vez).
+
+        Returns:
+            Caminho do cassette gravado, ou None se nenhuma requisição foi gravada
+        """
+        with self._lock:
+            if self._closed:
+                return self.path if self.count else None
+            self._closed = True
+            if self._file is None:
+                return None
+            try:
+                self._file.close()
+                os.replace(self._tmp_path, self.path)
+            except OSError as e:
+                logger.error(f"Não foi possível gravar o cassette do Bitrix em {self.path}: {e}")
+                if self._tmp_path and os.path.exists(self._tmp_path):
+                    os.unlink(self._tmp_path)
+                return None
+        logger.info(f"Cassette do Bitrix gravado em {self.path} ({self.count} requisições)")
+        return self.path
+
+
+def read_cassette(path: str) -> List[Dict[str, Any]]:
+    """
+    Lê as requisições gravadas em um cassette.
+
+    Raises:
+        ValueError: Arquivo de versão desconhecida
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline() or "{}")
+        if header.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Cassette {path} com versão não suportada: {header.get('version')}")
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _make_response(entry: Dict[str, Any], url: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = int(entry["status"])
+    response.reason = http.client.responses.get(response.status_code, "")
+    response._content = entry.get("body", "").encode("utf-8")
+    response.encoding = "utf-8"
+    response.headers["Content-Type"] = "application/json; charset=utf-8"
+    response.url = url
+    return response
+
+
+class CassettePlayer:
+    """Transporte HTTP do BitrixClient que responde a partir de um cassette gravado, sem rede."""
+
+    def __init__(self, path: str, timing: float = 0.0):
+        """
+        Args:
+            path: Cassette gravado por CassetteRecorder
+            timing: Fator aplicado à duração original de cada resposta (0 = responder na hora)
+        """
+        self.path = path
+        self.timing = timing
+        self._lock = threading.Lock()
+        self._responses: Dict[str, Deque[Dict[str, Any]]] = {}
+        # Comando de batch ("método?parâmetros") -> ({parte da resposta: valor}, segundos)
+        self._commands: Dict[str, Deque[Tuple[Dict[str, Any], float]]] = {}
+        entries = read_cassette(path)
+        for entry in entries:
+            key = _request_key(entry["http"], entry["method"], entry.get("request"))
+            self._responses.setdefault(key, deque()).append(entry)
+            self._index_batch(entry)
+        logger.info(f"Cassette do Bitrix carregado de {path} ({len(entries)} requisições)")
+
+    def _index_batch(self, entry: Dict[str, Any]) -> None:
+        # Separa a resposta de um batch bem-sucedido por comando (result, result_error, result_total...)
+        request = entry.get("request")
+        if entry.get("method") != "batch" or entry.get("status") != 200 or not isinstance(request, dict):
+            return
+        commands = request.get("cmd")
+        try:
+            body = json.loads(entry.get("body") or "")
+        except ValueError:
+            return
+        if not isinstance(commands, dict) or not isinstance(body, dict) or "error" in body:
+            return
+        outer = body.get("result")
+        if not isinstance(outer, dict):
+            return
+        share = entry.get("elapsed", 0.0) / max(len(commands), 1)
+        for cmd_key, command in commands.items():
+            parts = {part: values[cmd_key] for part, values in outer.items() if isinstance(values, dict) and cmd_key in values}
+            self._commands.setdefault(str(command), deque()).append((parts, share))
+
+    def _compose_batch(self, commands: Dict[str, Any]) -> Dict[str, Any]:
+        """Resposta de batch montada com as respostas gravadas de cada comando (chamar com _lock)."""
+        outer: Dict[str, Dict[str, Any]] = {"result": {}}
+        elapsed = 0.0
+        for cmd_key, command in commands.items():
+            queue = self._commands.get(str(command))
+            if not queue:
+                raise CassetteMissError(f"Comando de batch não gravado no cassette {self.path}: {command}")
+            parts, share = queue.popleft() if len(queue) > 1 else queue[0]
+            for part, value in parts.items():
+                outer.setdefault(part, {})[cmd_key] = value
+            elapsed += share
+        body = json.dumps({"result": outer}, ensure_ascii=False)
+        return {"http": "POST", "method": "batch", "status": 200, "body": body, "elapsed": elapsed}
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> requests.Response:
+        return self._replay("GET", url, params or {})
+
+    def post(self, url: str, json: Any = None, timeout: Optional[float] = None) -> requests.Response:
+        return self._replay("POST", url, json)
+
+    def _replay(self, http_method: str, url: str, payload: Any) -> requests.Response:
+        api_method = _api_method(url)
+        key = _request_key(http_method, api_method, payload)
+        with self._lock:
+            queue = self._responses.get(key)
+            if queue:
+                entry = queue.popleft() if len(queue) > 1 else queue[0]
+            elif api_method == "batch" and isinstance(payload, dict) and isinstance(payload.get("cmd"), dict):
+                entry = self._compose_batch(payload["cmd"])
+            else:
+                raise CassetteMissError(f"Requisição não gravada no cassette {self.path}: {http_method} {api_method} {_redact(payload)}")
+        if self.timing > 0:
+            time.sleep(entry.get("elapsed", 0.0) * self.timing)
+        if "error" in entry:
+            error = requests.Timeout if entry["error"] == "timeout" else requests.ConnectionError
+            raise error(entry.get("message") or f"{entry['error']} (gravado no cassette)")
+        return _make_response(entry, url)
+
+
+_recorder: Optional[CassetteRecorder] = None
+_player: Optional[CassettePlayer] = None
+_lock = threading.Lock()
+
+
+def get_cassette_transport(webhook_base: str) -> Any:
+    """
+    Transporte HTTP do BitrixClient conforme BITRIX_CASSETTE_MODE: o módulo requests (padrão),
+    o gravador ou o reprodutor do processo (um único cassette para todos os clientes).
+
+    Raises:
+        ValueError: BITRIX_CASSETTE_MODE inválido
+    """
+    global _recorder, _player
+    if not BITRIX_CASSETTE_MODE:
+        return requests
+    if BITRIX_CASSETTE_MODE not in CASSETTE_MODES:
+        raise ValueError(f"BITRIX_CASSETTE_MODE inválido: {BITRIX_CASSETTE_MODE} (use record ou replay)")
+    with _lock:
+        if BITRIX_CASSETTE_MODE == "record":
+            if _recorder is None:
+                _recorder = CassetteRecorder(BITRIX_CASSETTE)
+                logger.info(f"Gravando as requisições ao Bitrix em {BITRIX_CASSETTE}")
+            _recorder.add_secret(webhook_secret(webhook_base))
+            return _recorder
+        if _player is None:
+            _player = CassettePlayer(BITRIX_CASSETTE, timing=BITRIX_CASSETTE_TIMING)
+        return _player
+
+
+def close_cassette_recorder() -> Optional[str]:
+    """Finaliza o cassette em gravação (se houver) antes do fim do processo; retorna o caminho gravado."""
+    if _recorder is None:
+        return None
+    return _recorder.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumo de um cassette de requisições ao Bitrix24")
+    parser.add_argument("path", nargs="?", default=BITRIX_CASSETTE, help="Arquivo do cassette (padrão: BITRIX_CASSETTE)")
+    args = parser.parse_args()
+
+    entries = read_cassette(args.path)
+    by_method: Dict[str, List[float]] = {}
+    errors = 0
+    for entry in entries:
+        by_method.setdefault(entry["method"], []).append(entry.get("elapsed", 0.0))
+        errors += "error" in entry or entry.get("status", 200) >= 400
+    print(f"{args.path}: {len(entries)} requisições, {errors} com erro")
+    for method, elapsed in sorted(by_method.items(), key=lambda item: -sum(item[1])):
+        print(f"  {method:30s} {len(elapsed):7d} req | {sum(elapsed):8.1f}s | média {sum(elapsed) / len(elapsed):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,10 @@ import logging
 import json
 from typing import Dict, List, Optional, Any
 import requests
-from config import BITRIX_WEBHOOK_BASE, BATCH_SIZE, MAX_RETRIES, RETRY_BACKOFF
+from config import BITRIX_WEBHOOK_BASE, BATCH_SIZE, MAX_RETRIES, RETRY_BACKOFF, BITRIX_CASSETTE_MODE
+from bitrix_cassette import REPLAY_WEBHOOK_BASE, CassetteMissError, CassettePlayer, CassetteRecorder, get_cassette_transport
+from bitrix_response_cache import get_response_cache, portal_scope
+from export_stats import record_api_call, record_batch_commands, record_response_cache, record_retry
 
 logger = logging.getLogger(__name__)
 
@@ -12,14 +15,21 @@ logger = logging.getLogger(__name__)
 class BitrixClient:
     """Cliente para interagir com a API REST do Bitrix24."""
     
-    def __init__(self, webhook_base: str = None):
+    def __init__(self, webhook_base: str = None, transport: Any = None, use_response_cache: bool = True):
         """
         Inicializa o cliente Bitrix24.
         
         Args:
             webhook_base: URL base do webhook. Se None, usa BITRIX_WEBHOOK_BASE do config.
+            transport: Objeto com get/post no formato do requests que faz as requisições HTTP.
+                       Se None, usa o requests (ou o cassette, conforme BITRIX_CASSETTE_MODE).
+            use_response_cache: Responder do cache de respostas (bitrix_response_cache) quando possível.
+                                Com False, o cache é ignorado na leitura, mas as respostas novas são gravadas.
+                                Com um cassette (gravação ou reprodução) o cache nunca é usado.
         """
         self.webhook_base = (webhook_base or BITRIX_WEBHOOK_BASE or "").strip()
+        if not self.webhook_base and BITRIX_CASSETTE_MODE == "replay":
+            self.webhook_base = REPLAY_WEBHOOK_BASE
         if not self.webhook_base:
             raise ValueError("Webhook base não configurado")
         
@@ -34,6 +44,13 @@ class BitrixClient:
             logger.info(f"Bitrix webhook em uso: {p.scheme}://{p.netloc}/rest/.../{mask}/")
         except Exception:
             logger.info("Bitrix webhook em uso: (configurado)")
+        self.transport = transport if transport is not None else get_cassette_transport(self.webhook_base)
+        # Com cassette, toda leitura passa pelo transporte: uma resposta vinda do cache não seria gravada
+        # e faltaria na reprodução (que, por sua vez, não deve depender do estado do cache local)
+        cassette = BITRIX_CASSETTE_MODE or isinstance(self.transport, (CassetteRecorder, CassettePlayer))
+        self.response_cache = None if cassette else get_response_cache()
+        self.use_response_cache = use_response_cache
+        self._cache_scope = portal_scope(self.webhook_base)
     
     def _request(self, method: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
         """
@@ -64,36 +81,58 @@ class BitrixClient:
             full_url = f"{url}?{urlencode(params)}"
             logger.debug(f"  URL completa: {full_url[:200]}...")  # Limitar tamanho do log
         
+        cache = self.response_cache if self.response_cache is not None and self.response_cache.cacheable(method) else None
+        if cache is not None:
+            if self.use_response_cache:
+                cached = cache.get(self._cache_scope, method, params)
+                if cached is not None:
+                    record_response_cache("hit")
+                    return cached
+                record_response_cache("miss")
+            else:
+                record_response_cache("bypass")
+        
         for attempt in range(MAX_RETRIES):
+            started = time.perf_counter()
             try:
-                response = requests.get(url, params=params, timeout=30)
+                response = self.transport.get(url, params=params, timeout=30)
                 response.raise_for_status()
                 
                 data = response.json()
                 
                 # Verificar se a API retornou um erro
                 if "error" in data:
+                    record_api_call(method, "api_error", len(response.content), time.perf_counter() - started)
                     error_msg = data.get("error_description", data.get("error", "Erro desconhecido"))
                     logger.warning(f"API retornou erro: {error_msg}")
                     raise ValueError(f"Erro da API Bitrix24: {error_msg}")
                 
+                record_api_call(method, "ok", len(response.content), time.perf_counter() - started)
+                if cache is not None:
+                    cache.put(self._cache_scope, method, params, {k: v for k, v in data.items() if k != "time"})
                 return data
             
             except requests.Timeout:
+                record_api_call(method, "timeout", 0, time.perf_counter() - started)
                 if attempt < MAX_RETRIES - 1:
                     wait_time = RETRY_BACKOFF * (2 ** attempt)
                     logger.warning(f"Timeout na requisição. Tentativa {attempt + 1}/{MAX_RETRIES}. "
                                  f"Aguardando {wait_time}s antes de tentar novamente...")
+                    record_retry(wait_time)
                     time.sleep(wait_time)
                 else:
                     logger.error(f"Timeout após {MAX_RETRIES} tentativas")
                     raise
             
             except requests.RequestException as e:
+                failed = getattr(e, "response", None)
+                nbytes = len(failed.content or b"") if failed is not None else 0
+                record_api_call(method, "http_error", nbytes, time.perf_counter() - started)
                 if attempt < MAX_RETRIES - 1:
                     wait_time = RETRY_BACKOFF * (2 ** attempt)
                     logger.warning(f"Erro HTTP: {e}. Tentativa {attempt + 1}/{MAX_RETRIES}. "
                                  f"Aguardando {wait_time}s antes de tentar novamente...")
+                    record_retry(wait_time)
                     time.sleep(wait_time)
                 else:
                     logger.error(f"Erro HTTP após {MAX_RETRIES} tentativas: {e}")
@@ -103,12 +142,45 @@ class BitrixClient:
         """
         Executa múltiplos comandos em batch (até 50 por vez).
         
+        Comandos de métodos guardados no cache de respostas são respondidos por ele; só os demais
+        vão ao Bitrix, e as respostas novas desses métodos são gravadas no cache.
+        
         Args:
             commands: Lista de comandos no formato [{"method": "...", "params": {...}}, ...]
             
         Returns:
             Lista de respostas na mesma ordem dos comandos
         """
+        cache = self.response_cache
+        cacheable = [i for i, cmd in enumerate(commands) if cache is not None and cache.cacheable(cmd["method"])]
+        if not cacheable:
+            return self._send_batches(commands)
+        
+        hits: Dict[int, Any] = {}
+        if self.use_response_cache:
+            found = cache.get_many(self._cache_scope, [(commands[i]["method"], commands[i].get("params", {})) for i in cacheable])
+            hits = {cacheable[j]: value for j, value in found.items()}
+            record_response_cache("hit", len(hits))
+            record_response_cache("miss", len(cacheable) - len(hits))
+        else:
+            record_response_cache("bypass", len(cacheable))
+        
+        results: List[Any] = [None] * len(commands)
+        for i, value in hits.items():
+            results[i] = value.get("result")
+        pending = [i for i in range(len(commands)) if i not in hits]
+        fetched = self._send_batches([commands[i] for i in pending]) if pending else []
+        to_store = []
+        for i, value in zip(pending, fetched):
+            results[i] = value
+            if value is not None and cache.cacheable(commands[i]["method"]):
+                to_store.append((commands[i]["method"], commands[i].get("params", {}), {"result": value}))
+        if to_store:
+            cache.put_many(self._cache_scope, to_store)
+        return results
+    
+    def _send_batches(self, commands: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Envia os comandos ao Bitrix em POSTs de batch (até BATCH_SIZE por vez), sem passar pelo cache."""
         results = []
         
         # Processar em lotes de BATCH_SIZE
@@ -133,19 +205,24 @@ class BitrixClient:
                 batch_cmd[cmd_key] = f"{method}?{query_string}" if query_string else method
             
             batch_url = f"{self.webhook_base}batch"
+            record_batch_commands(cmd["method"] for cmd in batch)
             
+            started = time.perf_counter()
+            nbytes = 0
             try:
                 # Bitrix24 batch usa POST
                 # Log do que está sendo enviado
                 logger.debug(f"Enviando batch: {json.dumps({'cmd': batch_cmd}, indent=2)[:500]}")
                 
-                response = requests.post(batch_url, json={"cmd": batch_cmd}, timeout=60)
+                response = self.transport.post(batch_url, json={"cmd": batch_cmd}, timeout=60)
+                nbytes = len(response.content)
                 response.raise_for_status()
                 data = response.json()
                 
                 # Log da resposta
                 logger.debug(f"Resposta do batch: {json.dumps(data, indent=2)[:500]}")
                 
+                record_api_call("batch", "api_error" if "error" in data else "ok", nbytes, time.perf_counter() - started)
                 if "error" in data:
                     error_msg = data.get("error_description", data.get("error", "Erro desconhecido"))
                     logger.error(f"Erro no batch: {error_msg}")
@@ -179,7 +256,13 @@ class BitrixClient:
                             batch_results.append(None)
                     results.extend(batch_results)
             
+            except CassetteMissError:
+                # Reprodução diferente da gravação: falhar em vez de exportar só parte das tarefas
+                raise
             except Exception as e:
+                if isinstance(e, requests.RequestException):
+                    outcome = "timeout" if isinstance(e, requests.Timeout) else "http_error"
+                    record_api_call("batch", outcome, nbytes, time.perf_counter() - started)
                 logger.error(f"Erro ao executar batch: {e}", exc_info=True)
                 # Continuar com resultados vazios
                 results.extend([None] * len(batch))
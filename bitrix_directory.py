@@ -0,0 +1,309 @@
+"""Diretório de usuários do Bitrix24 (user.get / department.get), com cache local e mesclagem com a planilha."""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from bitrix_client import BitrixClient
+from bitrix_cassette import CassetteMissError
+from task_processor import resolve_task_people
+from config import BITRIX_DIRECTORY_ENABLED, BITRIX_DIRECTORY_CACHE, BITRIX_DIRECTORY_REFRESH
+
+logger = logging.getLogger(__name__)
+
+# Tamanho fixo das páginas dos métodos de listagem do Bitrix24
+PAGE_SIZE = 50
+# Após uma sincronização com erro, tentar de novo no máximo a cada RETRY_AFTER_ERROR segundos
+RETRY_AFTER_ERROR = 300
+
+
+def _paginate(client: BitrixClient, method: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Busca todas as páginas de um método de listagem: a primeira diretamente (para saber o total)
+    e as demais de uma vez via batch.
+
+    Raises:
+        ValueError: Se alguma página do batch vier vazia (diretório incompleto)
+    """
+    first = client._request(method, {"start": 0, **params})
+    items = list(first.get("result") or [])
+    total = int(first.get("total") or len(items))
+    starts = list(range(PAGE_SIZE, total, PAGE_SIZE))
+    if starts:
+        commands = [{"method": method, "params": {**params, "start": start}} for start in starts]
+        for start, page in zip(starts, client._batch(commands)):
+            if not isinstance(page, list):
+                raise ValueError(f"Página {start} de {method} não retornada")
+            items.extend(page)
+    return items
+
+
+def _user_info(user: Dict[str, Any], departments: Dict[int, str]) -> Optional[Dict[str, str]]:
+    """Converte um registro de user.get para {"name", "dept"} (primeiro departamento do usuário)."""
+    name = " ".join(str(user.get(k) or "").strip() for k in ("NAME", "LAST_NAME")).strip()
+    name = name or str(user.get("LOGIN") or user.get("EMAIL") or "").strip()
+    if not name:
+        return None
+    dept_ids = user.get("UF_DEPARTMENT") or []
+    if not isinstance(dept_ids, list):
+        dept_ids = [dept_ids]
+    dept = ""
+    for dept_id in dept_ids:
+        try:
+            dept = departments.get(int(dept_id), "")
+        except (ValueError, TypeError):
+            continue
+        if dept:
+            break
+    return {"name": name, "dept": dept}
+
+
+class BitrixDirectory:
+    """
+    Usuários e departamentos do portal, sincronizados periodicamente e guardados em cache JSON.
+
+    A sincronização (usuários ativos + departamentos) acontece sob demanda quando o cache tem
+    mais de refresh_seconds. Usuários que não vieram na sincronização (ex: desligados) podem ser
+    resolvidos em lote com resolve_ids; IDs que o Bitrix não conhece ficam marcados como ausentes
+    até a próxima sincronização, para não serem consultados a cada exportação.
+    """
+
+    def __init__(self, cache_path: str, refresh_seconds: int):
+        """
+        Args:
+            cache_path: Arquivo JSON do cache local
+            refresh_seconds: Intervalo entre sincronizações completas
+        """
+        self.cache_path = cache_path
+        self.refresh_seconds = refresh_seconds
+        self._users: Dict[int, Dict[str, str]] = {}
+        self._resolved: Dict[int, Dict[str, str]] = {}
+        self._missing: Dict[int, float] = {}
+        self._departments: Dict[int, str] = {}
+        self._fetched_at = 0.0
+        self._next_attempt = 0.0
+        self._version = 0
+        self._merged = None
+        self._lock = threading.Lock()
+        self._load_cache()
+
+    def _load_cache(self) -> None:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._users = {int(k): v for k, v in data.get("users", {}).items()}
+            self._resolved = {int(k): v for k, v in data.get("resolved", {}).items()}
+            self._missing = {int(k): v for k, v in data.get("missing", {}).items()}
+            self._departments = {int(k): v for k, v in data.get("departments", {}).items()}
+            self._fetched_at = float(data.get("fetched_at", 0))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"Cache do diretório Bitrix ignorado ({self.cache_path}): {e}")
+            return
+        logger.info(f"Diretório Bitrix carregado do cache: {len(self._users)} usuários, {len(self._departments)} departamentos")
+
+    def _save_cache(self) -> None:
+        data = {
+            "fetched_at": self._fetched_at,
+            "users": self._users,
+            "resolved": self._resolved,
+            "missing": self._missing,
+            "departments": self._departments,
+        }
+        directory = os.path.dirname(self.cache_path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar o cache do diretório Bitrix ({self.cache_path}): {e}")
+
+    def is_stale(self) -> bool:
+        now = time.time()
+        return now >= self._fetched_at + self.refresh_seconds and now >= self._next_attempt
+
+    def ensure_fresh(self, client: BitrixClient) -> None:
+        """Sincroniza com o Bitrix se o cache estiver vencido (uma sincronização por vez)."""
+        if not self.is_stale():
+            return
+        with self._lock:
+            if self.is_stale():
+                self._refresh_locked(client)
+
+    def refresh(self, client: BitrixClient) -> bool:
+        """Força a sincronização. Retorna False (mantendo os dados anteriores) em caso de erro."""
+        with self._lock:
+            return self._refresh_locked(client)
+
+    def _refresh_locked(self, client: BitrixClient) -> bool:
+        start = time.time()
+        try:
+            departments = {}
+            for dept in _paginate(client, "department.get", {}):
+                try:
+                    departments[int(dept["ID"])] = str(dept.get("NAME") or "").strip()
+                except (KeyError, ValueError, TypeError):
+                    continue
+            users = {}
+            for user in _paginate(client, "user.get", {"ACTIVE": "true"}):
+                try:
+                    user_id = int(user["ID"])
+                except (KeyError, ValueError, TypeError):
+                    continue
+                info = _user_info(user, departments)
+                if info:
+                    users[user_id] = info
+        except CassetteMissError:
+            raise
+        except Exception as e:
+            self._next_attempt = time.time() + min(self.refresh_seconds, RETRY_AFTER_ERROR)
+            logger.warning(f"Falha ao sincronizar diretório Bitrix: {e}. Mantendo dados anteriores.")
+            return False
+
+        self._departments = departments
+        self._users = users
+        self._missing = {}
+        self._fetched_at = time.time()
+        self._version += 1
+        self._save_cache()
+        logger.info(
+            f"Diretório Bitrix sincronizado: {len(users)} usuários ativos, {len(departments)} departamentos "
+            f"em {time.time() - start:.1f}s"
+        )
+        return True
+
+    def lookup(self, user_ids: Iterable[int]) -> Dict[int, Dict[str, str]]:
+        """Consulta em lote: {user_id: {"name", "dept"}} para os IDs conhecidos pelo diretório."""
+        result = {}
+        for user_id in user_ids:
+            info = self._users.get(user_id) or self._resolved.get(user_id)
+            if info:
+                result[user_id] = info
+        return result
+
+    def merged_map(self, client: BitrixClient, collaborators_map: Dict[int, Dict[str, str]]) -> Dict[int, Dict[str, str]]:
+        """
+        Mapeamento da planilha completado pelo diretório (a planilha prevalece para IDs presentes nos dois).
+
+        O resultado é compartilhado enquanto planilha e diretório não mudam; não deve ser alterado.
+        """
+        self.ensure_fresh(client)
+        merged = self._merged
+        if merged is not None and merged[0] is collaborators_map and merged[1] == self._version:
+            return merged[2]
+        result = {**self._resolved, **self._users, **collaborators_map}
+        self._merged = (collaborators_map, self._version, result)
+        return result
+
+    def resolve_ids(self, client: BitrixClient, user_ids: Iterable[int]) -> Dict[int, Dict[str, str]]:
+        """
+        Resolve IDs ainda desconhecidos com uma única chamada batch (user.get por ID, até 50 por requisição).
+
+        Inclui usuários inativos, que não entram na sincronização. IDs inexistentes ficam marcados
+        como ausentes até a próxima sincronização.
+
+        Returns:
+            {user_id: {"name", "dept"}} para os IDs que o diretório conhece (após a consulta)
+        """
+        user_ids = set(user_ids)
+        with self._lock:
+            pending = sorted(
+                uid for uid in user_ids
+                if uid not in self._users and uid not in self._resolved and uid not in self._missing
+            )
+            if pending:
+                commands = [{"method": "user.get", "params": {"ID": uid}} for uid in pending]
+                responses = client._batch(commands)
+                found = 0
+                now = time.time()
+                for uid, response in zip(pending, responses):
+                    if response is None:
+                        continue  # erro no batch: tentar de novo na próxima exportação
+                    records = response if isinstance(response, list) else [response]
+                    info = None
+                    for record in records:
+                        if isinstance(record, dict) and str(record.get("ID")) == str(uid):
+                            info = _user_info(record, self._departments)
+                            break
+                    if info:
+                        self._resolved[uid] = info
+                        found += 1
+                    else:
+                        self._missing[uid] = now
+                self._version += 1
+                self._save_cache()
+                logger.info(f"Diretório Bitrix: {found}/{len(pending)} IDs desconhecidos resolvidos em batch")
+        return self.lookup(user_ids)
+
+
+def collect_unseen_ids(
+    enriched_tasks: List[Dict[str, Any]],
+    time_entries_map: Dict[int, List[Dict[str, Any]]],
+    collaborators_map: Dict[int, Dict[str, str]]
+) -> Set[int]:
+    """IDs de responsáveis, participantes e autores de lançamentos que não estão no mapeamento."""
+    ids = set()
+    for task in enriched_tasks:
+        if task.get("responsible_id"):
+            ids.add(task["responsible_id"])
+        ids.update(task.get("accomplices_ids") or [])
+    for entries in time_entries_map.values():
+        for entry in entries or []:
+            user_id = entry.get("USER_ID") or entry.get("userId") or entry.get("USERID")
+            try:
+                ids.add(int(user_id))
+            except (ValueError, TypeError):
+                continue
+    return {uid for uid in ids if uid not in collaborators_map}
+
+
+def fill_unseen_people(
+    directory: BitrixDirectory,
+    client: BitrixClient,
+    enriched_tasks: List[Dict[str, Any]],
+    time_entries_map: Dict[int, List[Dict[str, Any]]],
+    lookup_map: Dict[int, Dict[str, str]]
+) -> int:
+    """
+    Resolve em lote as pessoas de um bloco de tarefas que não estão em lookup_map e atualiza os nomes.
+
+    lookup_map (cópia própria da exportação) recebe os IDs resolvidos; as tarefas que envolvem
+    esses IDs têm nomes e departamentos recalculados (resolve_task_people). Os lançamentos usam
+    lookup_map ao montar as linhas, então basta chamar antes de combinar tarefas e lançamentos.
+
+    Returns:
+        Quantidade de IDs resolvidos
+    """
+    unseen = collect_unseen_ids(enriched_tasks, time_entries_map, lookup_map)
+    if not unseen:
+        return 0
+    resolved = directory.resolve_ids(client, unseen)
+    if not resolved:
+        return 0
+    lookup_map.update(resolved)
+    for task in enriched_tasks:
+        if task.get("responsible_id") in resolved or any(a in resolved for a in task.get("accomplices_ids") or []):
+            resolve_task_people(task, lookup_map)
+    return len(resolved)
+
+
+_directory: Optional[BitrixDirectory] = None
+_directory_lock = threading.Lock()
+
+
+def get_bitrix_directory() -> Optional[BitrixDirectory]:
+    """Retorna o diretório do processo, ou None se desabilitado (BITRIX_DIRECTORY_ENABLED=0, padrão)."""
+    global _directory
+    if not BITRIX_DIRECTORY_ENABLED:
+        return None
+    if _directory is None:
+        with _directory_lock:
+            if _directory is None:
+                _directory = BitrixDirectory(BITRIX_DIRECTORY_CACHE, BITRIX_DIRECTORY_REFRESH)
+    return _directory
@@ -0,0 +1,314 @@
+"""Cache compartilhado em disco (SQLite) das respostas de leitura do Bitrix24, por comando.
+
+O BitrixClient consulta este cache em _request e em cada comando de _batch antes de ir à rede: a
+chave é o portal (hash do webhook), o método e os parâmetros canonizados, então tasks.task.get de
+uma tarefa buscado por uma exportação serve a próxima, venha ele de uma requisição individual ou
+de um batch. Só os métodos com TTL (BITRIX_RESPONSE_CACHE_TTLS) são guardados; listagens
+(tasks.task.list) não entram por padrão.
+
+O mesmo arquivo guarda os detalhes normalizados das tarefas (pseudo-método task_detail), gravados
+por enrich_tasks com a versão da tarefa (changedDate da listagem) na chave: enquanto a tarefa não
+muda no Bitrix, a entrada continua valendo, por até TASK_DETAIL_CACHE_TTL_DAYS sem uso.
+
+As respostas ficam compactadas (zlib) num único arquivo SQLite em modo WAL, que pode ser usado
+ao mesmo tempo por vários workers do uvicorn e pela CLI. Quando o arquivo passa de
+BITRIX_RESPONSE_CACHE_MAX_MB, as entradas vencidas e as menos usadas recentemente são removidas.
+Acertos e faltas vão para a métrica cache_requests_total{cache="bitrix_responses"} e para as
+estatísticas de cada exportação (campo response_cache).
+
+Resumo do cache (ou limpeza):
+    python bitrix_response_cache.py
+    python bitrix_response_cache.py --clear
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import (
+    BITRIX_RESPONSE_CACHE_ENABLED,
+    BITRIX_RESPONSE_CACHE_MAX_MB,
+    BITRIX_RESPONSE_CACHE_PATH,
+    BITRIX_RESPONSE_CACHE_TTLS,
+    TASK_DETAIL_CACHE_TTL_DAYS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato das entradas: incrementar quando o conteúdo guardado mudar
+CACHE_FORMAT_VERSION = 1
+# Gravações (por processo) entre verificações do tamanho total
+EVICT_EVERY = 200
+# Ao passar do limite, remove entradas até ficar nesta fração dele
+EVICT_TARGET = 0.9
+# Intervalo mínimo entre atualizações do último acesso de uma entrada (evita uma escrita a cada acerto)
+TOUCH_INTERVAL = 60
+# Pseudo-método das tarefas normalizadas por enrich_tasks (chave: taskId + versão)
+TASK_DETAIL_METHOD = "task_detail"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    method TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+"""
+
+Command = Tuple[str, Dict[str, Any]]
+
+
+def parse_ttls(spec: str) -> Dict[str, int]:
+    """
+    Converte "método=segundos,método=segundos" em {método: segundos}.
+
+    Raises:
+        ValueError: Item sem "=" ou com TTL não numérico
+    """
+    ttls = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        method, sep, seconds = item.partition("=")
+        if not sep:
+            raise ValueError(f"TTL inválido em BITRIX_RESPONSE_CACHE_TTLS: {item!r} (use método=segundos)")
+        ttls[method.strip()] = int(seconds)
+    return ttls
+
+
+def cache_ttls() -> Dict[str, int]:
+    """TTLs configurados (BITRIX_RESPONSE_CACHE_TTLS) mais o dos detalhes de tarefas (TASK_DETAIL_CACHE_TTL_DAYS)."""
+    ttls = parse_ttls(BITRIX_RESPONSE_CACHE_TTLS)
+    ttls[TASK_DETAIL_METHOD] = int(TASK_DETAIL_CACHE_TTL_DAYS * 86400)
+    return ttls
+
+
+def _canonical(value: Any) -> Any:
+    # Os parâmetros viajam como texto (query string), então 123 e "123" são o mesmo comando
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return str(value)
+
+
+def portal_scope(webhook_base: str) -> str:
+    """Identificador do portal na chave (hash do webhook, para não misturar portais nem gravar o token)."""
+    return hashlib.sha256(webhook_base.encode("utf-8")).hexdigest()[:16]
+
+
+def response_key(scope: str, method: str, params: Optional[Dict[str, Any]]) -> str:
+    material = [CACHE_FORMAT_VERSION, scope, method, _canonical(params or {})]
+    raw = json.dumps(material, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache de respostas em um arquivo SQLite (uma conexão por thread).
+
+    Atributos:
+        path: Arquivo do banco
+        max_bytes: Tamanho máximo das respostas guardadas (compactadas)
+        ttls: {método: segundos}; métodos ausentes não são guardados
+        hits / misses: Consultas deste processo
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttls: Dict[str, int]):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = {method: ttl for method, ttl in ttls.items() if ttl > 0}
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def cacheable(self, method: str) -> bool:
+        return method in self.ttls
+
+    def get_many(self, scope: str, commands: Sequence[Command]) -> Dict[int, Any]:
+        """
+        Respostas válidas guardadas para os comandos.
+
+        Returns:
+            {índice do comando: resposta} só dos acertos
+        """
+        keys = [response_key(scope, method, params) for method, params in commands]
+        now = time.time()
+        found: Dict[str, Tuple[bytes, float]] = {}
+        try:
+            conn = self._connection()
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, body, accessed_at FROM responses WHERE key IN ({placeholders}) AND expires_at > ?",
+                    (*chunk, now),
+                ).fetchall()
+                found.update((key, (body, accessed)) for key, body, accessed in rows)
+            stale = [key for key, (_, accessed) in found.items() if now - accessed > TOUCH_INTERVAL]
+            if stale:
+                placeholders = ",".join("?" * len(stale))
+                conn.execute(f"UPDATE responses SET accessed_at = ? WHERE key IN ({placeholders})", (now, *stale))
+        except sqlite3.Error as e:
+            logger.warning(f"Cache de respostas do Bitrix indisponível na leitura ({self.path}): {e}")
+            found = {}
+
+        results: Dict[int, Any] = {}
+        for index, key in enumerate(keys):
+            entry = found.get(key)
+            if entry is None:
+                continue
+            try:
+                results[index] = json.loads(zlib.decompress(entry[0]))
+            except (zlib.error, ValueError):
+                continue
+        with self._lock:
+            self.hits += len(results)
+            self.misses += len(keys) - len(results)
+        return results
+
+    def get(self, scope: str, method: str, params: Optional[Dict[str, Any]]) -> Optional[Any]:
+        return self.get_many(scope, [(method, params or {})]).get(0)
+
+    def put_many(self, scope: str, entries: Sequence[Tuple[str, Dict[str, Any], Any]]) -> None:
+        """Guarda (método, parâmetros, resposta) com o TTL do método, numa única transação."""
+        now = time.time()
+        rows = []
+        for method, params, value in entries:
+            ttl = self.ttls.get(method)
+            if not ttl:
+                continue
+            body = zlib.compress(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            rows.append((response_key(scope, method, params), method, body, len(body), now + ttl, now))
+        if not rows:
+            return
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Não foi possível gravar no cache de respostas do Bitrix ({self.path}): {e}")
+            return
+        with self._lock:
+            self._writes += len(rows)
+            evict = self._writes >= EVICT_EVERY
+            if evict:
+                self._writes = 0
+        if evict:
+            self.evict()
+
+    def put(self, scope: str, method: str, params: Optional[Dict[str, Any]], value: Any) -> None:
+        self.put_many(scope, [(method, params or {}, value)])
+
+    def evict(self) -> int:
+        """Remove as entradas vencidas e, acima do limite, as menos usadas; retorna quantas saíram."""
+        try:
+            conn = self._connection()
+            removed = conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),)).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return removed
+            excess = total - int(self.max_bytes * EVICT_TARGET)
+            victims: List[str] = []
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                victims.append(key)
+                excess -= size
+                if excess <= 0:
+                    break
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany("DELETE FROM responses WHERE key = ?", ((key,) for key in victims))
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao limpar o cache de respostas do Bitrix ({self.path}): {e}")
+            return 0
+        logger.info(f"Cache de respostas do Bitrix: {removed + len(victims)} entradas removidas (limite de tamanho)")
+        return removed + len(victims)
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM responses")
+
+    def summary(self) -> Dict[str, Any]:
+        """Entradas, bytes e vencidas por método, mais os acertos/faltas deste processo."""
+        now = time.time()
+        rows = self._connection().execute(
+            "SELECT method, COUNT(*), SUM(size), SUM(expires_at <= ?) FROM responses GROUP BY method", (now,)
+        ).fetchall()
+        lookups = self.hits + self.misses
+        return {
+            "methods": {method: {"entries": n, "bytes": size, "expired": expired} for method, n, size, expired in rows},
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+_response_cache: Optional[ResponseCache] = None
+_init_lock = threading.Lock()
+_init_failed = False
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Retorna o cache de respostas do processo, ou None se desabilitado (BITRIX_RESPONSE_CACHE_ENABLED=0) ou indisponível."""
+    global _response_cache, _init_failed
+    if not BITRIX_RESPONSE_CACHE_ENABLED or _init_failed:
+        return None
+    with _init_lock:
+        if _response_cache is None and not _init_failed:
+            try:
+                _response_cache = ResponseCache(
+                    BITRIX_RESPONSE_CACHE_PATH,
+                    BITRIX_RESPONSE_CACHE_MAX_MB * 1024 * 1024,
+                    cache_ttls(),
+                )
+            except (OSError, sqlite3.Error, ValueError) as e:
+                logger.warning(f"Cache de respostas do Bitrix indisponível ({BITRIX_RESPONSE_CACHE_PATH}): {e}")
+                _init_failed = True
+                return None
+    return _response_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumo do cache de respostas do Bitrix24")
+    parser.add_argument("--path", default=BITRIX_RESPONSE_CACHE_PATH, help="Arquivo do cache (padrão: BITRIX_RESPONSE_CACHE_PATH)")
+    parser.add_argument("--clear", action="store_true", help="Apagar todas as entradas")
+    args = parser.parse_args()
+
+    cache = ResponseCache(args.path, BITRIX_RESPONSE_CACHE_MAX_MB * 1024 * 1024, cache_ttls())
+    if args.clear:
+        cache.clear()
+        print(f"Cache {args.path} apagado")
+        return
+    methods = cache.summary()["methods"]
+    print(f"{args.path} ({os.path.getsize(args.path) / (1024 * 1024):.1f} MB em disco, TTLs: {cache.ttls})")
+    for method, data in sorted(methods.items()):
+        print(f"  {method:30s} {data['entries']:8d} entradas | {data['bytes'] / 1024:9.0f} KB | {data['expired']} vencidas")
+    if not methods:
+        print("  (vazio)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Índice de busca dos colaboradores: nomes pré-normalizados, n-gramas para substring e IDs por departamento."""
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+from task_processor import _normalize_for_match
+
+# Tamanho dos n-gramas do índice invertido (buscas menores que isso varrem os nomes já normalizados)
+NGRAM_SIZE = 3
+
+
+def _ngrams(text: str) -> Set[str]:
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class CollaboratorsIndex:
+    """
+    Índice imutável construído uma vez por snapshot da planilha.
+
+    Guarda, na ordem do mapeamento original: IDs, nomes e nomes normalizados (sem acentos,
+    minúsculos, mesmo critério de _normalize_for_match). A busca por substring usa a interseção
+    das listas de n-gramas do termo e confirma o resultado com "in" no nome normalizado; o
+    resultado é sempre igual ao da varredura completa.
+
+    Atributos:
+        ids_by_department: {DEPARTAMENTO (maiúsculo, sem espaços nas bordas): [user_id, ...]}
+    """
+
+    def __init__(self, collaborators_map: Dict[int, Dict[str, str]]):
+        self._ids: List[int] = []
+        self._names: List[str] = []
+        self._normalized: List[str] = []
+        self._departments: List[str] = []
+        postings: Dict[str, List[int]] = {}
+        ids_by_department: Dict[str, List[int]] = {}
+
+        for position, (user_id, info) in enumerate(collaborators_map.items()):
+            name = info.get("name", "")
+            normalized = _normalize_for_match(name)
+            dept = (info.get("dept") or "").strip().upper()
+            self._ids.append(user_id)
+            self._names.append(name)
+            self._normalized.append(normalized)
+            self._departments.append(dept)
+            for gram in _ngrams(normalized):
+                postings.setdefault(gram, []).append(position)
+            ids_by_department.setdefault(dept, []).append(user_id)
+
+        self._postings = postings
+        self.ids_by_department = ids_by_department
+        self._department_sets: Dict[str, FrozenSet[int]] = {d: frozenset(ids) for d, ids in ids_by_department.items()}
+
+    def _positions_matching(self, needle: str) -> List[int]:
+        """Posições (em ordem) cujo nome normalizado contém needle (já normalizado)."""
+        if len(needle) < NGRAM_SIZE:
+            return [i for i, name in enumerate(self._normalized) if needle in name]
+        candidates: Optional[Set[int]] = None
+        # Começar pelos n-gramas mais raros deixa a interseção pequena desde o início
+        for gram in sorted(_ngrams(needle), key=lambda g: len(self._postings.get(g, ()))):
+            found = self._postings.get(gram)
+            if not found:
+                return []
+            candidates = set(found) if candidates is None else candidates.intersection(found)
+            if not candidates:
+                return []
+        return sorted(i for i in candidates if needle in self._normalized[i])
+
+    def match_ids(self, user_substring: str) -> List[int]:
+        """IDs cujo nome contém o termo (sem diferenciar maiúsculas/acentos), na ordem do mapeamento."""
+        needle = _normalize_for_match(user_substring)
+        return [self._ids[i] for i in self._positions_matching(needle)]
+
+    def ids_for_department(self, dept: str) -> List[int]:
+        """IDs do departamento (comparação com strip e sem diferenciar maiúsculas), na ordem do mapeamento."""
+        return list(self.ids_by_department.get((dept or "").strip().upper(), []))
+
+    def department_ids(self, departments: Iterable[str]) -> FrozenSet[int]:
+        """Conjunto de IDs de todos os departamentos informados."""
+        result: FrozenSet[int] = frozenset()
+        for dept in departments:
+            result = result | self._department_sets.get((dept or "").strip().upper(), frozenset())
+        return result
+
+    def search_names(self, query: str, limit: int = 20, departments: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Nomes para autocompletar: primeiro os que começam com o termo, depois os que têm uma palavra
+        começando com ele, depois os que apenas o contêm (ordem alfabética em cada grupo, sem repetição).
+
+        Args:
+            query: Texto digitado (vazio = primeiros nomes em ordem alfabética)
+            limit: Quantidade máxima de nomes
+            departments: Se informado, só colaboradores desses departamentos
+        """
+        needle = _normalize_for_match((query or "").strip())
+        allowed = None
+        if departments is not None:
+            allowed = {(d or "").strip().upper() for d in departments}
+
+        ranked = {}
+        for i in self._positions_matching(needle):
+            name = self._names[i]
+            if not name or (allowed is not None and self._departments[i] not in allowed):
+                continue
+            normalized = self._normalized[i]
+            if normalized.startswith(needle):
+                rank = 0
+            elif (" " + needle) in normalized:
+                rank = 1
+            else:
+                rank = 2
+            if rank < ranked.get(name, 3):
+                ranked[name] = rank
+        ordered = sorted(ranked, key=lambda n: (ranked[n], n))
+        return ordered[:max(limit, 0)]
@@ -0,0 +1,135 @@
+"""Registro de colaboradores do processo: planilha carregada uma vez, revalidada por mtime/tamanho."""
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from collaborators_index import CollaboratorsIndex
+from config import COLLABORATORS_SHEET_PATH
+from excel_handler import read_collaborators_sheet
+from metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+class CollaboratorsSnapshot:
+    """
+    Retrato imutável da planilha de colaboradores, com índices pré-calculados.
+
+    Atributos:
+        collaborators_map: {user_id: {"name": str, "dept": str}} (mesmo formato de read_collaborators_sheet;
+                           compartilhado entre requisições, não deve ser alterado)
+        signature: (mtime_ns, tamanho) do arquivo de origem
+        index: Índice de busca (nomes normalizados, n-gramas, IDs por departamento)
+        ids_by_department: {DEPARTAMENTO (maiúsculo): [user_id, ...]}
+        departments: Departamentos (maiúsculos, ordenados)
+        names: Nomes de todos os colaboradores (únicos, ordenados)
+        names_by_department: {DEPARTAMENTO: [nomes ordenados]}
+    """
+
+    def __init__(self, collaborators_map: Dict[int, Dict[str, str]], signature: Tuple[int, int]):
+        self.collaborators_map = collaborators_map
+        self.signature = signature
+        self.index = CollaboratorsIndex(collaborators_map)
+
+        names_by_department: Dict[str, set] = {}
+        names = set()
+        for info in collaborators_map.values():
+            name = info.get("name") or ""
+            if name:
+                names.add(name)
+                names_by_department.setdefault((info.get("dept") or "").strip().upper(), set()).add(name)
+
+        self.ids_by_department = self.index.ids_by_department
+        self.departments = sorted(d for d in self.ids_by_department if d)
+        self.names = sorted(names)
+        self.names_by_department = {d: sorted(n) for d, n in names_by_department.items()}
+
+    def get(self, user_id: int) -> Optional[Dict[str, str]]:
+        """Retorna {"name", "dept"} do colaborador, ou None."""
+        return self.collaborators_map.get(user_id)
+
+    def names_for_departments(self, departments: List[str]) -> List[str]:
+        """Nomes (ordenados, únicos) dos colaboradores dos departamentos informados."""
+        names = set()
+        for dept in departments:
+            names.update(self.names_by_department.get((dept or "").strip().upper(), []))
+        return sorted(names)
+
+
+class CollaboratorsRegistry:
+    """
+    Mantém o snapshot da planilha em memória e o recarrega quando o arquivo muda.
+
+    A cada acesso é feito apenas um os.stat; a planilha só é lida de novo quando mtime ou
+    tamanho mudam. Se a releitura falhar (ex: arquivo sendo salvo), o snapshot anterior
+    continua em uso.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._snapshot: Optional[CollaboratorsSnapshot] = None
+        self._lock = threading.Lock()
+
+    def _stat_signature(self) -> Tuple[int, int]:
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def snapshot(self) -> CollaboratorsSnapshot:
+        """
+        Retorna o snapshot atual, recarregando a planilha se ela mudou.
+
+        Raises:
+            FileNotFoundError: Se o arquivo não existir e não houver snapshot anterior
+            ValueError: Se a planilha for inválida e não houver snapshot anterior
+        """
+        try:
+            signature = self._stat_signature()
+        except FileNotFoundError:
+            if self._snapshot is not None:
+                logger.warning(f"Planilha de colaboradores não encontrada ({self.path}); usando a versão já carregada")
+                return self._snapshot
+            raise FileNotFoundError(f"Arquivo não encontrado: {self.path}")
+
+        current = self._snapshot
+        if current is not None and current.signature == signature:
+            record_cache("collaborators", "hit")
+            return current
+
+        record_cache("collaborators", "miss")
+        with self._lock:
+            current = self._snapshot
+            if current is not None and current.signature == signature:
+                return current
+            try:
+                collaborators_map = read_collaborators_sheet(self.path)
+            except (FileNotFoundError, ValueError) as e:
+                if current is not None:
+                    logger.warning(f"Falha ao recarregar planilha de colaboradores: {e}. Usando a versão anterior.")
+                    return current
+                raise
+            self._snapshot = CollaboratorsSnapshot(collaborators_map, signature)
+            logger.info(
+                f"Registro de colaboradores {'recarregado' if current else 'carregado'}: "
+                f"{len(collaborators_map)} colaboradores, {len(self._snapshot.departments)} departamentos"
+            )
+            return self._snapshot
+
+
+_registries: Dict[str, CollaboratorsRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_collaborators_registry(path: Optional[str] = None) -> CollaboratorsRegistry:
+    """Retorna o registro (único por processo) da planilha informada (padrão: COLLABORATORS_SHEET_PATH)."""
+    key = os.path.abspath(path or COLLABORATORS_SHEET_PATH)
+    registry = _registries.get(key)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.setdefault(key, CollaboratorsRegistry(key))
+    return registry
+
+
+def get_collaborators_snapshot(path: Optional[str] = None) -> CollaboratorsSnapshot:
+    """Atalho para get_collaborators_registry(path).snapshot()."""
+    return get_collaborators_registry(path).snapshot()
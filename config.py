@@ -22,12 +22,81 @@ BITRIX_WEBHOOK_BASE = os.getenv("BITRIX_WEBHOOK_BASE")
 _PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
 COLLABORATORS_SHEET_PATH = os.getenv("COLABORADORES_PLANILHA") or os.path.join(_PROJECT_DIR, "Planilha de colaboradores.xlsx")
 
+# Cópia compilada (binária) da planilha já lida, gravada ao lado dela e validada por mtime/hash.
+# Evita reler o .xlsx a cada inicialização; use "0" para desligar.
+COLLABORATORS_SIDECAR_ENABLED = os.getenv("COLLABORATORS_SIDECAR_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+
 # Departamentos usados no dropdown quando a planilha não tem coluna Departamentos (pode editar)
 FALLBACK_DEPARTMENTS = ["COMERCIAL", "DTC", "GI", "RNA"]
 
+# Cache de exportações geradas (arquivo final), em disco e limitado por tamanho (LRU).
+# Períodos já encerrados (ex: "Mês passado") ficam mais tempo; períodos em aberto expiram rápido.
+EXPORT_CACHE_ENABLED = os.getenv("EXPORT_CACHE_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR") or os.path.join(_PROJECT_DIR, ".cache", "exports")
+EXPORT_CACHE_MAX_MB = int(os.getenv("EXPORT_CACHE_MAX_MB", "200"))
+EXPORT_CACHE_TTL_CLOSED = int(os.getenv("EXPORT_CACHE_TTL_CLOSED", "86400"))  # segundos (24h)
+EXPORT_CACHE_TTL_OPEN = int(os.getenv("EXPORT_CACHE_TTL_OPEN", "300"))  # segundos (5 min)
+
+# Diretório de usuários do Bitrix (user.get / department.get), opcional: completa a planilha com os
+# nomes/departamentos de quem não está nela (evita "USER_<id>" na exportação). Cache local em JSON.
+BITRIX_DIRECTORY_ENABLED = os.getenv("BITRIX_DIRECTORY_ENABLED", "0").strip().lower() in ("1", "true", "yes")
+BITRIX_DIRECTORY_CACHE = os.getenv("BITRIX_DIRECTORY_CACHE") or os.path.join(_PROJECT_DIR, ".cache", "bitrix_directory.json")
+BITRIX_DIRECTORY_REFRESH = int(os.getenv("BITRIX_DIRECTORY_REFRESH", "21600"))  # segundos entre sincronizações (6h)
+
+# Tarefas processadas por bloco no pipeline de exportação (enriquecimento + lançamentos + linhas)
+EXPORT_CHUNK_TASKS = int(os.getenv("EXPORT_CHUNK_TASKS", "200"))
+
+# Linhas do Excel montadas por coluna (export_frame, DataFrame) em vez de linha a linha; as tarefas
+# dos blocos são acumuladas até EXPORT_FRAME_BATCH_TASKS antes de cada montagem (blocos pequenos não compensam)
+EXPORT_COLUMNAR_ROWS = os.getenv("EXPORT_COLUMNAR_ROWS", "1").strip().lower() not in ("0", "false", "no")
+EXPORT_FRAME_BATCH_TASKS = int(os.getenv("EXPORT_FRAME_BATCH_TASKS", "5000"))
+
+# Exportação gerada em buffer de memória; acima deste tamanho o buffer passa para um arquivo temporário
+EXPORT_SPOOL_MAX_MB = int(os.getenv("EXPORT_SPOOL_MAX_MB", "16"))
+
+# Escrita do Excel em memória constante (openpyxl write-only + ordenação externa em blocos)
+EXCEL_STREAMING_MIN_ROWS = int(os.getenv("EXCEL_STREAMING_MIN_ROWS", "50000"))  # a partir de quantas linhas usar
+EXCEL_STREAM_CHUNK_ROWS = int(os.getenv("EXCEL_STREAM_CHUNK_ROWS", "50000"))  # linhas por bloco ordenado
+
+# Profiling das exportações (cProfile): EXPORT_PROFILE=1 liga para todas; administradores também podem
+# pedir pelo formulário e a CLI por --profile. Os profiles ficam em EXPORT_PROFILE_DIR/export_<id>.prof
+EXPORT_PROFILE = os.getenv("EXPORT_PROFILE", "0").strip().lower() in ("1", "true", "yes")
+EXPORT_PROFILE_DIR = os.getenv("EXPORT_PROFILE_DIR") or os.path.join(_PROJECT_DIR, ".cache", "profiles")
+EXPORT_PROFILE_TOP = int(os.getenv("EXPORT_PROFILE_TOP", "25"))  # funções listadas no log
+
+# Endpoint /metrics (formato Prometheus): exige "Authorization: Bearer <METRICS_TOKEN>"; sem METRICS_TOKEN
+# o endpoint fica desligado (responde 404), já que as demais rotas exigem sessão e o app é público
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+METRICS_TOKEN = (os.getenv("METRICS_TOKEN") or "").strip()
+# Intervalo (segundos) da medição do atraso do event loop do servidor web (métrica event_loop_lag_seconds); 0 desliga
+EVENT_LOOP_MONITOR_INTERVAL = float(os.getenv("EVENT_LOOP_MONITOR_INTERVAL", "0.25"))
+
+# Gravação/reprodução das requisições ao Bitrix (bitrix_cassette.py): "record" grava requisições e respostas
+# (sem o token) em BITRIX_CASSETTE; "replay" responde a partir do arquivo, sem rede. BITRIX_CASSETTE_TIMING
+# reproduz a duração original de cada resposta multiplicada pelo fator (0 = responder na hora)
+BITRIX_CASSETTE_MODE = (os.getenv("BITRIX_CASSETTE_MODE") or "").strip().lower()
+BITRIX_CASSETTE = os.getenv("BITRIX_CASSETTE") or os.path.join(_PROJECT_DIR, ".cache", "bitrix_cassette.jsonl.gz")
+BITRIX_CASSETTE_TIMING = float(os.getenv("BITRIX_CASSETTE_TIMING", "0"))
+
+# Cache compartilhado (SQLite, compactado) das respostas de leitura do Bitrix por comando (método + parâmetros),
+# usado pelo BitrixClient entre exportações, workers e execuções da CLI. Só os métodos com TTL entram
+# (BITRIX_RESPONSE_CACHE_TTLS: "método=segundos,..."); "Ignorar cache" na exportação ignora também este cache.
+BITRIX_RESPONSE_CACHE_ENABLED = os.getenv("BITRIX_RESPONSE_CACHE_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+BITRIX_RESPONSE_CACHE_PATH = os.getenv("BITRIX_RESPONSE_CACHE_PATH") or os.path.join(_PROJECT_DIR, ".cache", "bitrix_responses.sqlite3")
+BITRIX_RESPONSE_CACHE_MAX_MB = int(os.getenv("BITRIX_RESPONSE_CACHE_MAX_MB", "200"))
+BITRIX_RESPONSE_CACHE_TTLS = os.getenv("BITRIX_RESPONSE_CACHE_TTLS", "tasks.task.get=300,task.elapseditem.getlist=300")
+# Detalhes normalizados de tarefas, no mesmo arquivo, validados pelo changedDate da listagem: uma tarefa só é
+# buscada de novo (tasks.task.get) quando mudou no Bitrix. O prazo só limita quanto tempo uma entrada sem uso
+# fica guardada (0 desabilita).
+TASK_DETAIL_CACHE_TTL_DAYS = float(os.getenv("TASK_DETAIL_CACHE_TTL_DAYS", "30"))
+
 
 def validate_config():
     """Valida se as configurações obrigatórias estão presentes."""
+    if BITRIX_CASSETTE_MODE == "replay":
+        # Respostas vêm do cassette gravado; o webhook não é usado
+        return True
+    
     if not BITRIX_WEBHOOK_BASE:
         raise ValueError(
             "BITRIX_WEBHOOK_BASE não encontrado no arquivo .env. "
@@ -0,0 +1,170 @@
+"""Datas do Bitrix24: formatação para exibição e normalização ISO8601, com memo dos valores já vistos.
+
+O Bitrix devolve poucos formatos fixos e muitos valores repetidos (a mesma data de criação ou de
+lançamento aparece em várias linhas). Por isso:
+
+- textos já convertidos ficam num memo limitado (LRU de MEMO_SIZE valores por função);
+- datas ISO (2025-04-28T13:56:00+03:00) são lidas por posição fixa, sem regex nem strptime;
+- nos demais formatos, o último formato que funcionou em cada campo (created_date, closed_date...)
+  é tentado primeiro.
+
+Os resultados são os mesmos das versões anteriores (regex + strptime em DISPLAY_INPUT_FORMATS).
+"""
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict
+
+from config import DEFAULT_TIMEZONE
+from metrics import register_collector
+
+# Quantidade de textos distintos lembrados por função (LRU)
+MEMO_SIZE = 65536
+
+# Formatos de entrada aceitos por format_display_date, na ordem em que eram tentados
+DISPLAY_INPUT_FORMATS = ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%d/%m/%Y %H:%M", "%d/%m/%Y")
+DISPLAY_FORMAT = "%d/%m/%Y %H:%M"
+
+_ISO_PREFIX_RE = re.compile(r"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})")
+
+# Último formato de DISPLAY_INPUT_FORMATS que funcionou, por campo de origem
+_format_by_field: Dict[str, str] = {}
+
+
+def _iso_fast_path(text: str):
+    """
+    Lê "YYYY-MM-DDTHH:MM:SS..." por posição. Retorna o texto formatado, o prefixo de 19 caracteres
+    (data com layout ISO mas inválida, como fazia o strptime) ou None se o layout não é ISO.
+    """
+    if len(text) < 19 or text[4] != "-" or text[7] != "-" or text[10] != "T" or text[13] != ":" or text[16] != ":":
+        return None
+    digits = text[0:4] + text[5:7] + text[8:10] + text[11:13] + text[14:16] + text[17:19]
+    if not (digits.isascii() and digits.isdigit()):
+        return None
+    year = int(text[0:4])
+    if year < 1000:
+        return None  # strftime não completa anos com zeros em todas as plataformas: caminho normal
+    try:
+        datetime(year, int(text[5:7]), int(text[8:10]), int(text[11:13]), int(text[14:16]), int(text[17:19]))
+    except ValueError:
+        return text[:19]
+    return f"{text[8:10]}/{text[5:7]}/{text[0:4]} {text[11:13]}:{text[14:16]}"
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _format_display_text(text: str, field: str) -> str:
+    fast = _iso_fast_path(text)
+    if fast is not None:
+        return fast
+
+    # ISO com timezone ou frações: usar prefixo até os segundos
+    head = text.replace("Z", "").split(".")[0]
+    m = _ISO_PREFIX_RE.match(head)
+    if m:
+        text = m.group(1)
+    candidate = text.replace("Z", "").split(".")[0]
+
+    # Um texto só pode casar com um dos formatos, então a ordem de tentativa não muda o resultado
+    hinted = _format_by_field.get(field)
+    formats = DISPLAY_INPUT_FORMATS if hinted is None else (hinted,) + DISPLAY_INPUT_FORMATS
+    for fmt in formats:
+        try:
+            dt = datetime.strptime(candidate, fmt)
+        except ValueError:
+            continue
+        if fmt != hinted:
+            _format_by_field[field] = fmt
+        return dt.strftime(DISPLAY_FORMAT)
+    return text
+
+
+def format_display_date(value: Any, field: str = "") -> str:
+    """
+    Formata data do Bitrix para exibição (ex: 28/04/2025 13:56).
+
+    Aceita ISO (com ou sem timezone/frações), "YYYY-MM-DD HH:MM[:SS]", "YYYY-MM-DD" e "DD/MM/YYYY[ HH:MM]";
+    textos em outro formato são devolvidos sem espaços nas bordas.
+
+    Args:
+        value: Data como veio da API (vazio/None = "")
+        field: Campo de origem (ex: "created_date"), usado para lembrar o formato daquele campo
+    """
+    if not value:
+        return ""
+    text = str(value).strip()
+    if not text:
+        return ""
+    return _format_display_text(text, field)
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _normalize_iso8601_text(date_str: str, default_tz: str) -> str:
+    # Se já está no formato correto com timezone completo, retornar como está
+    # Formato: YYYY-MM-DDTHH:MM:SS+TZ ou YYYY-MM-DDTHH:MM:SS-TZ
+    if len(date_str) >= 25 and ("+" in date_str[-6:] or (date_str[-6:].startswith("-") and ":" in date_str[-5:])):
+        return date_str
+
+    # Se termina com Z, substituir por timezone padrão
+    if date_str.endswith("Z"):
+        return date_str[:-1] + default_tz
+
+    # Se tem formato YYYY-MM-DDTHH:MM mas sem segundos/timezone
+    if "T" in date_str:
+        parts = date_str.split("T")
+        if len(parts) == 2:
+            date_part = parts[0]
+            time_part = parts[1]
+
+            # Se time_part não tem segundos, adicionar :00
+            if ":" in time_part and time_part.count(":") == 1:
+                time_part = time_part + ":00"
+
+            # Remover qualquer timezone parcial que possa estar presente
+            if "+" in time_part:
+                time_part = time_part.split("+")[0]
+            elif "-" in time_part and len(time_part.split("-")) > 2:
+                # Pode ter timezone no meio, pegar só a parte do tempo
+                time_parts = time_part.split("-")
+                if len(time_parts) > 2:
+                    time_part = "-".join(time_parts[:-1])
+
+            # Se não tem timezone no final, adicionar
+            if not (time_part.endswith("+03:00") or time_part.endswith("-03:00") or
+                    (len(time_part) > 6 and (time_part[-6:].startswith("+") or time_part[-6:].startswith("-")))):
+                time_part = time_part + default_tz
+
+            return f"{date_part}T{time_part}"
+    else:
+        # Apenas data (YYYY-MM-DD), adicionar hora e timezone
+        return date_str + "T00:00:00" + default_tz
+
+    return date_str
+
+
+def normalize_iso8601(date_str: str, default_tz: str = DEFAULT_TIMEZONE) -> str:
+    """
+    Normaliza string ISO8601 para formato aceito pela API Bitrix24.
+
+    A API Bitrix24 aceita datas no formato ISO8601: YYYY-MM-DDTHH:MM:SS+TZ
+    Algumas versões podem aceitar sem timezone também.
+
+    Args:
+        date_str: String de data no formato ISO8601
+        default_tz: Timezone padrão a adicionar (ex: "-03:00")
+
+    Returns:
+        String ISO8601 normalizada no formato aceito pela API
+    """
+    if not date_str:
+        return ""
+    return _normalize_iso8601_text(date_str.strip(), default_tz)
+
+
+def _memo_stats():
+    """(memo, acertos, faltas) dos memos deste módulo, para /metrics."""
+    for name, memo in (("date_display", _format_display_text), ("date_iso8601", _normalize_iso8601_text)):
+        info = memo.cache_info()
+        yield name, info.hits, info.misses
+
+
+register_collector(_memo_stats)
@@ -1,17 +1,40 @@
 """Manipulação de arquivos Excel: leitura de colaboradores e escrita de tarefas."""
-import pandas as pd
-from typing import Dict, List, Any
+import hashlib
+import heapq
+import json
+import math
+import os
+import pickle
+import sys
+import tempfile
+from typing import TYPE_CHECKING, Dict, List, Any, BinaryIO, Iterable, Iterator, Optional, Sequence, Tuple, Union
 import logging
+from config import COLLABORATORS_SIDECAR_ENABLED, EXCEL_STREAMING_MIN_ROWS, EXCEL_STREAM_CHUNK_ROWS
+from metrics import record_cache
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas é importado sob demanda: a leitura da planilha de colaboradores usa apenas openpyxl,
+# o que evita ~0,5s de import na inicialização da CLI e do servidor
 
 logger = logging.getLogger(__name__)
 
 
-def read_collaborators_sheet(path: str) -> Dict[int, Dict[str, str]]:
+def read_collaborators_sheet(path: str, use_sidecar: Optional[bool] = None) -> Dict[int, Dict[str, str]]:
     """
     Lê a planilha de colaboradores e retorna mapeamento ID -> {name, dept}.
     
+    Lê o .xlsx diretamente com openpyxl (modo read-only, sem pandas). Se o arquivo não puder
+    ser aberto pelo openpyxl (ex: .xls antigo), usa pandas.read_excel como alternativa.
+    
+    O resultado é guardado em uma cópia compilada ao lado da planilha (ver collaborators_sidecar_path);
+    nas leituras seguintes, se a planilha não mudou (mesmo mtime/tamanho, ou mesmo hash), o
+    mapeamento vem direto dessa cópia, sem abrir o .xlsx.
+    
     Args:
         path: Caminho para o arquivo "Planilha de colaboradores.xlsx"
+        use_sidecar: Usar/gravar a cópia compilada (padrão: COLLABORATORS_SIDECAR_ENABLED)
         
     Returns:
         Dicionário no formato {user_id: {"name": str, "dept": str}}
@@ -20,20 +43,145 @@ def read_collaborators_sheet(path: str) -> Dict[int, Dict[str, str]]:
         FileNotFoundError: Se o arquivo não existir
         ValueError: Se as colunas obrigatórias não existirem
     """
+    if use_sidecar is None:
+        use_sidecar = COLLABORATORS_SIDECAR_ENABLED
+    if not use_sidecar:
+        return _parse_collaborators_sheet(path)
+    
     try:
-        df = pd.read_excel(path)
+        st = os.stat(path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Arquivo não encontrado: {path}")
+    
+    source_hash = None
+    sidecar = _load_collaborators_sidecar(path)
+    if sidecar is not None:
+        header, collaborators_map = sidecar
+        if header["size"] == st.st_size and header["mtime_ns"] == st.st_mtime_ns:
+            record_cache("collaborators_sidecar", "hit")
+            logger.info(f"Carregados {len(collaborators_map)} colaboradores (cópia compilada da planilha)")
+            return collaborators_map
+        if header["size"] == st.st_size:
+            # mtime mudou (cópia, checkout, touch): vale se o conteúdo for o mesmo
+            source_hash = _file_sha256(path)
+            if source_hash == header["sha256"]:
+                record_cache("collaborators_sidecar", "hit")
+                _write_collaborators_sidecar(path, st, source_hash, collaborators_map)
+                logger.info(f"Carregados {len(collaborators_map)} colaboradores (cópia compilada da planilha)")
+                return collaborators_map
+    
+    record_cache("collaborators_sidecar", "miss")
+    # Hash antes da leitura: se a planilha mudar no meio, a cópia fica com o hash antigo e é refeita depois
+    source_hash = source_hash or _file_sha256(path)
+    collaborators_map = _parse_collaborators_sheet(path)
+    _write_collaborators_sidecar(path, st, source_hash, collaborators_map)
+    return collaborators_map
+
+
+# Versão do formato da cópia compilada: incrementar quando o conteúdo ou as regras de leitura mudarem
+# (2: JSON em vez de pickle, já que a pasta da planilha pode ser compartilhada)
+COLLABORATORS_SIDECAR_VERSION = 2
+
+
+def collaborators_sidecar_path(path: str) -> str:
+    """Caminho da cópia compilada da planilha: arquivo oculto na mesma pasta (".<nome>.sidecar")."""
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, f".{name}.sidecar")
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_collaborators_sidecar(path: str) -> Optional[Tuple[Dict[str, Any], Dict[int, Dict[str, str]]]]:
+    """
+    Lê a cópia compilada: JSON com "header" e "collaborators" ({id: {name, dept}}).
+    
+    O arquivo fica na pasta da planilha, que pode ser compartilhada; por isso é só JSON (nada é
+    executado na leitura) e cada entrada é conferida antes de ser usada.
+    
+    Returns:
+        Tuple (cabeçalho com mtime_ns/size/sha256, mapeamento) ou None se ausente, de outra versão ou corrompida
+    """
+    try:
+        with open(collaborators_sidecar_path(path), "rb") as f:
+            data = json.loads(f.read())
+        header = data["header"]
+        if not isinstance(header, dict) or header.get("version") != COLLABORATORS_SIDECAR_VERSION:
+            return None
+        collaborators_map = {}
+        for user_id, info in data["collaborators"].items():
+            name, dept = info["name"], info["dept"]
+            if not isinstance(name, str) or not isinstance(dept, str):
+                raise ValueError(f"colaborador {user_id} com nome ou departamento inválido")
+            collaborators_map[int(user_id)] = {"name": name, "dept": dept}
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Cópia compilada da planilha ignorada (inválida): {e}")
+        return None
+    return header, collaborators_map
+
+
+def _write_collaborators_sidecar(
+    path: str,
+    st: os.stat_result,
+    source_hash: str,
+    collaborators_map: Dict[int, Dict[str, str]]
+) -> None:
+    """Grava a cópia compilada de forma atômica; falhas (ex: pasta somente leitura) só geram log."""
+    sidecar_path = collaborators_sidecar_path(path)
+    header = {
+        "version": COLLABORATORS_SIDECAR_VERSION,
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "sha256": source_hash,
+    }
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(sidecar_path), suffix=".tmp")
+        data = {"header": header, "collaborators": {str(user_id): info for user_id, info in collaborators_map.items()}}
+        with os.fdopen(fd, "wb") as f:
+            f.write(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        os.replace(tmp_path, sidecar_path)
+    except OSError as e:
+        logger.debug(f"Não foi possível gravar a cópia compilada da planilha ({sidecar_path}): {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _parse_collaborators_sheet(path: str) -> Dict[int, Dict[str, str]]:
+    """Lê a planilha de fato (openpyxl; pandas como alternativa), sem usar a cópia compilada."""
+    try:
+        header, rows = _load_sheet_rows(path)
     except FileNotFoundError:
         raise FileNotFoundError(f"Arquivo não encontrado: {path}")
     except Exception as e:
-        raise ValueError(f"Erro ao ler planilha: {e}")
+        logger.info(f"Planilha não pôde ser lida com openpyxl ({e}); usando pandas")
+        return _read_collaborators_pandas(path)
     
-    # Normalizar nomes de colunas (strip e aceitar variações)
-    df.columns = [str(c).strip() for c in df.columns]
+    collaborators_map = _collaborators_from_rows(header, rows)
+    logger.info(f"Carregados {len(collaborators_map)} colaboradores da planilha")
+    return collaborators_map
+
+
+def _find_collaborator_columns(columns: Sequence[str]) -> Tuple[str, str, Optional[str]]:
+    """
+    Localiza as colunas de ID, nome e departamento (aceita plural ou singular).
     
-    # Mapear colunas obrigatórias (aceitar plural ou singular)
-    def _find_col(choices: list) -> str:
+    Returns:
+        Tuple (coluna de ID, coluna de nome, coluna de departamento ou None)
+        
+    Raises:
+        ValueError: Se as colunas de ID ou nome não existirem
+    """
+    def _find_col(choices: list) -> Optional[str]:
         for c in choices:
-            if c in df.columns:
+            if c in columns:
                 return c
         return None
     
@@ -44,42 +192,220 @@ def read_collaborators_sheet(path: str) -> Dict[int, Dict[str, str]]:
     if not col_id or not col_name:
         raise ValueError(
             f"Colunas obrigatórias não encontradas. Precisa de: IDs (ou ID) e Colaboradores (ou Colaborador/Nome completo/Nome). "
-            f"Colunas encontradas: {list(df.columns)}"
+            f"Colunas encontradas: {list(columns)}"
         )
     
     if not col_dept:
-        col_dept = None  # departamento opcional, preencher vazio
         logger.warning("Coluna 'Departamentos' ou 'Departamento' não encontrada na planilha. Filtro por departamento não funcionará.")
     
-    # Criar mapeamento
-    collaborators_map = {}
+    return col_id, col_name, col_dept
+
+
+def _read_collaborators_pandas(path: str) -> Dict[int, Dict[str, str]]:
+    """Leitura via pandas.read_excel (alternativa para arquivos que o openpyxl não abre)."""
+    import pandas as pd
     
-    for _, row in df.iterrows():
-        user_id = row[col_id]
-        
-        # Pular linhas com ID inválido
-        if pd.isna(user_id):
-            continue
-        
+    try:
+        df = pd.read_excel(path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Arquivo não encontrado: {path}")
+    except Exception as e:
+        raise ValueError(f"Erro ao ler planilha: {e}")
+    
+    # Normalizar nomes de colunas (strip e aceitar variações)
+    df.columns = [str(c).strip() for c in df.columns]
+    col_id, col_name, col_dept = _find_collaborator_columns(list(df.columns))
+    
+    collaborators_map = _collaborators_from_columns(df[col_id], df[col_name], df[col_dept] if col_dept else None)
+    
+    logger.info(f"Carregados {len(collaborators_map)} colaboradores da planilha")
+    return collaborators_map
+
+
+# Textos que pandas.read_excel trata como célula vazia (na_values padrão), replicados na leitura via openpyxl
+_NA_STRINGS = frozenset([
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+])
+
+
+def _load_sheet_rows(path: str) -> Tuple[List[str], List[Tuple]]:
+    """
+    Lê a primeira aba com openpyxl (read-only, valores calculados).
+    
+    Returns:
+        Tuple (cabeçalho normalizado com strip, linhas não vazias com o mesmo tamanho do cabeçalho).
+        Células vazias ou com textos de _NA_STRINGS viram None.
+    """
+    from openpyxl import load_workbook
+    
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.worksheets[0]
+        rows_iter = worksheet.iter_rows(values_only=True)
+        header_cells = next(rows_iter, ())
+        header = [
+            str(c).strip() if c is not None else f"Unnamed: {i}"
+            for i, c in enumerate(header_cells)
+        ]
+        width = len(header)
+        rows = []
+        for raw in rows_iter:
+            row = tuple(
+                None if v is None or (isinstance(v, str) and v in _NA_STRINGS) else v
+                for v in raw[:width]
+            )
+            if all(v is None for v in row):
+                continue  # pandas ignora linhas em branco
+            if len(row) < width:
+                row = row + (None,) * (width - len(row))
+            rows.append(row)
+    finally:
+        workbook.close()
+    return header, rows
+
+
+def _as_number(value: Any) -> Optional[float]:
+    """Valor numérico da célula (número ou texto numérico), ou None se não for número."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str) and "_" not in value:
         try:
-            user_id = int(user_id)
-        except (ValueError, TypeError):
-            logger.warning(f"ID inválido na planilha: {user_id}. Pulando linha.")
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _infer_column(values: List[Any]) -> List[Any]:
+    """
+    Inferência de tipo por coluna, como no pandas: se todos os valores preenchidos forem numéricos
+    (inclusive texto numérico), a coluna vira int (sem vazios e só inteiros) ou float.
+    """
+    numbers = []
+    for v in values:
+        if v is None:
             continue
-        
-        name = str(row[col_name]) if not pd.isna(row[col_name]) else f"USER_{user_id}"
-        name = name.strip() if name else f"USER_{user_id}"
-        dept = str(row[col_dept]).strip() if col_dept and not pd.isna(row[col_dept]) else ""
-        
+        number = _as_number(v)
+        if number is None:
+            return values
+        numbers.append(number)
+    if not numbers:
+        return values
+    integral = len(numbers) == len(values) and all(
+        isinstance(n, int) or (math.isfinite(n) and n == int(n)) for n in numbers
+    )
+    if integral:
+        return [int(_as_number(v)) for v in values]
+    return [None if v is None else float(_as_number(v)) for v in values]
+
+
+def _collaborators_from_rows(header: List[str], rows: List[Tuple]) -> Dict[int, Dict[str, str]]:
+    """
+    Monta o mapeamento ID -> {name, dept} a partir das linhas lidas pelo openpyxl.
+    
+    Mesmas regras de _collaborators_from_columns (leitura via pandas): linhas com ID vazio são
+    ignoradas; IDs que int() não aceitaria geram o aviso "ID inválido" e são ignorados; nome
+    vazio vira "USER_<id>"; departamento vazio vira "". IDs repetidos: vale a última linha.
+    """
+    col_id, col_name, col_dept = _find_collaborator_columns(header)
+    
+    def _column(col: Optional[str]) -> List[Any]:
+        if col is None:
+            return [None] * len(rows)
+        idx = header.index(col)
+        return _infer_column([row[idx] for row in rows])
+    
+    ids = _column(col_id)
+    names = _column(col_name)
+    depts = _column(col_dept)
+    
+    collaborators_map = {}
+    for raw_id, name, dept in zip(ids, names, depts):
+        if raw_id is None:
+            continue
+        user_id = _parse_collaborator_id(raw_id)
+        if user_id is None:
+            logger.warning(f"ID inválido na planilha: {raw_id}. Pulando linha.")
+            continue
+        name_text = "" if name is None else str(name)
         collaborators_map[user_id] = {
-            "name": name,
-            "dept": dept
+            "name": name_text.strip() if name_text != "" else f"USER_{user_id}",
+            "dept": "" if dept is None else str(dept).strip(),
         }
-    
-    logger.info(f"Carregados {len(collaborators_map)} colaboradores da planilha")
     return collaborators_map
 
 
+def _parse_collaborator_id(value: Any) -> Optional[int]:
+    """ID como int (mesmo critério de int(): float trunca, texto só se for inteiro literal), ou None se inválido."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value) if math.isfinite(value) else None
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return None
+    return None
+
+
+# ID aceito quando vem como texto: mesmo critério de int() (inteiro com sinal opcional e espaços nas bordas)
+_INT_LITERAL_PATTERN = r"\s*[+-]?\d+\s*"
+
+
+def _collaborators_from_columns(
+    ids: "pd.Series",
+    names: "pd.Series",
+    depts: Optional["pd.Series"]
+) -> Dict[int, Dict[str, str]]:
+    """
+    Monta o mapeamento ID -> {name, dept} de forma vetorizada (sem iterar linha a linha).
+    
+    Regras: linhas com ID vazio são ignoradas; IDs que int() não aceitaria geram o aviso
+    "ID inválido" e são ignorados; nome vazio vira "USER_<id>"; departamento vazio vira "".
+    IDs repetidos: vale a última linha.
+    """
+    import pandas as pd
+    
+    present = ids.notna()
+    numeric = pd.to_numeric(ids, errors="coerce")
+    invalid = present & (numeric.isna() | numeric.isin([float("inf"), float("-inf")]))
+    if not pd.api.types.is_numeric_dtype(ids):
+        # Texto só vale se for um inteiro literal (ex: "12"); "4.0" ou "abc" são inválidos
+        is_text = ids.map(lambda v: isinstance(v, str)).astype(bool)
+        if is_text.any():
+            text_ok = ids[is_text].astype(str).str.fullmatch(_INT_LITERAL_PATTERN).astype(bool)
+            invalid.loc[text_ok.index[~text_ok]] = True
+    
+    for value in ids[invalid].tolist():
+        logger.warning(f"ID inválido na planilha: {value}. Pulando linha.")
+    
+    valid = present & ~invalid
+    user_ids = numeric[valid].astype("int64")  # float -> int trunca, como int()
+    
+    names = names[valid]
+    names_text = names.astype(str)
+    fallback = "USER_" + user_ids.astype(str)
+    names_text = names_text.str.strip().where(names.notna() & (names_text != ""), fallback)
+    
+    if depts is not None:
+        depts = depts[valid]
+        depts_text = depts.astype(str).str.strip().where(depts.notna(), "")
+        depts_list = depts_text.tolist()
+    else:
+        depts_list = [""] * len(user_ids)
+    
+    return {
+        user_id: {"name": name, "dept": dept}
+        for user_id, name, dept in zip(user_ids.tolist(), names_text.tolist(), depts_list)
+    }
+
+
 # Ordem e lista fixa de colunas da planilha exportada (garante "Data do lançamento" sempre presente)
 EXCEL_EXPORT_COLUMNS = [
     "Task_ID",
@@ -101,16 +427,123 @@ EXCEL_EXPORT_COLUMNS = [
 ]
 
 
-def write_tasks_excel(tasks_data: List[Dict[str, Any]], output_path: str):
+# Largura mínima por coluna (para não truncar textos importantes no Excel)
+MIN_WIDTH_BY_COLUMN = {
+    "Comentário_Lançamento": 70,
+    "Título": 45,
+    "Quem_Lançou": 45,
+    "Participantes": 40,
+    "Responsável": 20,
+}
+MAX_WIDTH_DEFAULT = 50
+
+# Colunas de formato fixo (IDs, status, datas formatadas, tempos): largura pelo conteúdo típico, sem varrer os dados
+FIXED_CONTENT_LENGTH_BY_COLUMN = {
+    "Task_ID": 8,
+    "Status": 16,  # "Revisão pendente"
+    "Data de Conclusão": 16,  # "28/04/2025 13:56"
+    "Criada_Em": 16,
+    "Data do lançamento": 16,
+    "Deadline": 25,  # "2025-05-10T18:00:00+03:00"
+    "Atividade_em": 25,
+    "Tempo_Estimado": 12,  # "999h 59min"
+    "Tempo_Total_Gasto": 12,
+    "Tempo_Lançamento": 12,
+}
+# Acima deste número de linhas, a largura das demais colunas vem de uma amostra (percentil, ignora outliers)
+WIDTH_SAMPLE_ROWS = 20000
+WIDTH_PERCENTILE = 0.99
+
+
+def _column_width(col: str, max_length: int) -> int:
+    """Largura final da coluna a partir do maior conteúdo (limites mínimo/máximo por coluna)."""
+    max_length = max(max_length, len(str(col)))
+    min_for_col = MIN_WIDTH_BY_COLUMN.get(col, 0)
+    width = max(max_length + 2, min_for_col)
+    return min(width, MAX_WIDTH_DEFAULT if col not in MIN_WIDTH_BY_COLUMN else 80)
+
+
+def _series_lengths(series: "pd.Series") -> "pd.Series":
+    """Comprimento (em caracteres) de cada valor, vetorizado; só converte para str o que não é texto."""
+    import pandas as pd
+    
+    if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+        return series.astype(str).str.len()
+    lengths = series.str.len()
+    missing = lengths.isna()
+    if missing.any():
+        lengths = lengths.astype("float64")
+        lengths[missing] = series[missing].astype(str).str.len()
+    return lengths
+
+
+def compute_column_widths(df: "pd.DataFrame") -> Dict[str, int]:
+    """
+    Calcula a largura de cada coluna do Excel.
+    
+    Colunas de formato fixo usam FIXED_CONTENT_LENGTH_BY_COLUMN. As demais usam o maior
+    comprimento (vetorizado); em DataFrames com mais de WIDTH_SAMPLE_ROWS linhas, usa o
+    percentil WIDTH_PERCENTILE de uma amostra determinística.
+    
+    Returns:
+        Dicionário {coluna: largura}
+    """
+    sampled = len(df) > WIDTH_SAMPLE_ROWS
+    data = df.sample(n=WIDTH_SAMPLE_ROWS, random_state=0) if sampled else df
+    widths = {}
+    for col in df.columns:
+        if col in FIXED_CONTENT_LENGTH_BY_COLUMN:
+            widths[col] = _column_width(col, FIXED_CONTENT_LENGTH_BY_COLUMN[col])
+            continue
+        if len(data) == 0:
+            widths[col] = _column_width(col, 0)
+            continue
+        lengths = _series_lengths(data[col])
+        max_length = lengths.quantile(WIDTH_PERCENTILE) if sampled else lengths.max()
+        widths[col] = _column_width(col, int(math.ceil(max_length)))
+    return widths
+
+
+def write_tasks_excel(
+    tasks_data: Iterable[Dict[str, Any]],
+    output: Union[str, BinaryIO],
+    streaming: Optional[bool] = None
+):
     """
     Gera arquivo Excel com as tarefas exportadas.
     
     Args:
-        tasks_data: Lista de dicionários, cada um representando uma linha do Excel.
+        tasks_data: Lista (ou iterável) de dicionários, cada um representando uma linha do Excel,
+                    ou DataFrame com as colunas de EXCEL_EXPORT_COLUMNS (export_frame).
                     Cada tarefa pode ter múltiplas linhas (uma por lançamento de tempo).
-        output_path: Caminho onde salvar o arquivo Excel
+        output: Caminho onde salvar o arquivo Excel, ou stream binário gravável
+                (BytesIO, SpooledTemporaryFile...). O stream não é fechado.
+        streaming: True = modo de memória constante (write_tasks_excel_streaming);
+                   False = DataFrame + openpyxl normal; None = automático (streaming para
+                   iteráveis que não são lista e para listas com EXCEL_STREAMING_MIN_ROWS
+                   linhas ou mais)
     """
-    if not tasks_data:
+    # DataFrame já montado (export_frame.combine_tasks_frame): usado direto, sem passar por dicionários
+    pandas_module = sys.modules.get("pandas")
+    frame = tasks_data if pandas_module is not None and isinstance(tasks_data, pandas_module.DataFrame) else None
+    if streaming is None:
+        if frame is not None:
+            streaming = len(frame) >= EXCEL_STREAMING_MIN_ROWS
+        else:
+            streaming = not isinstance(tasks_data, list) or len(tasks_data) >= EXCEL_STREAMING_MIN_ROWS
+    if streaming:
+        if frame is not None:
+            tasks_data = frame.reindex(columns=EXCEL_EXPORT_COLUMNS, fill_value="").itertuples(index=False, name=None)
+        write_tasks_excel_streaming(tasks_data, output)
+        return
+    
+    import pandas as pd
+    
+    if frame is not None:
+        df = frame.reindex(columns=EXCEL_EXPORT_COLUMNS, fill_value="")
+        if df.empty:
+            logger.warning("Nenhuma tarefa para exportar. Criando Excel vazio.")
+    elif not tasks_data:
         logger.warning("Nenhuma tarefa para exportar. Criando Excel vazio.")
         df = pd.DataFrame(columns=EXCEL_EXPORT_COLUMNS)
     else:
@@ -123,31 +556,135 @@ def write_tasks_excel(tasks_data: List[Dict[str, Any]], output_path: str):
     # Ordenar por Task_ID descendente
     if "Task_ID" in df.columns:
         df = df.sort_values("Task_ID", ascending=False)
-    
-    # Largura mínima por coluna (para não truncar textos importantes no Excel)
-    MIN_WIDTH_BY_COLUMN = {
-        "Comentário_Lançamento": 70,
-        "Título": 45,
-        "Quem_Lançou": 45,
-        "Participantes": 40,
-        "Responsável": 20,
-    }
-    MAX_WIDTH_DEFAULT = 50
 
     # Salvar Excel
-    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
         df.to_excel(writer, sheet_name="Tarefas", index=False)
         
         # Ajustar largura das colunas (evitar truncar "Comentário" / "Quem_Lançou" etc.)
         worksheet = writer.sheets["Tarefas"]
+        widths = compute_column_widths(df)
         for idx, col in enumerate(df.columns, 1):
-            max_length = max(
-                df[col].astype(str).map(len).max() if len(df) > 0 else 0,
-                len(str(col))
-            )
-            min_for_col = MIN_WIDTH_BY_COLUMN.get(col, 0)
-            width = max(max_length + 2, min_for_col)
-            width = min(width, MAX_WIDTH_DEFAULT if col not in MIN_WIDTH_BY_COLUMN else 80)
-            worksheet.column_dimensions[worksheet.cell(1, idx).column_letter].width = width
+            worksheet.column_dimensions[worksheet.cell(1, idx).column_letter].width = widths[col]
     
-    logger.info(f"Excel exportado com sucesso: {output_path} ({len(df)} linhas)")
+    destination = output if isinstance(output, str) else "stream"
+    logger.info(f"Excel exportado com sucesso: {destination} ({len(df)} linhas)")
+
+
+# Linhas por pickle.dump nos blocos temporários do modo streaming
+_SPILL_BATCH_ROWS = 1000
+
+
+def _task_id_sort_key(row: Tuple) -> Tuple[int, int]:
+    """Chave de ordenação por Task_ID descendente (linhas sem ID numérico vão para o final)."""
+    try:
+        return (0, -int(row[0]))
+    except (ValueError, TypeError):
+        return (1, 0)
+
+
+def _spill_chunk(rows: List[Tuple]) -> BinaryIO:
+    """Grava um bloco já ordenado em arquivo temporário (pickle em lotes) e o reposiciona no início."""
+    spill = tempfile.TemporaryFile()
+    for i in range(0, len(rows), _SPILL_BATCH_ROWS):
+        pickle.dump(rows[i:i + _SPILL_BATCH_ROWS], spill, protocol=pickle.HIGHEST_PROTOCOL)
+    spill.seek(0)
+    return spill
+
+
+def _read_spilled_chunk(spill: BinaryIO) -> Iterator[Tuple]:
+    """Relê as linhas de um bloco gravado por _spill_chunk."""
+    while True:
+        try:
+            batch = pickle.load(spill)
+        except EOFError:
+            return
+        yield from batch
+
+
+def write_tasks_excel_streaming(
+    tasks_data: Iterable[Dict[str, Any]],
+    output: Union[str, BinaryIO],
+    chunk_rows: Optional[int] = None
+):
+    """
+    Gera o Excel em memória constante (openpyxl write-only), mantendo a ordem por Task_ID descendente.
+    
+    As linhas são lidas em blocos de chunk_rows, normalizadas para EXCEL_EXPORT_COLUMNS e ordenadas;
+    quando há mais de um bloco, cada bloco ordenado vai para um arquivo temporário e a escrita
+    final faz um merge externo (heapq.merge). A largura das colunas é calculada durante a leitura
+    (primeiras WIDTH_SAMPLE_ROWS linhas, colunas de formato fixo não são medidas), pois no modo
+    write-only ela precisa ser definida antes da primeira linha.
+    
+    Args:
+        tasks_data: Iterável de dicionários, ExportRow ou tuplas na ordem de EXCEL_EXPORT_COLUMNS
+                    (uma linha do Excel cada), pode ser um gerador
+        output: Caminho do arquivo ou stream binário gravável (não é fechado)
+        chunk_rows: Linhas por bloco ordenado (padrão: EXCEL_STREAM_CHUNK_ROWS)
+    """
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    chunk_rows = chunk_rows or EXCEL_STREAM_CHUNK_ROWS
+    max_lengths = [0] * len(EXCEL_EXPORT_COLUMNS)
+    measured_columns = [
+        idx for idx, col in enumerate(EXCEL_EXPORT_COLUMNS) if col not in FIXED_CONTENT_LENGTH_BY_COLUMN
+    ]
+    spills: List[BinaryIO] = []
+    chunk: List[Tuple] = []
+    total_rows = 0
+
+    def _flush(rows: List[Tuple]) -> None:
+        rows.sort(key=_task_id_sort_key)
+        spills.append(_spill_chunk(rows))
+
+    try:
+        for row in tasks_data:
+            # Tuplas (linhas de um DataFrame) e linhas compactas (records.ExportRow) já vêm na ordem das colunas
+            if type(row) is tuple:
+                values = row
+            else:
+                as_tuple = getattr(row, "as_tuple", None)
+                values = as_tuple() if as_tuple is not None else tuple(row.get(col, "") for col in EXCEL_EXPORT_COLUMNS)
+            if total_rows < WIDTH_SAMPLE_ROWS:
+                for idx in measured_columns:
+                    length = len(str(values[idx]))
+                    if length > max_lengths[idx]:
+                        max_lengths[idx] = length
+            chunk.append(values)
+            total_rows += 1
+            if len(chunk) >= chunk_rows:
+                _flush(chunk)
+                chunk = []
+
+        if spills:
+            if chunk:
+                _flush(chunk)
+            chunk = []
+            ordered = heapq.merge(*(_read_spilled_chunk(s) for s in spills), key=_task_id_sort_key)
+        else:
+            chunk.sort(key=_task_id_sort_key)
+            ordered = iter(chunk)
+
+        if total_rows == 0:
+            logger.warning("Nenhuma tarefa para exportar. Criando Excel vazio.")
+
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet("Tarefas")
+        for idx, col in enumerate(EXCEL_EXPORT_COLUMNS, 1):
+            content_length = FIXED_CONTENT_LENGTH_BY_COLUMN.get(col, max_lengths[idx - 1])
+            worksheet.column_dimensions[get_column_letter(idx)].width = _column_width(col, content_length)
+        worksheet.append(EXCEL_EXPORT_COLUMNS)
+        for values in ordered:
+            # Mesmo comportamento do modo DataFrame: string vazia vira célula vazia
+            worksheet.append([None if v == "" else v for v in values])
+        workbook.save(output)
+    finally:
+        for spill in spills:
+            spill.close()
+
+    destination = output if isinstance(output, str) else "stream"
+    logger.info(
+        f"Excel exportado com sucesso (streaming): {destination} ({total_rows} linhas, "
+        f"{max(len(spills), 1)} bloco(s) ordenado(s))"
+    )
@@ -0,0 +1,248 @@
+"""Cache em disco das exportações geradas, com LRU limitado por tamanho e TTL por período."""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+from config import (
+    EXPORT_CACHE_ENABLED,
+    EXPORT_CACHE_DIR,
+    EXPORT_CACHE_MAX_MB,
+    EXPORT_CACHE_TTL_CLOSED,
+    EXPORT_CACHE_TTL_OPEN,
+)
+from date_parsing import normalize_iso8601
+from task_processor import _normalize_for_match
+from users_config import User
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato da chave: incrementar quando o conteúdo da exportação mudar (colunas, formatação)
+CACHE_KEY_VERSION = 1
+
+
+def _file_signature(path: Optional[str]) -> Optional[Tuple[float, int]]:
+    """Retorna (mtime, tamanho) do arquivo, ou None se não existir."""
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size)
+
+
+def build_cache_key(
+    user: User,
+    dept: Optional[str] = None,
+    user_substring: Optional[str] = None,
+    activity_from: Optional[str] = None,
+    activity_to: Optional[str] = None,
+    status: Optional[str] = None,
+    collaborators_file: Optional[str] = None,
+    export_format: str = "xlsx"
+) -> str:
+    """
+    Gera a chave do cache a partir dos filtros já resolvidos e do escopo de acesso do usuário.
+
+    Dois usuários com o mesmo escopo (ex: dois supervisores do mesmo departamento) compartilham
+    a mesma entrada. A assinatura da planilha de colaboradores entra na chave para que uma
+    planilha alterada invalide as exportações anteriores.
+
+    Returns:
+        Hash hexadecimal (sha256) da chave
+    """
+    if user.role == "admin":
+        access_scope = "admin"
+    else:
+        access_scope = sorted(d.strip().upper() for d in (user.allowed_departments or []))
+
+    material = {
+        "v": CACHE_KEY_VERSION,
+        "scope": access_scope,
+        "dept": (dept or "").strip().upper(),
+        "user": _normalize_for_match((user_substring or "").strip()),
+        "from": normalize_iso8601(activity_from) if activity_from else "",
+        "to": normalize_iso8601(activity_to) if activity_to else "",
+        "status": (status or "").strip(),
+        "sheet": _file_signature(collaborators_file),
+        "format": export_format,
+    }
+    raw = json.dumps(material, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def is_closed_period(activity_to: Optional[str]) -> bool:
+    """Indica se o período já terminou (data final no passado). Sem data final = período em aberto."""
+    if not activity_to:
+        return False
+    try:
+        end = datetime.fromisoformat(normalize_iso8601(activity_to))
+    except ValueError:
+        return False
+    return end < datetime.now(timezone.utc)
+
+
+def ttl_for_period(activity_to: Optional[str]) -> int:
+    """TTL (segundos) da exportação: longo para períodos encerrados, curto para períodos em aberto."""
+    return EXPORT_CACHE_TTL_CLOSED if is_closed_period(activity_to) else EXPORT_CACHE_TTL_OPEN
+
+
+class ExportCache:
+    """
+    Cache de exportações em disco.
+
+    Cada entrada tem dois arquivos: "<chave>.bin" (conteúdo) e "<chave>.json" (metadados).
+    O mtime do ".bin" marca o último acesso e é usado para a remoção LRU quando o total
+    ultrapassa o limite. Escritas são atômicas (arquivo temporário + os.replace), o que
+    permite compartilhar o diretório entre vários workers.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        """
+        Args:
+            directory: Diretório onde as entradas são gravadas
+            max_bytes: Tamanho máximo total do cache (bytes)
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, key)
+        return base + ".bin", base + ".json"
+
+    def get(self, key: str) -> Optional[Tuple[BinaryIO, Dict[str, Any]]]:
+        """
+        Busca uma entrada válida e abre o conteúdo.
+
+        O arquivo é aberto aqui, e não pelo chamador: se outro worker remover a entrada logo
+        depois (_evict/_remove), o arquivo já aberto continua legível (POSIX).
+
+        Returns:
+            Tuple (stream do conteúdo, aberto para leitura binária; metadados) ou None se
+            ausente/expirada. O chamador é responsável por fechar o stream.
+        """
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if meta.get("expires_at", 0) < time.time():
+            self._remove(key)
+            return None
+        try:
+            data = open(data_path, "rb")
+        except FileNotFoundError:
+            self._remove(key)
+            return None
+        except OSError:
+            return None
+
+        # Marcar acesso (LRU); a entrada pode ter sido removida depois da abertura, sem problema
+        try:
+            os.utime(data_path, None)
+        except OSError:
+            pass
+        return data, meta
+
+    def put(self, key: str, source: BinaryIO, num_rows: int, ttl: int) -> None:
+        """
+        Grava uma entrada a partir de um stream binário (copiado a partir da posição atual).
+
+        Args:
+            key: Chave (ver build_cache_key)
+            source: Stream com o conteúdo da exportação
+            num_rows: Número de linhas exportadas
+            ttl: Validade em segundos
+        """
+        data_path, meta_path = self._paths(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(source, f)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, data_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        now = time.time()
+        meta = {"created_at": now, "expires_at": now + ttl, "rows": num_rows, "size": size}
+        fd, tmp_meta = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, meta_path)
+
+        logger.info(f"Exportação armazenada no cache ({size} bytes, {num_rows} linhas, TTL {ttl}s)")
+        self._evict()
+
+    def _remove(self, key: str) -> None:
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self) -> None:
+        """Remove entradas expiradas e, se necessário, as menos usadas até caber no limite."""
+        now = time.time()
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".bin"):
+                continue
+            key = name[:-4]
+            data_path, meta_path = self._paths(key)
+            try:
+                st = os.stat(data_path)
+            except OSError:
+                continue
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    expires_at = json.load(f).get("expires_at", 0)
+            except (OSError, ValueError):
+                # Metadados ausentes: pode ser uma gravação em andamento em outro worker
+                if now - st.st_mtime > 60:
+                    self._remove(key)
+                continue
+            if expires_at < now:
+                self._remove(key)
+                continue
+            entries.append((st.st_mtime, st.st_size, key))
+            total += st.st_size
+
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+            logger.info(f"Cache de exportações: entrada {key[:12]}... removida (LRU)")
+
+
+_export_cache: Optional[ExportCache] = None
+
+
+def get_export_cache() -> Optional[ExportCache]:
+    """Retorna o cache de exportações do processo, ou None se desabilitado (EXPORT_CACHE_ENABLED=0)."""
+    global _export_cache
+    if not EXPORT_CACHE_ENABLED:
+        return None
+    if _export_cache is None:
+        try:
+            _export_cache = ExportCache(EXPORT_CACHE_DIR, EXPORT_CACHE_MAX_MB * 1024 * 1024)
+        except OSError as e:
+            logger.warning(f"Cache de exportações indisponível ({EXPORT_CACHE_DIR}): {e}")
+            return None
+    return _export_cache
@@ -0,0 +1,258 @@
+"""Montagem colunar (DataFrame) das linhas da exportação, equivalente a combine_tasks_with_time_entries.
+
+Em vez de montar uma linha por vez, os lançamentos de todas as tarefas do bloco viram colunas
+(um "explode" de tarefas x lançamentos, ligado às tarefas pela posição) e as formatações são
+aplicadas por coluna: status, durações e datas são calculados uma vez por valor distinto, e as
+datas ISO (o formato que o Bitrix devolve) são convertidas sem strptime. Valores fora do caminho
+rápido passam pelas mesmas funções de web_services, então o resultado é idêntico ao das linhas.
+"""
+import logging
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Sequence
+
+from excel_handler import EXCEL_EXPORT_COLUMNS
+from date_parsing import format_display_date
+from web_services import format_data_conclusao, format_status, format_time
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Prefixo ISO (2025-04-28T13:56:00...) convertido direto para "28/04/2025 13:56"
+_ISO_PREFIX = r"^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})"
+
+# Chaves dos lançamentos, na ordem de preferência de process_time_entries
+_USER_ID_KEYS = ("USER_ID", "userId", "USERID")
+_SECONDS_KEYS = ("SECONDS", "seconds")
+_MINUTES_KEYS = ("MINUTES", "minutes")
+_TIME_SPENT_KEYS = ("TIME_SPENT", "timeSpent")
+_COMMENT_KEYS = ("COMMENT_TEXT", "COMMENT", "comment")
+_CREATED_KEYS = ("CREATED_DATE", "createdDate", "DATE", "DATE_CREATE", "DATE_CREATE_UTC")
+
+_FALLBACK_AUTHOR = "Tempo total (detalhes não disponíveis)"
+_FALLBACK_COMMENT = "Webhook sem permissão para lançamentos individuais. Mostrando tempo total da tarefa."
+
+
+def _map_unique(values: "np.ndarray", func: Callable[[Any], Any]) -> "np.ndarray":
+    """Aplica func uma vez por valor distinto (valores sem None/NaN) e devolve o array resultante."""
+    import numpy as np
+    import pandas as pd
+
+    if len(values) == 0:
+        return np.empty(0, dtype=object)
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    mapped = np.empty(len(uniques), dtype=object)
+    mapped[:] = [func(u) for u in uniques]
+    return mapped[codes]
+
+
+def _truthy(column: "pd.Series") -> "np.ndarray":
+    """Máscara equivalente a bool(valor) do Python (chave ausente / NaN conta como falso)."""
+    return column.notna().to_numpy() & column.to_numpy(dtype=object).astype(bool)
+
+
+def _coalesce(frame: "pd.DataFrame", keys: Sequence[str], default: Any) -> "np.ndarray":
+    """Primeiro valor verdadeiro entre as colunas keys (como a.get(k1) or a.get(k2) or default)."""
+    import numpy as np
+
+    result = np.empty(len(frame), dtype=object)
+    result[:] = [default] * len(frame)
+    for key in reversed(keys):
+        if key in frame.columns:
+            column = frame[key]
+            mask = _truthy(column)
+            result[mask] = column.to_numpy(dtype=object)[mask]
+    return result
+
+
+def _int_or_zero(value: Any) -> int:
+    try:
+        return int(value) if value else 0
+    except (ValueError, TypeError):
+        return 0
+
+
+def format_dates_column(values: "np.ndarray", field: str = "") -> "np.ndarray":
+    """
+    format_display_date aplicado a um array de textos.
+
+    Datas ISO válidas são convertidas por fatiamento do texto; as demais (outros formatos,
+    datas inválidas) usam format_display_date, uma vez por valor distinto.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if len(values) == 0:
+        return np.empty(0, dtype=object)
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    texts = pd.Series([str(u).strip() if u else "" for u in uniques], dtype=object)
+    parts = texts.str.extract(_ISO_PREFIX)
+    candidates = parts[0] + "-" + parts[1] + "-" + parts[2] + " " + parts[3] + ":" + parts[4] + ":" + parts[5]
+    valid = pd.to_datetime(candidates, format="%Y-%m-%d %H:%M:%S", errors="coerce").notna().to_numpy()
+    # O pandas aceita "60" nos segundos (vira o minuto seguinte); strptime/datetime não
+    if valid.any():
+        clock = parts[[3, 4, 5]].fillna("99").astype(int)
+        valid = valid & ((clock[3] < 24) & (clock[4] < 60) & (clock[5] < 60)).to_numpy()
+
+    mapped = np.empty(len(uniques), dtype=object)
+    if valid.any():
+        fast = parts[2] + "/" + parts[1] + "/" + parts[0] + " " + parts[3] + ":" + parts[4]
+        mapped[valid] = fast.to_numpy(dtype=object)[valid]
+    for i in np.flatnonzero(~valid):
+        mapped[i] = format_display_date(uniques[i], field)
+    return mapped[codes]
+
+
+def _process_entries_columns(
+    entries: List[Dict[str, Any]],
+    collaborators_map: Dict[int, Dict[str, str]]
+) -> Dict[str, "np.ndarray"]:
+    """Colunas seconds, user_name, comment e created_date (mesmas regras de process_time_entries)."""
+    import numpy as np
+    import pandas as pd
+
+    keys = _USER_ID_KEYS + _SECONDS_KEYS + _MINUTES_KEYS + _TIME_SPENT_KEYS + _COMMENT_KEYS + _CREATED_KEYS
+    # dtype=object mantém os valores como vieram da API (sem converter inteiros em float)
+    frame = pd.DataFrame(entries, columns=list(keys), dtype=object)
+
+    seconds = _map_unique(_coalesce(frame, _SECONDS_KEYS, 0), _int_or_zero).astype(np.int64)
+    minutes = _map_unique(_coalesce(frame, _MINUTES_KEYS, 0), _int_or_zero).astype(np.int64)
+    time_spent = _map_unique(_coalesce(frame, _TIME_SPENT_KEYS, 0), _int_or_zero).astype(np.int64)
+    # Sem SECONDS: usar MINUTES; sem nenhum dos dois: TIME_SPENT
+    seconds = np.where(
+        (minutes > 0) & (seconds == 0),
+        minutes * 60,
+        np.where((seconds == 0) & (minutes == 0), time_spent, seconds),
+    )
+
+    def _user_name(user_id: Any) -> str:
+        if not user_id:
+            return "Desconhecido"
+        try:
+            return collaborators_map.get(int(user_id), {}).get("name", f"USER_{int(user_id)}")
+        except (ValueError, TypeError):
+            return f"USER_{user_id}"
+
+    created = _coalesce(frame, _CREATED_KEYS, "")
+    return {
+        "seconds": seconds,
+        "user_name": _map_unique(_coalesce(frame, _USER_ID_KEYS, ""), _user_name),
+        "comment": _map_unique(_coalesce(frame, _COMMENT_KEYS, ""), str),
+        "created_date": _map_unique(created, lambda v: str(v) if v else ""),
+    }
+
+
+def combine_tasks_frame(
+    enriched_tasks: List[Dict[str, Any]],
+    time_entries_map: Dict[int, List[Dict[str, Any]]],
+    collaborators_map: Dict[int, Dict[str, str]]
+) -> "pd.DataFrame":
+    """
+    Mesmas linhas de combine_tasks_with_time_entries (mesma ordem e valores), como DataFrame
+    com as colunas de EXCEL_EXPORT_COLUMNS.
+
+    Args:
+        enriched_tasks: Tarefas de enrich_tasks
+        time_entries_map: {task_id: [lançamentos da API]}
+        collaborators_map: Mapeamento user_id -> {name, dept}
+
+    Returns:
+        DataFrame pronto para write_tasks_excel
+    """
+    import numpy as np
+    import pandas as pd
+
+    n_tasks = len(enriched_tasks)
+    if n_tasks == 0:
+        return pd.DataFrame(columns=EXCEL_EXPORT_COLUMNS)
+
+    # Explode tarefas x lançamentos: posição da tarefa de cada lançamento, na ordem original
+    entry_lists = [time_entries_map.get(task["task_id"], []) for task in enriched_tasks]
+    counts = np.fromiter((len(e) for e in entry_lists), dtype=np.int64, count=n_tasks)
+    flat_entries = [entry for entries in entry_lists for entry in entries]
+    entry_task = np.repeat(np.arange(n_tasks), counts)
+    entries = _process_entries_columns(flat_entries, collaborators_map)
+    seconds = entries["seconds"]
+
+    has_entries = counts > 0
+    time_spent_in_logs = [task.get("time_spent_in_logs") for task in enriched_tasks]
+    uses_fallback = ~has_entries & np.fromiter((bool(t) for t in time_spent_in_logs), dtype=bool, count=n_tasks)
+    for pos in np.flatnonzero(uses_fallback):
+        logger.info(
+            f"Tarefa {enriched_tasks[pos]['task_id']}: Usando timeSpentInLogs ({time_spent_in_logs[pos]}s) "
+            f"como fallback (webhook sem permissão para lançamentos individuais)"
+        )
+
+    # Tempo total: soma dos lançamentos (como calculate_total_time) ou timeSpentInLogs no fallback
+    total_seconds = np.bincount(entry_task, weights=seconds.astype(np.float64), minlength=n_tasks).astype(object)
+    total_seconds[uses_fallback] = np.array(time_spent_in_logs, dtype=object)[uses_fallback]
+
+    # Linhas: um lançamento com tempo > 0 por linha; tarefas sem nenhum ganham uma linha própria
+    positive = seconds > 0
+    positive_per_task = np.bincount(entry_task[positive], minlength=n_tasks)
+    single_row = positive_per_task == 0
+    entry_rows = np.flatnonzero(positive)
+    single_tasks = np.flatnonzero(single_row)
+    row_task = np.concatenate([entry_task[entry_rows], single_tasks])
+    row_entry = np.concatenate([entry_rows, np.full(len(single_tasks), -1)])
+    order = np.lexsort((row_entry, row_task))
+    row_task = row_task[order]
+    row_entry = row_entry[order]
+    from_entry = row_entry >= 0
+    entry_index = row_entry[from_entry]
+
+    def _task_column(values: List[Any]) -> "np.ndarray":
+        array = np.empty(n_tasks, dtype=object)
+        array[:] = values
+        return array[row_task]
+
+    def _entry_column(values: "np.ndarray", fallback_value: Any) -> "np.ndarray":
+        column = np.full(len(row_task), "", dtype=object)
+        column[from_entry] = values[entry_index]
+        fallback_rows = ~from_entry & uses_fallback[row_task]
+        if callable(fallback_value):
+            column[fallback_rows] = [fallback_value(pos) for pos in row_task[fallback_rows]]
+        else:
+            column[fallback_rows] = fallback_value
+        return column
+
+    statuses = [task.get("status") for task in enriched_tasks]
+    status_text = ["" if s is None else str(s) for s in statuses]
+    conclusion = [
+        format_data_conclusao(status, task.get("closed_date")) for status, task in zip(statuses, enriched_tasks)
+    ]
+    participants = []
+    for task in enriched_tasks:
+        names = task.get("accomplices_names") or []
+        participants.append(", ".join(str(n) for n in names) if names else "")
+
+    columns = {
+        "Task_ID": _task_column([task.get("task_id", 0) for task in enriched_tasks]),
+        "Título": _task_column([str(task.get("title", "")) for task in enriched_tasks]),
+        "Status": _task_column(_map_unique(np.array(status_text, dtype=object), format_status)),
+        "Data de Conclusão": _task_column(conclusion),
+        "Deadline": _task_column([str(t.get("deadline", "")) if t.get("deadline") else "" for t in enriched_tasks]),
+        "Criada_Em": _task_column(format_dates_column(
+            np.array([t.get("created_date", "") or "" for t in enriched_tasks], dtype=object), "created_date"
+        )),
+        "Responsável": _task_column([str(task.get("responsible_name", "")) for task in enriched_tasks]),
+        "Participantes": _task_column(participants),
+        "Tempo_Estimado": _task_column(_map_unique(
+            np.array([t.get("time_estimate") or 0 for t in enriched_tasks], dtype=object), format_time
+        )),
+        "Tempo_Total_Gasto": _task_column(_map_unique(total_seconds, format_time)),
+        "Tempo_Lançamento": _entry_column(
+            _map_unique(seconds, format_time), lambda pos: format_time(time_spent_in_logs[pos])
+        ),
+        "Quem_Lançou": _entry_column(entries["user_name"], _FALLBACK_AUTHOR),
+        "Data do lançamento": _entry_column(format_dates_column(entries["created_date"], "entry_date"), ""),
+        "Comentário_Lançamento": _entry_column(entries["comment"], _FALLBACK_COMMENT),
+        "Departamentos_Selecionados": _task_column([str(task.get("departments", "")) for task in enriched_tasks]),
+        "Atividade_em": _task_column(
+            [str(t.get("activity_date", "")) if t.get("activity_date") else "" for t in enriched_tasks]
+        ),
+    }
+    frame = pd.DataFrame(columns, columns=EXCEL_EXPORT_COLUMNS)
+    # Mesmo tipo que o DataFrame montado a partir das linhas (Task_ID inteiro quando possível)
+    return frame.infer_objects()
@@ -0,0 +1,123 @@
+"""Profiling sob demanda das exportações (cProfile), salvo com o identificador da exportação.
+
+Ativado por EXPORT_PROFILE=1 (todas as exportações), pela opção "Gerar profile" do formulário
+(somente administradores) ou por main.py --profile. O profile é gravado em
+EXPORT_PROFILE_DIR/export_<id>.prof (abrir com `python -m pstats` ou snakeviz) e as funções com
+maior tempo cumulativo vão para o log.
+
+O cProfile é determinístico e, até o Python 3.11, mede só a thread em que foi ligado; por isso o
+profiler é ligado e desligado em volta de cada passo (a parte síncrona da requisição e cada bloco
+de uma exportação em streaming, que o servidor avança em threads do pool). A partir do Python 3.12
+só um profiler pode estar ativo por processo: uma segunda exportação com profile simultânea segue
+sem profile (com aviso no log).
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import tempfile
+from typing import Iterator, Optional
+
+from config import EXPORT_PROFILE, EXPORT_PROFILE_DIR, EXPORT_PROFILE_TOP
+from export_stats import annotate_export
+
+logger = logging.getLogger(__name__)
+
+
+class ExportProfiler:
+    """
+    Profile de uma exportação, acumulado em um ou mais trechos (with profiler: ...).
+
+    Atributos:
+        export_id: Identificador da exportação (nome do arquivo)
+        path: Arquivo gravado por finish (None até lá, ou se nada foi medido)
+    """
+
+    def __init__(self, export_id: str):
+        self.export_id = export_id
+        self.path: Optional[str] = None
+        self._profile = cProfile.Profile()
+        self._measured = False
+        self._active = False
+        self._finished = False
+
+    def __enter__(self) -> "ExportProfiler":
+        try:
+            self._profile.enable()
+        except ValueError as e:
+            # Python 3.12+: outro profiler já está ativo no processo
+            logger.warning(f"Profile da exportação {self.export_id} ignorado neste trecho: {e}")
+            return self
+        self._active = True
+        self._measured = True
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._active:
+            self._profile.disable()
+            self._active = False
+
+    def wrap_stream(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """Repassa os blocos de uma exportação em streaming medindo cada passo; grava o profile ao final."""
+        try:
+            while True:
+                with self:
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration:
+                        return
+                yield chunk
+        finally:
+            self.finish()
+
+    def finish(self, top: int = EXPORT_PROFILE_TOP) -> Optional[str]:
+        """
+        Grava o profile em EXPORT_PROFILE_DIR/export_<id>.prof e registra no log as top funções
+        por tempo cumulativo (uma única vez); se o profiler ainda estiver ligado, a medição termina aqui.
+        O nome do arquivo entra nas estatísticas da exportação ativa (campo "profile").
+
+        Returns:
+            Caminho do arquivo gravado, ou None se nada foi medido ou a gravação falhou
+        """
+        if self._finished:
+            return self.path
+        self.__exit__(None, None, None)
+        self._finished = True
+        if not self._measured:
+            return None
+
+        summary = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=summary)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+        logger.info(f"Profile da exportação {self.export_id} (top {top} por tempo cumulativo):\n{summary.getvalue().strip()}")
+
+        path = os.path.join(EXPORT_PROFILE_DIR, f"export_{self.export_id}.prof")
+        tmp_path = None
+        try:
+            os.makedirs(EXPORT_PROFILE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=EXPORT_PROFILE_DIR, suffix=".tmp")
+            os.close(fd)
+            stats.dump_stats(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar o profile da exportação {self.export_id} ({path}): {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return None
+        self.path = path
+        annotate_export(profile=os.path.basename(path))
+        logger.info(f"Profile da exportação {self.export_id} salvo em {path}")
+        return path
+
+
+def export_profiler(export_id: str, requested: bool = False) -> Optional[ExportProfiler]:
+    """
+    Profiler da exportação, se pedido (requested) ou ligado para todas (EXPORT_PROFILE).
+
+    Returns:
+        ExportProfiler, ou None se o profiling não foi pedido
+    """
+    if requested or EXPORT_PROFILE:
+        return ExportProfiler(export_id)
+    return None
@@ -0,0 +1,274 @@
+"""Instrumentação das exportações: tempo por etapa, chamadas à API do Bitrix24, bytes, retentativas e linhas.
+
+Cada exportação tem um ExportStats ativo no contexto (contextvars). O BitrixClient e as etapas do
+pipeline registram nele sem precisar recebê-lo como parâmetro; fora de uma exportação (ex: scripts
+de teste) os registros são ignorados. Ao final, finish_export_stats grava um único registro de log
+estruturado (JSON) com tudo.
+
+Os mesmos eventos alimentam as métricas do processo (metrics.py, GET /metrics), inclusive fora
+de uma exportação.
+"""
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar[Optional["ExportStats"]] = contextvars.ContextVar("export_stats", default=None)
+
+
+def new_export_id() -> str:
+    """Identificador curto da exportação (aparece nos logs, no header X-Export-Id e no nome do profile)."""
+    return uuid.uuid4().hex[:12]
+
+
+class ExportStats:
+    """
+    Métricas de uma exportação.
+
+    Atributos:
+        export_id: Identificador da exportação
+        context: Dados descritivos (usuário, formato...) incluídos no registro final
+        stages: {etapa: segundos} (soma de todas as passagens pela etapa)
+        http_calls: {método: requisições HTTP} ("batch" conta cada POST de até 50 comandos)
+        batch_commands: {método: comandos enviados dentro de batch}
+        http_errors: {método: requisições com erro (HTTP, timeout ou erro da API)}
+        bytes_received: Bytes de corpo recebidos do Bitrix
+        http_seconds: Tempo total esperando respostas HTTP
+        retries / backoff_seconds: Retentativas e tempo dormindo entre elas
+        response_cache: {"hit"/"miss"/"bypass": comandos} no cache de respostas do Bitrix
+        task_detail_cache: {"hit"/"miss"/"bypass": tarefas} no cache de detalhes validado por changedDate
+        rows: Linhas produzidas
+
+    A exportação conta como em andamento (métrica exports_in_flight) da criação até finish_export_stats.
+    """
+
+    def __init__(self, export_id: Optional[str] = None, **context: Any):
+        self.export_id = export_id or new_export_id()
+        self.context = context
+        self.stages: Dict[str, float] = {}
+        self.http_calls: Dict[str, int] = {}
+        self.batch_commands: Dict[str, int] = {}
+        self.http_errors: Dict[str, int] = {}
+        self.bytes_received = 0
+        self.http_seconds = 0.0
+        self.retries = 0
+        self.backoff_seconds = 0.0
+        self.response_cache: Dict[str, int] = {}
+        self.task_detail_cache: Dict[str, int] = {}
+        self.rows = 0
+        self.elapsed: Optional[float] = None
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        metrics.EXPORTS_IN_FLIGHT.inc()
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_http_call(self, method: str, outcome: str, nbytes: int, seconds: float) -> None:
+        with self._lock:
+            self.http_calls[method] = self.http_calls.get(method, 0) + 1
+            if outcome != "ok":
+                self.http_errors[method] = self.http_errors.get(method, 0) + 1
+            self.bytes_received += nbytes
+            self.http_seconds += seconds
+
+    def add_batch_commands(self, methods: Iterable[str]) -> None:
+        with self._lock:
+            for method in methods:
+                self.batch_commands[method] = self.batch_commands.get(method, 0) + 1
+
+    def add_retry(self, wait_seconds: float) -> None:
+        with self._lock:
+            self.retries += 1
+            self.backoff_seconds += wait_seconds
+
+    def add_response_cache(self, result: str, count: int) -> None:
+        with self._lock:
+            self.response_cache[result] = self.response_cache.get(result, 0) + count
+
+    def add_task_detail_cache(self, result: str, count: int) -> None:
+        with self._lock:
+            self.task_detail_cache[result] = self.task_detail_cache.get(result, 0) + count
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self._started
+        return {
+            "export_id": self.export_id,
+            **self.context,
+            "seconds": round(elapsed, 3),
+            "rows": self.rows,
+            "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            "http_calls": dict(self.http_calls),
+            "batch_commands": dict(self.batch_commands),
+            "http_errors": dict(self.http_errors),
+            "bytes_received": self.bytes_received,
+            "http_seconds": round(self.http_seconds, 3),
+            "retries": self.retries,
+            "backoff_seconds": round(self.backoff_seconds, 3),
+            "response_cache": dict(self.response_cache),
+            "task_detail_cache": dict(self.task_detail_cache),
+        }
+
+    def header_value(self) -> str:
+        """JSON compacto (ASCII) para o header X-Export-Stats."""
+        return json.dumps(self.as_dict(), separators=(",", ":"), ensure_ascii=True, default=str)
+
+
+def current_export_stats() -> Optional[ExportStats]:
+    """ExportStats da exportação em andamento no contexto atual (None fora de uma exportação)."""
+    return _current.get()
+
+
+@contextmanager
+def activate(stats: ExportStats) -> Iterator[ExportStats]:
+    """Torna stats a exportação ativa no contexto atual durante o bloco."""
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def export_stage(name: str) -> Iterator[None]:
+    """Soma o tempo do bloco à etapa name da exportação ativa (sem efeito fora de uma exportação)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        metrics.EXPORT_STAGE_SECONDS.observe(seconds, name)
+        stats = _current.get()
+        if stats is not None:
+            stats.add_stage(name, seconds)
+
+
+def record_api_call(method: str, outcome: str, nbytes: int, seconds: float) -> None:
+    """
+    Registra uma requisição HTTP ao Bitrix24.
+
+    Args:
+        method: Método da API ("batch" para o POST de batch)
+        outcome: "ok", "api_error", "http_error" ou "timeout"
+        nbytes: Bytes do corpo da resposta
+        seconds: Duração da requisição
+    """
+    metrics.BITRIX_REQUESTS_TOTAL.inc(method, outcome)
+    metrics.BITRIX_REQUEST_SECONDS.observe(seconds, method)
+    metrics.BITRIX_RESPONSE_BYTES_TOTAL.inc(amount=nbytes)
+    stats = _current.get()
+    if stats is not None:
+        stats.add_http_call(method, outcome, nbytes, seconds)
+
+
+def record_batch_commands(methods: Iterable[str]) -> None:
+    """Registra os métodos dos comandos enviados em um batch."""
+    methods = list(methods)
+    for method in methods:
+        metrics.BITRIX_BATCH_COMMANDS_TOTAL.inc(method)
+    stats = _current.get()
+    if stats is not None:
+        stats.add_batch_commands(methods)
+
+
+def record_retry(wait_seconds: float) -> None:
+    """Registra uma retentativa e o tempo de espera (backoff) antes dela."""
+    metrics.BITRIX_RETRIES_TOTAL.inc()
+    stats = _current.get()
+    if stats is not None:
+        stats.add_retry(wait_seconds)
+
+
+def record_response_cache(result: str, count: int = 1) -> None:
+    """Conta comandos consultados no cache de respostas do Bitrix (result: "hit", "miss" ou "bypass")."""
+    if count <= 0:
+        return
+    metrics.CACHE_REQUESTS_TOTAL.inc("bitrix_responses", result, amount=count)
+    stats = _current.get()
+    if stats is not None:
+        stats.add_response_cache(result, count)
+
+
+def record_task_detail_cache(result: str, count: int = 1) -> None:
+    """Conta tarefas consultadas no cache de detalhes (result: "hit", "miss" ou "bypass")."""
+    if count <= 0:
+        return
+    metrics.CACHE_REQUESTS_TOTAL.inc("task_details", result, amount=count)
+    stats = _current.get()
+    if stats is not None:
+        stats.add_task_detail_cache(result, count)
+
+
+def annotate_export(**values: Any) -> None:
+    """Acrescenta dados descritivos (ex: cache="hit") ao registro da exportação ativa."""
+    stats = _current.get()
+    if stats is not None:
+        stats.context.update(values)
+
+
+def record_rows(count: int) -> None:
+    """Define a quantidade de linhas produzidas pela exportação ativa."""
+    stats = _current.get()
+    if stats is not None:
+        stats.rows = count
+
+
+def finish_export_stats(stats: ExportStats) -> Dict[str, Any]:
+    """Encerra a medição e grava o registro estruturado da exportação no log (uma única vez)."""
+    if stats.elapsed is None:
+        stats.elapsed = time.perf_counter() - stats._started
+        export_format = str(stats.context.get("format", "unknown"))
+        metrics.EXPORTS_IN_FLIGHT.dec()
+        metrics.EXPORT_SECONDS.observe(stats.elapsed, export_format)
+        metrics.EXPORTS_TOTAL.inc(export_format, "error" if "error" in stats.context else "ok")
+        metrics.EXPORT_ROWS_TOTAL.inc(export_format, amount=stats.rows)
+        record = stats.as_dict()
+        logger.info(
+            f"Estatísticas da exportação {stats.export_id}: {json.dumps(record, ensure_ascii=False, default=str)}",
+            extra={"export_stats": record},
+        )
+    return stats.as_dict()
+
+
+def stream_with_stats(stats: ExportStats, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    Repassa os blocos de uma exportação em streaming com stats ativo durante cada passo.
+
+    O servidor pode avançar o iterador em threads diferentes (cada uma com sua cópia do contexto),
+    então a exportação é reativada a cada bloco. O registro final é gravado quando o streaming
+    termina ou falha (com context["error"]); se o iterador nem chegar ao fim (cliente desconectado),
+    quem serve a resposta deve chamar finish_streamed_export.
+    """
+    while True:
+        with activate(stats):
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                finish_export_stats(stats)
+                return
+            except Exception as e:
+                stats.context["error"] = type(e).__name__
+                finish_export_stats(stats)
+                raise
+        yield chunk
+
+
+def finish_streamed_export(stats: ExportStats) -> None:
+    """
+    Encerra uma exportação em streaming quando a resposta HTTP termina.
+
+    Sem efeito se stream_with_stats já gravou o registro; senão, o corpo não foi enviado por
+    inteiro (cliente desconectado antes ou durante o envio) e a exportação conta como erro.
+    """
+    if stats.elapsed is None:
+        stats.context.setdefault("error", "ClientDisconnect")
+        finish_export_stats(stats)
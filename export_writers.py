@@ -0,0 +1,217 @@
+"""Formatos de exportação (XLSX, CSV, NDJSON, Parquet) com interface comum de escrita."""
+import csv
+import importlib.util
+import io
+import json
+import logging
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Union
+
+from excel_handler import EXCEL_EXPORT_COLUMNS, write_tasks_excel
+
+logger = logging.getLogger(__name__)
+
+# Tamanho aproximado de cada bloco enviado ao cliente nos formatos em streaming
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+class ExportWriter:
+    """
+    Interface de escrita de uma exportação.
+
+    Todos os formatos usam as colunas de EXCEL_EXPORT_COLUMNS, na mesma ordem.
+    Formatos com streaming=True sabem gerar bytes à medida que as linhas chegam
+    (iter_bytes), sem esperar o fim da exportação.
+    """
+
+    name = ""
+    extension = ""
+    media_type = "application/octet-stream"
+    streaming = False
+    # True = write também aceita tuplas na ordem de EXCEL_EXPORT_COLUMNS (linhas montadas por export_frame)
+    accepts_tuples = False
+
+    @classmethod
+    def available(cls) -> bool:
+        """Se as dependências do formato estão instaladas (formatos indisponíveis não são oferecidos)."""
+        return True
+
+    def write(self, rows: Iterable[Dict[str, Any]], output: Union[str, BinaryIO]) -> None:
+        """
+        Escreve todas as linhas.
+
+        Args:
+            rows: Linhas da exportação (dicionários com as colunas de EXCEL_EXPORT_COLUMNS)
+            output: Caminho do arquivo ou stream binário gravável (não é fechado)
+        """
+        if isinstance(output, str):
+            with open(output, "wb") as f:
+                self._write_stream(rows, f)
+        else:
+            self._write_stream(rows, output)
+
+    def _write_stream(self, rows: Iterable[Dict[str, Any]], output: BinaryIO) -> None:
+        for chunk in self.iter_bytes(rows):
+            output.write(chunk)
+
+    def iter_bytes(self, rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+        """Gera o conteúdo em blocos de bytes (apenas formatos com streaming=True)."""
+        raise NotImplementedError(f"Formato {self.name} não suporta streaming")
+
+
+class XlsxExportWriter(ExportWriter):
+    """Excel (.xlsx), via write_tasks_excel (ordenado por Task_ID; streaming interno para volumes grandes)."""
+
+    name = "xlsx"
+    extension = "xlsx"
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    accepts_tuples = True
+
+    def write(self, rows: Iterable[Dict[str, Any]], output: Union[str, BinaryIO]) -> None:
+        write_tasks_excel(rows, output)
+
+
+class _BufferedTextWriter(ExportWriter):
+    """Base dos formatos texto: acumula linhas codificadas até STREAM_CHUNK_BYTES antes de emitir."""
+
+    streaming = True
+
+    def _header(self) -> str:
+        return ""
+
+    def _format_row(self, row: Dict[str, Any]) -> str:
+        raise NotImplementedError
+
+    def iter_bytes(self, rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+        buffer: List[bytes] = []
+        size = 0
+        header = self._header()
+        if header:
+            buffer.append(header.encode("utf-8"))
+            size += len(buffer[-1])
+        for row in rows:
+            encoded = self._format_row(row).encode("utf-8")
+            buffer.append(encoded)
+            size += len(encoded)
+            if size >= STREAM_CHUNK_BYTES:
+                yield b"".join(buffer)
+                buffer = []
+                size = 0
+        if buffer:
+            yield b"".join(buffer)
+
+
+class CsvExportWriter(_BufferedTextWriter):
+    """CSV (UTF-8, separador vírgula, cabeçalho com os nomes das colunas)."""
+
+    name = "csv"
+    extension = "csv"
+    media_type = "text/csv; charset=utf-8"
+
+    def __init__(self):
+        self._line = io.StringIO()
+        self._csv = csv.writer(self._line, lineterminator="\n")
+
+    def _to_line(self, values: List[Any]) -> str:
+        self._line.seek(0)
+        self._line.truncate()
+        self._csv.writerow(values)
+        return self._line.getvalue()
+
+    def _header(self) -> str:
+        return self._to_line(EXCEL_EXPORT_COLUMNS)
+
+    def _format_row(self, row: Dict[str, Any]) -> str:
+        as_tuple = getattr(row, "as_tuple", None)
+        if as_tuple is not None:
+            return self._to_line(as_tuple())
+        return self._to_line([row.get(col, "") for col in EXCEL_EXPORT_COLUMNS])
+
+
+class NdjsonExportWriter(_BufferedTextWriter):
+    """NDJSON: um objeto JSON por linha, com as chaves de EXCEL_EXPORT_COLUMNS."""
+
+    name = "ndjson"
+    extension = "ndjson"
+    media_type = "application/x-ndjson"
+
+    def _format_row(self, row: Dict[str, Any]) -> str:
+        record = {col: row.get(col, "") for col in EXCEL_EXPORT_COLUMNS}
+        return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+
+class ParquetExportWriter(ExportWriter):
+    """
+    Parquet (requer pyarrow, dependência opcional). Escrito em row groups de ROW_GROUP_ROWS linhas,
+    sem materializar todas as linhas; Task_ID como inteiro e as demais colunas como texto.
+    """
+
+    name = "parquet"
+    extension = "parquet"
+    media_type = "application/vnd.apache.parquet"
+    ROW_GROUP_ROWS = 50000
+
+    @classmethod
+    def available(cls) -> bool:
+        return importlib.util.find_spec("pyarrow") is not None
+
+    def _write_stream(self, rows: Iterable[Dict[str, Any]], output: BinaryIO) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Formato parquet requer o pacote 'pyarrow' (pip install pyarrow)")
+
+        schema = pa.schema(
+            [pa.field("Task_ID", pa.int64())]
+            + [pa.field(col, pa.string()) for col in EXCEL_EXPORT_COLUMNS if col != "Task_ID"]
+        )
+
+        def _to_batch(chunk: List[Dict[str, Any]]):
+            columns = []
+            for field in schema:
+                if field.name == "Task_ID":
+                    values = [_int_or_none(r.get("Task_ID")) for r in chunk]
+                else:
+                    values = [str(r.get(field.name, "") or "") for r in chunk]
+                columns.append(pa.array(values, type=field.type))
+            return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+        with pq.ParquetWriter(output, schema) as writer:
+            chunk: List[Dict[str, Any]] = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= self.ROW_GROUP_ROWS:
+                    writer.write_batch(_to_batch(chunk))
+                    chunk = []
+            if chunk:
+                writer.write_batch(_to_batch(chunk))
+
+
+def _int_or_none(value: Any):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+EXPORT_WRITERS = {
+    writer.name: writer
+    for writer in (XlsxExportWriter, CsvExportWriter, NdjsonExportWriter, ParquetExportWriter)
+}
+# Formatos oferecidos no formulário e no --format do main.py: só os que podem ser gerados neste ambiente
+EXPORT_FORMATS = [name for name, writer in EXPORT_WRITERS.items() if writer.available()]
+
+
+def get_export_writer(export_format: str) -> ExportWriter:
+    """
+    Retorna uma instância do writer para o formato.
+
+    Raises:
+        ValueError: Se o formato não for suportado ou não estiver disponível (ex: parquet sem pyarrow)
+    """
+    key = (export_format or "xlsx").strip().lower()
+    if key not in EXPORT_WRITERS:
+        raise ValueError(f"Formato de exportação inválido: {export_format}. Use um de: {', '.join(EXPORT_FORMATS)}")
+    if key not in EXPORT_FORMATS:
+        raise ValueError(f"Formato {key} indisponível neste servidor (parquet requer o pacote 'pyarrow'). Use um de: {', '.join(EXPORT_FORMATS)}")
+    return EXPORT_WRITERS[key]()
@@ -0,0 +1,455 @@
+"""Servidor local que imita a API REST do Bitrix24, para benchmarks e testes sem acesso ao portal.
+
+Serve um portal sintético (synthetic_portal.py) nos métodos usados pela exportação:
+tasks.task.list (filtros, select, paginação de 50 e total), tasks.task.get, task.elapseditem.getlist e batch.
+Latência, limite de requisições e erros podem ser simulados. Aponte o BitrixClient para ele pelo
+BITRIX_WEBHOOK_BASE impresso ao iniciar.
+
+Uso:
+    python fake_bitrix_server.py                                   # 50 usuários, 2000 tarefas, porta 8765
+    python fake_bitrix_server.py --tasks 20000 --latency 0.08 --rate-limit 2 --error-rate 0.01
+    python fake_bitrix_server.py --portal-dir .cache/portal            # portal gravado por synthetic_portal.py
+    BITRIX_WEBHOOK_BASE=http://127.0.0.1:8765/rest/1/fake-token/ python main.py --dept GI
+
+Em scripts:
+    with FakeBitrixServer(generate_portal(seed=1), latency=0.02) as server:
+        client = BitrixClient(server.webhook_base)
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from synthetic_portal import PORTAL_TZ, SyntheticPortal, generate_portal, load_portal
+
+logger = logging.getLogger(__name__)
+
+# Tarefas por página em tasks.task.list (mesmo valor do Bitrix e de PAGINATION_SIZE)
+PAGE_SIZE = 50
+# Comandos aceitos por batch
+MAX_BATCH_COMMANDS = 50
+# Campos de cada tarefa devolvidos por tasks.task.list (tasks.task.get devolve todos), nas grafias geradas
+LIST_FIELDS = frozenset((
+    "id", "title", "status", "responsibleId", "createdDate", "changedDate", "closedDate",
+    "activityDate", "deadline", "groupId",
+    "ID", "TITLE", "STATUS", "RESPONSIBLE_ID", "CREATED_DATE", "DATE_CREATE", "CHANGED_DATE", "CLOSED_DATE",
+    "ACTIVITY_DATE", "DEADLINE", "GROUP_ID",
+))
+# Grafias antigas tentadas quando um campo do select não existe na tarefa
+SELECT_ALIASES = {"CREATED_DATE": ("DATE_CREATE",), "ACCOMPLICES": ("MEMBERS",), "TIME_ESTIMATE": ("ESTIMATE",)}
+
+Reply = Tuple[int, Dict[str, Any]]
+
+
+def _api_error(error: str, description: str, status: int = 400) -> Reply:
+    return status, {"error": error, "error_description": description}
+
+
+def _parse_filter_date(value: str) -> datetime:
+    parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=PORTAL_TZ)
+    return parsed
+
+
+def _camel_case(field: str) -> str:
+    head, *rest = field.lower().split("_")
+    return head + "".join(part.capitalize() for part in rest)
+
+
+def _select_fields(task: Dict[str, Any], select: List[str]) -> Dict[str, Any]:
+    """Campos pedidos em select[], em camelCase como no Bitrix, qualquer que seja a grafia guardada."""
+    selected = {}
+    for field in select:
+        name = _camel_case(field)
+        for key in (name, field.upper(), *SELECT_ALIASES.get(field.upper(), ())):
+            if key in task:
+                selected[name] = task[key]
+                break
+    return selected
+
+
+def _flatten_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Aceita parâmetros planos (filter[X]=...) ou aninhados ({"filter": {"X": ...}}, corpo JSON)."""
+    flat = {}
+    for key, value in params.items():
+        if isinstance(value, dict):
+            for inner, inner_value in value.items():
+                flat[f"{key}[{inner}]"] = inner_value
+        else:
+            flat[key] = value
+    return flat
+
+
+class FakeBitrixServer(ThreadingHTTPServer):
+    """
+    Servidor HTTP com os dados de um SyntheticPortal.
+
+    Atributos:
+        portal: Portal servido
+        webhook_base: URL para BITRIX_WEBHOOK_BASE / BitrixClient(webhook_base)
+        counters: {"requests": {método: n}, "commands": {método: n}, "rate_limited": n, "injected_errors": n}
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        portal: SyntheticPortal,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        command_latency: float = 0.0,
+        rate_limit: float = 0.0,
+        burst: int = 50,
+        error_rate: float = 0.0,
+        error_kind: str = "http",
+        seed: int = 0,
+        user_id: int = 1,
+        token: str = "fake-token"
+    ):
+        """
+        Args:
+            portal: Dados servidos
+            host / port: Endereço (port=0 escolhe uma porta livre)
+            latency: Atraso fixo por requisição HTTP (segundos)
+            jitter: Atraso adicional aleatório, de 0 a jitter segundos
+            command_latency: Atraso adicional por comando dentro de um batch (segundos)
+            rate_limit: Requisições por segundo aceitas (0 = sem limite); acima disso responde 503
+                        QUERY_LIMIT_EXCEEDED, como o Bitrix
+            burst: Requisições acumuláveis no balde do limite
+            error_rate: Fração das requisições que falham de propósito
+            error_kind: "http" (HTTP 500), "api" (HTTP 200 com campo error) ou "mixed"
+            seed: Semente do sorteio de atrasos e erros
+            user_id / token: Partes da URL do webhook
+        """
+        if error_kind not in ("http", "api", "mixed"):
+            raise ValueError(f"error_kind inválido: {error_kind} (use http, api ou mixed)")
+        super().__init__((host, port), _FakeBitrixHandler)
+        self.portal = portal
+        self.latency = latency
+        self.jitter = jitter
+        self.command_latency = command_latency
+        self.rate_limit = rate_limit
+        self.burst = max(int(burst), 1)
+        self.error_rate = error_rate
+        self.error_kind = error_kind
+        self.user_id = user_id
+        self.token = token
+        self.counters: Dict[str, Any] = {"requests": {}, "commands": {}, "rate_limited": 0, "injected_errors": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+        self._index_portal()
+        self._methods: Dict[str, Callable[[Dict[str, Any]], Reply]] = {
+            "tasks.task.list": self._tasks_list,
+            "tasks.task.get": self._task_get,
+            "task.elapseditem.getlist": self._elapsed_items,
+        }
+
+    @property
+    def webhook_base(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/rest/{self.user_id}/{self.token}/"
+
+    def _index_portal(self) -> None:
+        # As tarefas podem ter grafias de chaves diferentes; filtros e índices usam portal.facts
+        self._by_id: Dict[int, Dict[str, Any]] = {}
+        self._by_responsible: Dict[int, List[Dict[str, Any]]] = {}
+        self._by_accomplice: Dict[int, List[Dict[str, Any]]] = {}
+        for task in self.portal.tasks:
+            facts = self.portal.facts[int(task.get("id") or task.get("ID"))]
+            self._by_id[facts.task_id] = task
+            self._by_responsible.setdefault(facts.responsible_id, []).append(task)
+            for uid in facts.accomplices:
+                self._by_accomplice.setdefault(uid, []).append(task)
+
+    # --- ciclo de vida ---
+
+    def start(self) -> "FakeBitrixServer":
+        """Atende em uma thread em segundo plano."""
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-bitrix", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "FakeBitrixServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def snapshot_counters(self) -> Dict[str, Any]:
+        with self._lock:
+            return json.loads(json.dumps(self.counters))
+
+    # --- simulação de rede ---
+
+    def _count(self, kind: str, method: str) -> None:
+        with self._lock:
+            self.counters[kind][method] = self.counters[kind].get(method, 0) + 1
+
+    def _take_token(self) -> bool:
+        if self.rate_limit <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_limit)
+            self._refilled = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self.counters["rate_limited"] += 1
+            return False
+
+    def _injected_error(self) -> Optional[Reply]:
+        if self.error_rate <= 0:
+            return None
+        with self._lock:
+            if self._rng.random() >= self.error_rate:
+                return None
+            self.counters["injected_errors"] += 1
+            kind = self._rng.choice(("http", "api")) if self.error_kind == "mixed" else self.error_kind
+        if kind == "http":
+            return _api_error("INTERNAL_SERVER_ERROR", "Erro simulado pelo servidor local", status=500)
+        return _api_error("ERROR_CORE", "Erro simulado pelo servidor local", status=200)
+
+    def _delay(self, commands: int = 0) -> None:
+        wait = self.latency + commands * self.command_latency
+        if self.jitter > 0:
+            with self._lock:
+                wait += self._rng.uniform(0, self.jitter)
+        if wait > 0:
+            time.sleep(wait)
+
+    def dispatch(self, method: str, params: Dict[str, Any]) -> Reply:
+        """Atende uma requisição HTTP (um método ou um batch), já com limite, erros e latência."""
+        self._count("requests", method)
+        if not self._take_token():
+            return _api_error("QUERY_LIMIT_EXCEEDED", "Too many requests", status=503)
+        injected = self._injected_error()
+        if method == "batch":
+            commands = params.get("cmd") or {}
+            self._delay(len(commands) if isinstance(commands, dict) else 0)
+            return injected or self._batch(commands, params.get("halt"))
+        self._delay()
+        return injected or self._call(method, params)
+
+    # --- métodos da API ---
+
+    def _call(self, method: str, params: Dict[str, Any]) -> Reply:
+        handler = self._methods.get(method)
+        if handler is None:
+            return _api_error("ERROR_METHOD_NOT_FOUND", "Method not found!", status=404)
+        try:
+            status, payload = handler(_flatten_params(params))
+        except (TypeError, ValueError) as e:
+            return _api_error("INVALID_ARG_VALUE", str(e))
+        if status == 200 and "time" not in payload:
+            now = time.time()
+            payload["time"] = {"start": now, "finish": now, "duration": 0.0, "processing": 0.0}
+        return status, payload
+
+    def _tasks_list(self, params: Dict[str, Any]) -> Reply:
+        start = int(params.get("start") or 0)
+        if "filter[RESPONSIBLE_ID]" in params:
+            candidates = self._by_responsible.get(int(params["filter[RESPONSIBLE_ID]"]), [])
+        elif "filter[ACCOMPLICE]" in params:
+            candidates = self._by_accomplice.get(int(params["filter[ACCOMPLICE]"]), [])
+        else:
+            candidates = self.portal.tasks
+
+        date_from = params.get("filter[>=ACTIVITY_DATE]")
+        date_to = params.get("filter[<=ACTIVITY_DATE]")
+        date_from = _parse_filter_date(date_from) if date_from else None
+        date_to = _parse_filter_date(date_to) if date_to else None
+        status = params.get("filter[STATUS]")
+        if date_from or date_to or status:
+            selected = []
+            for task in candidates:
+                facts = self.portal.facts[int(task.get("id") or task.get("ID"))]
+                if date_from and facts.activity_date < date_from:
+                    continue
+                if date_to and facts.activity_date > date_to:
+                    continue
+                if status and facts.status != str(status):
+                    continue
+                selected.append(task)
+            candidates = selected
+
+        page = candidates[start:start + PAGE_SIZE]
+        select = [str(v) for k, v in sorted(params.items()) if k.startswith("select[")]
+        if select:
+            tasks = [_select_fields(task, select) for task in page]
+        else:
+            tasks = [{k: v for k, v in task.items() if k in LIST_FIELDS} for task in page]
+        payload: Dict[str, Any] = {
+            "result": {"tasks": tasks},
+            "total": len(candidates),
+        }
+        if start + PAGE_SIZE < len(candidates):
+            payload["next"] = start + PAGE_SIZE
+        return 200, payload
+
+    def _task_get(self, params: Dict[str, Any]) -> Reply:
+        task_id = params.get("taskId") or params.get("TASKID") or params.get("id")
+        task = self._by_id.get(int(task_id)) if task_id else None
+        if task is None:
+            return _api_error("ERROR_CORE", "Tarefa não encontrada ou acesso negado")
+        return 200, {"result": {"task": task}}
+
+    def _elapsed_items(self, params: Dict[str, Any]) -> Reply:
+        task_id = params.get("TASKID") or params.get("taskId")
+        if not task_id or int(task_id) not in self._by_id:
+            return _api_error("ERROR_CORE", "Tarefa não encontrada ou acesso negado")
+        items = self.portal.elapsed_items.get(int(task_id), [])
+        return 200, {"result": items, "total": len(items)}
+
+    def _batch(self, commands: Any, halt: Any = None) -> Reply:
+        if not isinstance(commands, dict) or not commands:
+            return _api_error("INVALID_ARG_VALUE", "cmd vazio ou inválido")
+        if len(commands) > MAX_BATCH_COMMANDS:
+            return _api_error("ERROR_BATCH_LENGTH_EXCEEDED", "Max batch length exceeded")
+        results, errors, totals, nexts = {}, {}, {}, {}
+        for key, command in commands.items():
+            method, _, query = str(command).partition("?")
+            self._count("commands", method)
+            params = {k: v[-1] for k, v in parse_qs(query, keep_blank_values=True).items()}
+            status, payload = self._call(method, params)
+            if status != 200 or "error" in payload:
+                errors[key] = payload
+                if str(halt) == "1":
+                    break
+                continue
+            results[key] = payload.get("result")
+            if "total" in payload:
+                totals[key] = payload["total"]
+            if "next" in payload:
+                nexts[key] = payload["next"]
+        # O Bitrix (PHP) serializa coleções vazias como []
+        return 200, {"result": {
+            "result": results or [],
+            "result_error": errors or [],
+            "result_total": totals or [],
+            "result_next": nexts or [],
+            "result_time": [],
+        }}
+
+
+class _FakeBitrixHandler(BaseHTTPRequestHandler):
+    server: FakeBitrixServer
+
+    def _method_from_path(self) -> Optional[str]:
+        # /rest/<usuário>/<token>/<método>[.json]
+        parts = urlsplit(self.path).path.strip("/").split("/")
+        if len(parts) != 4 or parts[0] != "rest":
+            return None
+        if parts[1] != str(self.server.user_id) or parts[2] != self.server.token:
+            return ""
+        method = parts[3]
+        return method[:-5] if method.endswith(".json") else method
+
+    def _query_params(self) -> Dict[str, Any]:
+        query = urlsplit(self.path).query
+        return {k: v[-1] for k, v in parse_qs(query, keep_blank_values=True).items()}
+
+    def _reply(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, params: Dict[str, Any]) -> None:
+        method = self._method_from_path()
+        if method is None:
+            self._reply(*_api_error("NOT_FOUND", "Use /rest/<usuário>/<token>/<método>", status=404))
+        elif method == "":
+            self._reply(*_api_error("INVALID_CREDENTIALS", "Invalid request credentials", status=401))
+        else:
+            self._reply(*self.server.dispatch(method, params))
+
+    def do_GET(self) -> None:
+        self._handle(self._query_params())
+
+    def do_POST(self) -> None:
+        params = self._query_params()
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        content_type = self.headers.get("Content-Type", "")
+        if body and "json" in content_type:
+            try:
+                params.update(json.loads(body))
+            except json.JSONDecodeError:
+                self._reply(*_api_error("INVALID_REQUEST", "JSON inválido"))
+                return
+        elif body:
+            form = {k: v[-1] for k, v in parse_qs(body.decode("utf-8"), keep_blank_values=True).items()}
+            # cmd[chave]=método?query (formato de formulário do batch)
+            commands = {k[4:-1]: v for k, v in form.items() if k.startswith("cmd[") and k.endswith("]")}
+            params.update({k: v for k, v in form.items() if not k.startswith("cmd[")})
+            if commands:
+                params["cmd"] = commands
+        self._handle(params)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API REST do Bitrix24")
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço (padrão: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Porta (padrão: 8765)")
+    parser.add_argument("--users", type=int, default=50, help="Usuários do portal sintético (padrão: 50)")
+    parser.add_argument("--tasks", type=int, default=2000, help="Tarefas do portal sintético (padrão: 2000)")
+    parser.add_argument("--entries", type=int, default=None, help="Total de lançamentos (padrão: 2 por tarefa)")
+    parser.add_argument("--portal-dir", default=None, help="Servir um portal gravado por synthetic_portal.py --out")
+    parser.add_argument("--seed", type=int, default=0, help="Semente dos dados, atrasos e erros (padrão: 0)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Atraso por requisição em segundos (padrão: 0)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Atraso aleatório adicional máximo em segundos")
+    parser.add_argument("--command-latency", type=float, default=0.0, help="Atraso por comando dentro de batch")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requisições por segundo (0 = sem limite)")
+    parser.add_argument("--burst", type=int, default=50, help="Requisições acumuláveis no limite (padrão: 50)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de requisições com erro (ex: 0.01)")
+    parser.add_argument("--error-kind", choices=("http", "api", "mixed"), default="http", help="Tipo de erro simulado")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if args.portal_dir:
+        portal = load_portal(args.portal_dir)
+    else:
+        portal = generate_portal(users=args.users, tasks=args.tasks, entries=args.entries, seed=args.seed)
+    server = FakeBitrixServer(
+        portal, host=args.host, port=args.port, latency=args.latency, jitter=args.jitter,
+        command_latency=args.command_latency, rate_limit=args.rate_limit, burst=args.burst,
+        error_rate=args.error_rate, error_kind=args.error_kind, seed=args.seed
+    )
+    logger.info(f"Portal sintético: {portal.summary()}")
+    print(f"BITRIX_WEBHOOK_BASE={server.webhook_base}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Requisições atendidas: {server.snapshot_counters()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,22 @@
 import argparse
 import logging
 import sys
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Any
 
 from config import validate_config
 from bitrix_client import BitrixClient
-from excel_handler import read_collaborators_sheet, write_tasks_excel
-from task_processor import determine_scope_ids, collect_task_ids, enrich_tasks
+from bitrix_directory import get_bitrix_directory, fill_unseen_people
+from excel_handler import read_collaborators_sheet
+from export_writers import EXPORT_FORMATS, ExportWriter, get_export_writer
+from export_stats import ExportStats, activate, annotate_export, export_stage, finish_export_stats, record_rows
+from export_profiling import export_profiler
+from task_processor import determine_scope_ids, collect_task_versions, enrich_tasks
 from time_entries_handler import fetch_all_time_entries, process_time_entries, calculate_total_time
-from web_services import format_time_entry_date, format_status, format_data_conclusao
+from date_parsing import format_display_date
+from web_services import format_status, format_data_conclusao
 
 # Configurar logging
 logging.basicConfig(
@@ -73,14 +79,13 @@ def combine_tasks_with_time_entries(
         # Dados base da tarefa (repetidos em todas as linhas)
         accomplices_names = task.get("accomplices_names") or []
         participants_str = ", ".join(str(n) for n in accomplices_names) if accomplices_names else ""
-        created_str = task.get("created_date", "") or ""
         base_row = {
             "Task_ID": task_id,
             "Título": task["title"],
             "Status": format_status(task.get("status")),
             "Data de Conclusão": format_data_conclusao(task.get("status"), task.get("closed_date")),
             "Deadline": task["deadline"] if task["deadline"] else "",
-            "Criada_Em": format_time_entry_date(created_str) if created_str else "",
+            "Criada_Em": format_display_date(task.get("created_date"), "created_date"),
             "Responsável": task["responsible_name"],
             "Participantes": participants_str,
             "Tempo_Estimado": format_time(task.get("time_estimate") or 0),
@@ -110,6 +115,91 @@ def combine_tasks_with_time_entries(
     return excel_rows
 
 
+def _run_export(args: argparse.Namespace, writer: ExportWriter) -> None:
+    """Executa a exportação do CLI (chamada por main com a medição da exportação ativa)."""
+    # Validar configuração
+    validate_config()
+    logger.info("Configuração validada com sucesso")
+    
+    # Inicializar cliente Bitrix24
+    client = BitrixClient()
+    logger.info("Cliente Bitrix24 inicializado")
+    
+    # Ler planilha de colaboradores
+    collaborators_map = read_collaborators_sheet(args.input)
+    
+    # Determinar escopo de IDs
+    scope_ids = determine_scope_ids(
+        collaborators_map,
+        dept=args.dept,
+        user_substring=args.user
+    )
+    
+    if not scope_ids:
+        logger.error("Nenhum colaborador encontrado no escopo. Verifique os filtros.")
+        annotate_export(error="EmptyScope")
+        sys.exit(1)
+    
+    # Coletar IDs de tarefas
+    with export_stage("collect"):
+        task_versions = collect_task_versions(
+            client,
+            scope_ids,
+            activity_from=args.active_from,
+            activity_to=args.active_to,
+            status=args.status
+        )
+    
+    if not task_versions:
+        logger.warning("Nenhuma tarefa encontrada com os filtros fornecidos.")
+        # Criar Excel vazio mesmo assim
+        excel_rows = []
+    else:
+        # Nomes: planilha completada pelo diretório do Bitrix (se habilitado); o escopo já foi definido
+        directory = get_bitrix_directory()
+        lookup_map = collaborators_map
+        if directory is not None:
+            with export_stage("directory"):
+                lookup_map = dict(directory.merged_map(client, collaborators_map))
+        
+        # Enriquecer tarefas (conjunto de IDs: mantém a ordem das linhas no arquivo gerado)
+        task_ids = set(task_versions)
+        with export_stage("enrich"):
+            enriched_tasks = enrich_tasks(client, task_ids, scope_ids, lookup_map, task_versions=task_versions)
+        
+        # Buscar lançamentos de tempo
+        with export_stage("time_entries"):
+            time_entries_map = fetch_all_time_entries(client, task_ids)
+        
+        if directory is not None:
+            with export_stage("directory"):
+                fill_unseen_people(directory, client, enriched_tasks, time_entries_map, lookup_map)
+        
+        # Combinar tarefas com lançamentos de tempo
+        with export_stage("rows"):
+            excel_rows = combine_tasks_with_time_entries(
+                enriched_tasks,
+                time_entries_map,
+                lookup_map
+            )
+    record_rows(len(excel_rows))
+    
+    # Gerar caminho de saída
+    if args.output:
+        output_path = args.output
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_path = f"Exportacao_Tarefas_{timestamp}.{writer.extension}"
+    
+    # Escrever arquivo no formato escolhido
+    with export_stage("write"):
+        writer.write(excel_rows, output_path)
+    
+    logger.info(f"Exportação concluída com sucesso!")
+    logger.info(f"Arquivo gerado: {output_path}")
+    logger.info(f"Total de linhas: {len(excel_rows)}")
+
+
 def main():
     """Função principal do CLI."""
     parser = argparse.ArgumentParser(
@@ -157,81 +247,44 @@ def main():
         "--output",
         type=str,
         default=None,
-        help="Caminho do arquivo Excel de saída (padrão: Exportacao_Tarefas_YYYYMMDD_HHMMSS.xlsx)"
+        help="Caminho do arquivo de saída (padrão: Exportacao_Tarefas_YYYYMMDD_HHMMSS.<formato>)"
+    )
+    
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=EXPORT_FORMATS,
+        default="xlsx",
+        help="Formato do arquivo de saída (padrão: xlsx). parquet só aparece com o pacote pyarrow instalado"
+    )
+    
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Gerar profile (cProfile) da exportação em EXPORT_PROFILE_DIR e listar as funções mais custosas no log"
     )
     
     args = parser.parse_args()
     
-    try:
-        # Validar configuração
-        validate_config()
-        logger.info("Configuração validada com sucesso")
-        
-        # Inicializar cliente Bitrix24
-        client = BitrixClient()
-        logger.info("Cliente Bitrix24 inicializado")
-        
-        # Ler planilha de colaboradores
-        collaborators_map = read_collaborators_sheet(args.input)
-        
-        # Determinar escopo de IDs
-        scope_ids = determine_scope_ids(
-            collaborators_map,
-            dept=args.dept,
-            user_substring=args.user
-        )
-        
-        if not scope_ids:
-            logger.error("Nenhum colaborador encontrado no escopo. Verifique os filtros.")
+    writer = get_export_writer(args.format)
+    
+    stats = ExportStats(source="cli", format=writer.name)
+    profiler = export_profiler(stats.export_id, requested=args.profile)
+    with activate(stats), profiler or nullcontext():
+        try:
+            _run_export(args, writer)
+        except KeyboardInterrupt as e:
+            stats.context["error"] = type(e).__name__
+            logger.info("Operação cancelada pelo usuário")
             sys.exit(1)
-        
-        # Coletar IDs de tarefas
-        task_ids = collect_task_ids(
-            client,
-            scope_ids,
-            activity_from=args.active_from,
-            activity_to=args.active_to,
-            status=args.status
-        )
-        
-        if not task_ids:
-            logger.warning("Nenhuma tarefa encontrada com os filtros fornecidos.")
-            # Criar Excel vazio mesmo assim
-            excel_rows = []
-        else:
-            # Enriquecer tarefas
-            enriched_tasks = enrich_tasks(client, task_ids, scope_ids, collaborators_map)
-            
-            # Buscar lançamentos de tempo
-            time_entries_map = fetch_all_time_entries(client, task_ids)
-            
-            # Combinar tarefas com lançamentos de tempo
-            excel_rows = combine_tasks_with_time_entries(
-                enriched_tasks,
-                time_entries_map,
-                collaborators_map
-            )
-        
-        # Gerar caminho de saída
-        if args.output:
-            output_path = args.output
-        else:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_path = f"Exportacao_Tarefas_{timestamp}.xlsx"
-        
-        # Escrever Excel
-        write_tasks_excel(excel_rows, output_path)
-        
-        logger.info(f"Exportação concluída com sucesso!")
-        logger.info(f"Arquivo gerado: {output_path}")
-        logger.info(f"Total de linhas: {len(excel_rows)}")
-        
-    except KeyboardInterrupt:
-        logger.info("Operação cancelada pelo usuário")
-        sys.exit(1)
-    except Exception as e:
-        logger.error(f"Erro durante a execução: {e}", exc_info=True)
-        sys.exit(1)
+        except Exception as e:
+            stats.context["error"] = type(e).__name__
+            logger.error(f"Erro durante a execução: {e}", exc_info=True)
+            sys.exit(1)
+        finally:
+            if profiler is not None:
+                profiler.finish()
+            finish_export_stats(stats)
 
 
 if __name__ == "__main__":
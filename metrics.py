@@ -0,0 +1,251 @@
+"""Métricas do processo no formato texto do Prometheus (GET /metrics), sem dependências externas.
+
+Contadores, gauges e histogramas simples, com rótulos, mantidos em memória e protegidos por lock.
+O custo por observação é um incremento num dicionário; o texto só é montado quando /metrics é lido.
+Cada worker do uvicorn tem as suas próprias métricas (o Prometheus soma as séries por instância).
+
+Os valores vêm de export_stats (etapas, chamadas ao Bitrix, exportações em andamento) e dos caches
+(record_cache); valores que já são contados em outro lugar (ex: memo das datas) entram por
+register_collector e são lidos apenas no momento da coleta.
+"""
+import asyncio
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Prefixo de todas as métricas
+NAMESPACE = "bitrix_exporter"
+
+# Limites (segundos) dos histogramas
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+REQUEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+EXPORT_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+LOOP_LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+_INF_BUCKET = 'le="+Inf"'
+
+
+def _format_value(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = f"{NAMESPACE}_{name}"
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, label_values: Sequence[str]) -> LabelValues:
+        if len(label_values) != len(self.labels):
+            raise ValueError(f"{self.name}: esperados rótulos {self.labels}, recebidos {tuple(label_values)}")
+        return tuple(str(v) for v in label_values)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Contador monotônico (sufixo _total no nome)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {} if labels else {(): 0.0}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        key = self._key(label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(self._key(label_values), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_label_text(self.labels, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Valor que sobe e desce (ex: exportações em andamento)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {} if labels else {(): 0.0}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        key = self._key(label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1.0) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(self._key(label_values), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_label_text(self.labels, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Histograma cumulativo com limites fixos (_bucket, _sum e _count por combinação de rótulos)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # {rótulos: [contagem por limite..., sum, count]}
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        key = self._key(label_values)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, *label_values: str) -> float:
+        state = self._values.get(self._key(label_values))
+        return state[-1] if state else 0.0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = self._header()
+        for key, state in items:
+            cumulative = 0.0
+            for bound, hits in zip(self.buckets, state):
+                cumulative += hits
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_bucket{_label_text(self.labels, key, _INF_BUCKET)} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {_format_value(state[-1])}")
+        return lines
+
+
+EXPORT_STAGE_SECONDS = Histogram(
+    "export_stage_seconds", "Duração de cada etapa das exportações.", ("stage",), STAGE_BUCKETS
+)
+EXPORT_SECONDS = Histogram(
+    "export_seconds", "Duração total das exportações.", ("format",), EXPORT_BUCKETS
+)
+EXPORTS_TOTAL = Counter(
+    "exports_total", "Exportações concluídas, por formato e resultado (ok/error).", ("format", "outcome")
+)
+EXPORT_ROWS_TOTAL = Counter("export_rows_total", "Linhas produzidas pelas exportações.", ("format",))
+EXPORTS_IN_FLIGHT = Gauge("exports_in_flight", "Exportações em andamento neste processo.")
+BITRIX_REQUESTS_TOTAL = Counter(
+    "bitrix_requests_total",
+    "Requisições HTTP ao Bitrix24 por método e resultado (ok/api_error/http_error/timeout).",
+    ("method", "outcome"),
+)
+BITRIX_REQUEST_SECONDS = Histogram(
+    "bitrix_request_seconds", "Duração das requisições HTTP ao Bitrix24.", ("method",), REQUEST_BUCKETS
+)
+BITRIX_BATCH_COMMANDS_TOTAL = Counter(
+    "bitrix_batch_commands_total", "Comandos enviados dentro de batch, por método.", ("method",)
+)
+BITRIX_RESPONSE_BYTES_TOTAL = Counter("bitrix_response_bytes_total", "Bytes de resposta recebidos do Bitrix24.")
+BITRIX_RETRIES_TOTAL = Counter("bitrix_retries_total", "Retentativas de requisições ao Bitrix24.")
+CACHE_REQUESTS_TOTAL = Counter(
+    "cache_requests_total", "Consultas aos caches por cache e resultado (hit/miss/bypass).", ("cache", "result")
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds",
+    "Atraso do event loop do servidor web em cada medição (tempo em que o loop ficou bloqueado).",
+    (),
+    LOOP_LAG_BUCKETS,
+)
+
+_METRICS: List[_Metric] = [
+    EXPORT_STAGE_SECONDS, EXPORT_SECONDS, EXPORTS_TOTAL, EXPORT_ROWS_TOTAL, EXPORTS_IN_FLIGHT,
+    BITRIX_REQUESTS_TOTAL, BITRIX_REQUEST_SECONDS, BITRIX_BATCH_COMMANDS_TOTAL, BITRIX_RESPONSE_BYTES_TOTAL,
+    BITRIX_RETRIES_TOTAL, CACHE_REQUESTS_TOTAL, EVENT_LOOP_LAG_SECONDS,
+]
+
+# Funções chamadas na coleta que devolvem (cache, hits, misses) de caches contados em outro lugar
+_collectors: List[Callable[[], Iterable[Tuple[str, int, int]]]] = []
+
+
+def record_cache(cache: str, result: str) -> None:
+    """Conta uma consulta ao cache (result: "hit", "miss" ou "bypass")."""
+    CACHE_REQUESTS_TOTAL.inc(cache, result)
+
+
+def register_collector(collector: Callable[[], Iterable[Tuple[str, int, int]]]) -> None:
+    """Registra uma função que devolve (cache, hits, misses) acumulados, lida a cada coleta."""
+    _collectors.append(collector)
+
+
+async def monitor_event_loop(interval: float) -> None:
+    """
+    Mede continuamente o atraso do event loop: quanto cada asyncio.sleep(interval) passou do previsto.
+
+    Um handler async que bloqueia o loop por N segundos aparece como uma medição de ~N segundos;
+    a soma do histograma é o tempo total bloqueado.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(loop.time() - started - interval, 0.0))
+
+
+def _collected_cache_lines() -> List[str]:
+    samples = []
+    for collector in _collectors:
+        try:
+            samples.extend(collector())
+        except Exception:
+            continue
+    if not samples:
+        return []
+    name = f"{NAMESPACE}_memo_requests_total"
+    lines = [f"# HELP {name} Consultas aos memos em memória por memo e resultado (hit/miss).", f"# TYPE {name} counter"]
+    for cache, hits, misses in sorted(samples):
+        lines.append(f'{name}{{cache="{_escape_label(cache)}",result="hit"}} {hits}')
+        lines.append(f'{name}{{cache="{_escape_label(cache)}",result="miss"}} {misses}')
+    return lines
+
+
+def render_metrics(metrics: Optional[Iterable[_Metric]] = None) -> str:
+    """Texto de exposição do Prometheus (versão 0.0.4) com todas as métricas do processo."""
+    lines: List[str] = []
+    for metric in metrics if metrics is not None else _METRICS:
+        lines.extend(metric.render())
+    if metrics is None:
+        lines.extend(_collected_cache_lines())
+    return "\n".join(lines) + "\n"
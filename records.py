@@ -0,0 +1,164 @@
+"""Registros compactos (__slots__) para tarefas, lançamentos e linhas da exportação.
+
+Substituem os dicionários que atravessam o pipeline (enrich_tasks -> process_time_entries ->
+combine_tasks_with_time_entries) e ocupam boa parte da memória em exportações grandes. Todos
+se comportam como Mapping (get, [], in, keys, items, comparação com dict), então o código que
+lia os dicionários continua funcionando.
+"""
+import sys
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from excel_handler import EXCEL_EXPORT_COLUMNS
+
+
+def intern_text(value: Any) -> Any:
+    """sys.intern para textos que se repetem muito (nomes, departamentos, status, tempos formatados)."""
+    if type(value) is str:
+        return sys.intern(value)
+    return value
+
+
+class _SlotRecord(MutableMapping):
+    """Base: campos em __slots__, acessíveis também como chaves de dicionário (_fields define a ordem)."""
+
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self._fields:
+            return default
+        return getattr(self, key, default)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self._fields:
+            raise KeyError(f"{type(self).__name__} não tem o campo {key!r}")
+        setattr(self, key, value)
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError(f"{type(self).__name__} não permite remover campos")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._fields
+
+    def copy(self) -> Dict[str, Any]:
+        """Cópia como dicionário comum."""
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+
+class TaskRecord(_SlotRecord):
+    """Tarefa normalizada por enrich_tasks (mesmas chaves do dicionário anterior)."""
+
+    __slots__ = (
+        "task_id", "title", "status", "deadline", "activity_date", "created_date", "closed_date",
+        "time_spent_in_logs", "time_estimate", "responsible_id", "accomplices_ids", "scope_involved",
+        "responsible_name", "accomplices_names", "departments",
+    )
+    _fields = __slots__
+
+    def __init__(self, **values: Any):
+        for field in self._fields:
+            setattr(self, field, values.pop(field, None))
+        if values:
+            raise TypeError(f"Campos desconhecidos para TaskRecord: {sorted(values)}")
+
+
+class TimeEntryRecord(_SlotRecord):
+    """Lançamento de tempo processado (process_time_entries); minutes/hours são calculados a partir de seconds."""
+
+    __slots__ = ("user_id", "user_name", "seconds", "comment", "created_date")
+    _fields = __slots__ + ("minutes", "hours")
+
+    def __init__(self, user_id: Optional[int], user_name: str, seconds: int, comment: str, created_date: str):
+        self.user_id = user_id
+        self.user_name = user_name
+        self.seconds = seconds
+        self.comment = comment
+        self.created_date = created_date
+
+    @property
+    def minutes(self) -> float:
+        return self.seconds / 60.0
+
+    @property
+    def hours(self) -> float:
+        return self.seconds / 3600.0
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in ("minutes", "hours"):
+            raise KeyError(f"{key} é calculado a partir de seconds")
+        super().__setitem__(key, value)
+
+
+# Colunas preenchidas por lançamento; as demais são da tarefa e compartilhadas entre as linhas dela
+ENTRY_COLUMNS = ("Tempo_Lançamento", "Quem_Lançou", "Data do lançamento", "Comentário_Lançamento")
+TASK_COLUMNS = tuple(col for col in EXCEL_EXPORT_COLUMNS if col not in ENTRY_COLUMNS)
+_COLUMN_POSITIONS = {
+    **{col: (0, i) for i, col in enumerate(TASK_COLUMNS)},
+    **{col: (1, i) for i, col in enumerate(ENTRY_COLUMNS)},
+}
+_EMPTY_ENTRY = ("", "", "", "")
+# ExportRow.as_tuple intercala os valores do lançamento nesta posição; precisam ser colunas contíguas
+_ENTRY_START = EXCEL_EXPORT_COLUMNS.index(ENTRY_COLUMNS[0])
+if tuple(EXCEL_EXPORT_COLUMNS[_ENTRY_START:_ENTRY_START + len(ENTRY_COLUMNS)]) != ENTRY_COLUMNS:
+    raise RuntimeError(f"As colunas de lançamento {ENTRY_COLUMNS} precisam ser contíguas em EXCEL_EXPORT_COLUMNS")
+
+
+class ExportRow(Mapping):
+    """
+    Linha da exportação (colunas de EXCEL_EXPORT_COLUMNS), somente leitura.
+
+    Guarda duas tuplas: os valores da tarefa (TASK_COLUMNS), compartilhados por todas as linhas
+    da mesma tarefa, e os do lançamento (ENTRY_COLUMNS).
+    """
+
+    __slots__ = ("task_values", "entry_values")
+
+    def __init__(self, task_values: Tuple[Any, ...], entry_values: Tuple[Any, ...] = _EMPTY_ENTRY):
+        self.task_values = task_values
+        self.entry_values = entry_values
+
+    def __getitem__(self, column: str) -> Any:
+        part, index = _COLUMN_POSITIONS[column]
+        return (self.entry_values if part else self.task_values)[index]
+
+    def get(self, column: str, default: Any = None) -> Any:
+        position = _COLUMN_POSITIONS.get(column)
+        if position is None:
+            return default
+        return (self.entry_values if position[0] else self.task_values)[position[1]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(EXCEL_EXPORT_COLUMNS)
+
+    def __len__(self) -> int:
+        return len(EXCEL_EXPORT_COLUMNS)
+
+    def __contains__(self, column: object) -> bool:
+        return column in _COLUMN_POSITIONS
+
+    def as_tuple(self) -> Tuple[Any, ...]:
+        """Valores na ordem de EXCEL_EXPORT_COLUMNS."""
+        task_values = self.task_values
+        return task_values[:_ENTRY_START] + self.entry_values + task_values[_ENTRY_START:]
+
+    def copy(self) -> Dict[str, Any]:
+        """Cópia como dicionário comum."""
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"ExportRow({dict(self.items())!r})"
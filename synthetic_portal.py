@@ -0,0 +1,433 @@
+"""Portal Bitrix24 sintético (usuários, tarefas e lançamentos de tempo) para testes e benchmarks sem rede.
+
+Os dados têm o formato devolvido pela API (tarefas como em tasks.task.get, lançamentos como em
+task.elapseditem.getlist) e são determinísticos para uma mesma semente. São servidos por
+fake_bitrix_server.py.
+
+Para parecer um portal real:
+
+- IDs de usuário esparsos e departamentos de tamanhos diferentes (com a grafia variando na planilha,
+  ex: "Comercial" e "COMERCIAL");
+- poucos usuários concentram muitas tarefas (pesos de Zipf) e os participantes vêm, na maioria, da
+  mesma equipe do responsável;
+- uma parte dos usuários não está na planilha (ex: desligados), mas aparece nas tarefas;
+- uma fração das tarefas e dos lançamentos usa as grafias alternativas de chaves que a leitura
+  aceita (ID/TITLE/CREATED_DATE..., DATE_CREATE/MEMBERS, userId/seconds/comment...).
+
+Uso (gera planilha + dados da API em uma pasta; fake_bitrix_server.py --portal-dir serve a pasta):
+    python synthetic_portal.py --out .cache/portal                     # escala de produção
+    python synthetic_portal.py --out /tmp/portal --users 50 --tasks 2000 --entries 6000 --seed 7
+"""
+import argparse
+import bisect
+import gzip
+import itertools
+import json
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+# Fuso do portal nas datas geradas (o Bitrix devolve datas com o fuso do portal)
+PORTAL_TZ = timezone(timedelta(hours=3))
+# Período coberto pelas datas das tarefas
+PORTAL_START = datetime(2025, 1, 1, 8, 0, tzinfo=PORTAL_TZ)
+PORTAL_DAYS = 365
+
+# Volume de um portal de produção
+PRODUCTION_SCALE = {"users": 500, "tasks": 50000, "entries": 300000}
+
+# Departamentos e peso relativo de cada um no quadro
+DEPARTMENTS = (("COMERCIAL", 4), ("DTC", 3), ("GI", 2), ("RNA", 1))
+FIRST_NAMES = (
+    "Ana", "Bruno", "Carla", "Daniel", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela", "João",
+    "Karina", "Lucas", "Mariana", "Mateus", "Natália", "Otávio", "Paula", "Quézia", "Rafael", "Sofia",
+    "Thiago", "Úrsula", "Vinícius", "Yasmin",
+)
+LAST_NAMES = (
+    "Almeida", "Barbosa", "Cardoso", "Dias", "Esteves", "Ferreira", "Gomes", "Honorato", "Lima", "Martins",
+    "Nogueira", "Oliveira", "Pereira", "Ribeiro", "Santos", "Teixeira", "Vieira", "Conceição", "Araújo",
+)
+COMMENTS = ("", "", "Reunião de alinhamento", "Ajustes solicitados pelo cliente", "Revisão", "Análise de dados")
+# Códigos de status do Bitrix (2 = pendente, 3 = em andamento, 4 = aguardando controle, 5 = concluída, 6 = adiada)
+STATUSES = ("2", "3", "4", "5", "5", "5", "6")
+
+# Grafias das tarefas: camelCase de tasks.task.get, MAIÚSCULAS e a variante antiga (DATE_CREATE, MEMBERS)
+_UPPER_TASK_KEYS = {
+    "id": "ID", "parentId": "PARENT_ID", "title": "TITLE", "description": "DESCRIPTION", "priority": "PRIORITY",
+    "status": "STATUS", "createdBy": "CREATED_BY", "createdDate": "CREATED_DATE", "responsibleId": "RESPONSIBLE_ID",
+    "changedBy": "CHANGED_BY", "changedDate": "CHANGED_DATE", "closedBy": "CLOSED_BY", "closedDate": "CLOSED_DATE",
+    "activityDate": "ACTIVITY_DATE", "deadline": "DEADLINE", "groupId": "GROUP_ID", "allowTimeTracking": "ALLOW_TIME_TRACKING",
+    "timeEstimate": "TIME_ESTIMATE", "timeSpentInLogs": "TIME_SPENT_IN_LOGS", "commentsCount": "COMMENTS_COUNT",
+    "accomplices": "ACCOMPLICES", "auditors": "AUDITORS",
+}
+_LEGACY_TASK_KEYS = dict(_UPPER_TASK_KEYS, createdDate="DATE_CREATE", accomplices="MEMBERS", timeEstimate="ESTIMATE")
+_CAMEL_ENTRY_KEYS = {
+    "ID": "id", "TASK_ID": "taskId", "USER_ID": "userId", "COMMENT_TEXT": "comment", "SECONDS": "seconds",
+    "MINUTES": "minutes", "SOURCE": "source", "CREATED_DATE": "createdDate", "DATE_START": "dateStart",
+    "DATE_STOP": "dateStop",
+}
+
+
+def bitrix_datetime(value: datetime) -> str:
+    """Data no formato da API (ex: 2025-04-28T13:56:00+03:00)."""
+    return value.isoformat(timespec="seconds")
+
+
+class TaskFacts:
+    """Campos de uma tarefa independentes da grafia das chaves (usados pelo servidor local para filtrar)."""
+
+    __slots__ = ("task_id", "responsible_id", "accomplices", "status", "activity_date")
+
+    def __init__(self, task_id: int, responsible_id: int, accomplices: List[int], status: str, activity_date: datetime):
+        self.task_id = task_id
+        self.responsible_id = responsible_id
+        self.accomplices = accomplices
+        self.status = status
+        self.activity_date = activity_date
+
+
+class SyntheticPortal:
+    """
+    Dados de um portal sintético.
+
+    Atributos:
+        users: {user_id: {"name": str, "dept": str}} de todos os usuários do portal
+        sheet_users: IDs que estão na planilha de colaboradores (os demais só aparecem nas tarefas)
+        tasks: Tarefas no formato de tasks.task.get (grafia das chaves varia), em ordem de ID
+        facts: {task_id: TaskFacts}
+        elapsed_items: {task_id: [lançamentos no formato de task.elapseditem.getlist]}
+        seed: Semente usada na geração
+    """
+
+    def __init__(
+        self,
+        users: Dict[int, Dict[str, str]],
+        tasks: List[Dict[str, Any]],
+        elapsed_items: Dict[int, List[Dict[str, Any]]],
+        seed: int = 0,
+        sheet_users: Optional[List[int]] = None,
+        facts: Optional[Dict[int, TaskFacts]] = None
+    ):
+        self.users = users
+        self.sheet_users = list(users) if sheet_users is None else sheet_users
+        self.tasks = tasks
+        self.elapsed_items = elapsed_items
+        self.seed = seed
+        self.facts = facts if facts is not None else {f.task_id: f for f in map(_facts_from_task, tasks)}
+
+    def collaborators_map(self, dept: Optional[str] = None) -> Dict[int, Dict[str, str]]:
+        """Colaboradores da planilha (opcionalmente de um departamento) no formato de read_collaborators_sheet."""
+        wanted = dept.strip().upper() if dept else None
+        return {
+            uid: dict(self.users[uid])
+            for uid in self.sheet_users
+            if wanted is None or self.users[uid]["dept"].upper() == wanted
+        }
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "users": len(self.users),
+            "sheet_users": len(self.sheet_users),
+            "tasks": len(self.tasks),
+            "elapsed_items": sum(len(items) for items in self.elapsed_items.values()),
+        }
+
+    def write_collaborators_sheet(self, path: str) -> None:
+        """Grava a planilha de colaboradores (Departamento, Colaboradores, IDs), como a planilha real."""
+        import openpyxl
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "Planilha1"
+        ws.append(("Departamento", "Colaboradores", "IDs"))
+        for uid in self.sheet_users:
+            ws.append((self.users[uid]["dept"], self.users[uid]["name"], uid))
+        _atomic_write(path, wb.save)
+
+    def save(self, directory: str) -> None:
+        """
+        Grava o portal em uma pasta: Planilha de colaboradores.xlsx, users.json, tasks.json.gz e
+        elapsed_items.json.gz (listas e objetos exatamente como a API devolve).
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.write_collaborators_sheet(os.path.join(directory, "Planilha de colaboradores.xlsx"))
+        meta = {"seed": self.seed, "sheet_users": self.sheet_users, "users": {str(k): v for k, v in self.users.items()}}
+        _write_json(os.path.join(directory, "users.json"), meta)
+        _write_json(os.path.join(directory, "tasks.json.gz"), self.tasks)
+        _write_json(os.path.join(directory, "elapsed_items.json.gz"), {str(k): v for k, v in self.elapsed_items.items()})
+
+
+def _atomic_write(path: str, save) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        save(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _write_json(path: str, data: Any) -> None:
+    def _save(tmp_path: str) -> None:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+    _atomic_write(path, _save)
+
+
+def _read_json(path: str) -> Any:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_portal(directory: str) -> SyntheticPortal:
+    """Carrega um portal gravado por SyntheticPortal.save."""
+    meta = _read_json(os.path.join(directory, "users.json"))
+    tasks = _read_json(os.path.join(directory, "tasks.json.gz"))
+    elapsed = _read_json(os.path.join(directory, "elapsed_items.json.gz"))
+    return SyntheticPortal(
+        {int(k): v for k, v in meta["users"].items()},
+        tasks,
+        {int(k): v for k, v in elapsed.items()},
+        seed=meta.get("seed", 0),
+        sheet_users=[int(uid) for uid in meta["sheet_users"]],
+    )
+
+
+def _task_value(task: Dict[str, Any], *keys: str) -> Any:
+    for key in keys:
+        if key in task:
+            return task[key]
+    return None
+
+
+def _facts_from_task(task: Dict[str, Any]) -> TaskFacts:
+    """Fatos de uma tarefa em qualquer uma das grafias geradas (usado ao carregar um portal gravado)."""
+    accomplices = _task_value(task, "accomplices", "ACCOMPLICES", "MEMBERS") or []
+    return TaskFacts(
+        int(_task_value(task, "id", "ID")),
+        int(_task_value(task, "responsibleId", "RESPONSIBLE_ID")),
+        [int(uid) for uid in accomplices],
+        str(_task_value(task, "status", "STATUS")),
+        datetime.fromisoformat(_task_value(task, "activityDate", "ACTIVITY_DATE")),
+    )
+
+
+def _make_users(count: int, inactive_share: float, rng: random.Random):
+    """Usuários com IDs esparsos, equipes dentro de cada departamento e parte fora da planilha."""
+    users = {}
+    teams: Dict[int, List[int]] = {}
+    names = set()
+    next_id = 1
+    dept_names = [name for name, _ in DEPARTMENTS]
+    dept_weights = [weight for _, weight in DEPARTMENTS]
+    for _ in range(count):
+        next_id += rng.choice((1, 1, 1, 2, 3, 7, 15))
+        dept = rng.choices(dept_names, dept_weights)[0]
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        while name in names:
+            name = f"{name.split(' ')[0]} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+        names.add(name)
+        # Planilha real: departamento às vezes só com a inicial maiúscula (siglas continuam em maiúsculas)
+        sheet_dept = dept.capitalize() if len(dept) > 3 and rng.random() < 0.3 else dept
+        users[next_id] = {"name": name, "dept": sheet_dept}
+
+    # Equipes de 3 a 8 pessoas dentro de cada departamento
+    by_dept: Dict[str, List[int]] = {}
+    for uid, info in users.items():
+        by_dept.setdefault(info["dept"].upper(), []).append(uid)
+    for members in by_dept.values():
+        rng.shuffle(members)
+        i = 0
+        while i < len(members):
+            size = rng.randint(3, 8)
+            team = members[i:i + size]
+            for uid in team:
+                teams[uid] = team
+            i += size
+
+    user_ids = list(users)
+    inactive = set(rng.sample(user_ids, int(len(user_ids) * inactive_share)))
+    sheet_users = [uid for uid in user_ids if uid not in inactive]
+    return users, sheet_users, teams, by_dept
+
+
+def _pick_accomplices(responsible: int, dept_members: List[int], team: List[int], user_ids: List[int], rng: random.Random) -> List[int]:
+    count = rng.choices((0, 1, 2, 3, 4), (35, 30, 20, 10, 5))[0]
+    chosen = set()
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.7 and len(team) > 1:
+            pool = team
+        elif roll < 0.9:
+            pool = dept_members
+        else:
+            pool = user_ids
+        candidate = rng.choice(pool)
+        if candidate != responsible:
+            chosen.add(candidate)
+    return sorted(chosen)
+
+
+def _make_task(task_id: int, responsible: int, accomplices: List[int], rng: random.Random) -> Dict[str, Any]:
+    created = PORTAL_START + timedelta(days=rng.randrange(PORTAL_DAYS), minutes=rng.randrange(600))
+    activity = created + timedelta(days=int(rng.expovariate(1 / 10)), minutes=rng.randrange(600))
+    status = rng.choice(STATUSES)
+    return {
+        "id": str(task_id),
+        "parentId": None,
+        "title": f"Tarefa {task_id}",
+        "description": "",
+        "priority": str(rng.choice([1, 1, 2])),
+        "status": status,
+        "createdBy": str(responsible),
+        "createdDate": bitrix_datetime(created),
+        "responsibleId": str(responsible),
+        "changedBy": str(responsible),
+        "changedDate": bitrix_datetime(activity),
+        "closedBy": str(responsible) if status == "5" else None,
+        "closedDate": bitrix_datetime(activity) if status == "5" else None,
+        "activityDate": bitrix_datetime(activity),
+        "deadline": bitrix_datetime(created + timedelta(days=14)) if rng.random() < 0.5 else None,
+        "groupId": "0",
+        "allowTimeTracking": "Y",
+        "timeEstimate": str(rng.choice([0, 0, 3600, 7200, 14400])),
+        "timeSpentInLogs": "0",
+        "commentsCount": str(rng.randrange(20)),
+        "accomplices": [str(uid) for uid in accomplices],
+        "auditors": [],
+    }
+
+
+def _make_elapsed_item(task: Dict[str, Any], item_id: int, rng: random.Random) -> Dict[str, Any]:
+    created = datetime.fromisoformat(task["createdDate"])
+    activity = datetime.fromisoformat(task["activityDate"])
+    span = max(int((activity - created).total_seconds()), 60)
+    seconds = rng.choice([900, 1800, 2700, 3600, 5400, 7200])
+    stop = created + timedelta(seconds=rng.randrange(span))
+    return {
+        "ID": str(item_id),
+        "TASK_ID": task["id"],
+        "USER_ID": rng.choice([task["responsibleId"]] + list(task["accomplices"])),
+        "COMMENT_TEXT": rng.choice(COMMENTS),
+        "SECONDS": str(seconds),
+        "MINUTES": str(seconds // 60),
+        "SOURCE": "1",
+        "CREATED_DATE": bitrix_datetime(stop),
+        "DATE_START": bitrix_datetime(stop - timedelta(seconds=seconds)),
+        "DATE_STOP": bitrix_datetime(stop),
+    }
+
+
+def _with_alternate_casing(task: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    keys = _LEGACY_TASK_KEYS if rng.random() < 0.3 else _UPPER_TASK_KEYS
+    return {keys.get(key, key.upper()): value for key, value in task.items()}
+
+
+def _entry_with_alternate_casing(item: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    if rng.random() < 0.5:
+        return {_CAMEL_ENTRY_KEYS.get(key, key): value for key, value in item.items()}
+    # Alguns portais só preenchem os minutos
+    return dict(item, SECONDS="0")
+
+
+def generate_portal(
+    users: int = 50,
+    tasks: int = 2000,
+    entries_per_task: float = 2.0,
+    seed: int = 0,
+    entries: Optional[int] = None,
+    skew: float = 0.8,
+    inactive_share: float = 0.05,
+    alternate_casing: float = 0.05
+) -> SyntheticPortal:
+    """
+    Gera um portal sintético.
+
+    Args:
+        users: Número de usuários do portal (inclui os que não estão na planilha)
+        tasks: Número de tarefas (IDs a partir de 100000)
+        entries_per_task: Média de lançamentos de tempo por tarefa (ignorado se entries for informado)
+        seed: Semente (mesma semente e parâmetros = mesmos dados)
+        entries: Total exato de lançamentos de tempo
+        skew: Expoente de Zipf das tarefas por responsável (0 = uniforme)
+        inactive_share: Fração de usuários fora da planilha (ex: desligados)
+        alternate_casing: Fração de tarefas e de lançamentos com grafia alternativa das chaves
+
+    Returns:
+        SyntheticPortal
+    """
+    rng = random.Random(seed)
+    portal_users, sheet_users, teams, by_dept = _make_users(users, inactive_share, rng)
+    user_ids = list(portal_users)
+
+    # Tarefas por responsável: pesos de Zipf sobre uma ordem aleatória dos usuários
+    ranked = user_ids[:]
+    rng.shuffle(ranked)
+    responsible_weights = list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(len(ranked))))
+
+    canonical = []
+    for i in range(tasks):
+        task_id = 100000 + i
+        responsible = ranked[bisect.bisect(responsible_weights, rng.random() * responsible_weights[-1])]
+        dept_members = by_dept[portal_users[responsible]["dept"].upper()]
+        accomplices = _pick_accomplices(responsible, dept_members, teams[responsible], user_ids, rng)
+        canonical.append(_make_task(task_id, responsible, accomplices, rng))
+
+    # Lançamentos: sorteados entre as tarefas com pesos log-normais (poucas tarefas longas, muitas curtas)
+    total_entries = entries if entries is not None else int(round(tasks * entries_per_task))
+    elapsed_items: Dict[int, List[Dict[str, Any]]] = {int(t["id"]): [] for t in canonical}
+    if canonical and total_entries > 0:
+        task_weights = list(itertools.accumulate(rng.lognormvariate(0, 1) for _ in canonical))
+        for item_id in range(1, total_entries + 1):
+            task = canonical[bisect.bisect(task_weights, rng.random() * task_weights[-1])]
+            elapsed_items[int(task["id"])].append(_make_elapsed_item(task, item_id, rng))
+
+    portal_tasks = []
+    facts = {}
+    for task in canonical:
+        task_id = int(task["id"])
+        items = elapsed_items[task_id]
+        task["timeSpentInLogs"] = str(sum(int(item["SECONDS"]) for item in items))
+        facts[task_id] = TaskFacts(
+            task_id, int(task["responsibleId"]), [int(uid) for uid in task["accomplices"]],
+            task["status"], datetime.fromisoformat(task["activityDate"]),
+        )
+        if rng.random() < alternate_casing:
+            task = _with_alternate_casing(task, rng)
+        elapsed_items[task_id] = [
+            _entry_with_alternate_casing(item, rng) if rng.random() < alternate_casing else item for item in items
+        ]
+        portal_tasks.append(task)
+    return SyntheticPortal(portal_users, portal_tasks, elapsed_items, seed, sheet_users, facts)
+
+
+def generate_production_portal(seed: int = 0) -> SyntheticPortal:
+    """Portal com o volume de PRODUCTION_SCALE (500 usuários, 50 mil tarefas, 300 mil lançamentos)."""
+    return generate_portal(
+        users=PRODUCTION_SCALE["users"], tasks=PRODUCTION_SCALE["tasks"], entries=PRODUCTION_SCALE["entries"], seed=seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um portal Bitrix24 sintético (planilha + dados da API)")
+    parser.add_argument("--out", required=True, help="Pasta de saída")
+    parser.add_argument("--users", type=int, default=PRODUCTION_SCALE["users"], help="Usuários (padrão: 500)")
+    parser.add_argument("--tasks", type=int, default=PRODUCTION_SCALE["tasks"], help="Tarefas (padrão: 50000)")
+    parser.add_argument("--entries", type=int, default=PRODUCTION_SCALE["entries"], help="Lançamentos (padrão: 300000)")
+    parser.add_argument("--seed", type=int, default=0, help="Semente (padrão: 0)")
+    args = parser.parse_args()
+
+    portal = generate_portal(users=args.users, tasks=args.tasks, entries=args.entries, seed=args.seed)
+    portal.save(args.out)
+    print(f"Portal sintético gravado em {args.out}: {portal.summary()}")
+
+
+if __name__ == "__main__":
+    main()
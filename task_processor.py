@@ -1,10 +1,18 @@
 """Processamento de tarefas: coleta, deduplicação e enriquecimento."""
 import logging
 import unicodedata
-from typing import Dict, List, Set, Optional, Any
+from typing import TYPE_CHECKING, Dict, List, Set, Optional, Any
 from datetime import datetime
 from bitrix_client import BitrixClient
-from config import PAGINATION_SIZE, DEFAULT_TIMEZONE
+from bitrix_cassette import CassetteMissError
+from bitrix_response_cache import TASK_DETAIL_METHOD, ResponseCache
+from config import PAGINATION_SIZE
+from date_parsing import normalize_iso8601
+from export_stats import record_task_detail_cache
+from records import TaskRecord, intern_text
+
+if TYPE_CHECKING:
+    from collaborators_index import CollaboratorsIndex
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +28,8 @@ def _normalize_for_match(text: str) -> str:
 def determine_scope_ids(
     collaborators_map: Dict[int, Dict[str, str]],
     dept: Optional[str] = None,
-    user_substring: Optional[str] = None
+    user_substring: Optional[str] = None,
+    index: Optional["CollaboratorsIndex"] = None
 ) -> List[int]:
     """
     Determina os IDs do escopo baseado nos filtros fornecidos.
@@ -31,27 +40,34 @@ def determine_scope_ids(
         collaborators_map: Mapeamento user_id -> {name, dept}
         dept: Nome do departamento (opcional)
         user_substring: Substring do nome do colaborador (opcional, case-insensitive)
+        index: Índice pré-calculado do mesmo mapeamento (opcional; evita normalizar todos os nomes a cada chamada)
         
     Returns:
         Lista de IDs de usuários do escopo
     """
     if user_substring:
         # Filtrar por substring do nome (case-insensitive e sem acentos, ex: Quezia encontra Quézia)
-        needle = _normalize_for_match(user_substring.strip())
-        scope_ids = [
-            user_id for user_id, info in collaborators_map.items()
-            if needle in _normalize_for_match(info.get("name", ""))
-        ]
+        if index is not None:
+            scope_ids = index.match_ids(user_substring.strip())
+        else:
+            needle = _normalize_for_match(user_substring.strip())
+            scope_ids = [
+                user_id for user_id, info in collaborators_map.items()
+                if needle in _normalize_for_match(info.get("name", ""))
+            ]
         logger.info(f"Filtro --user '{user_substring}': {len(scope_ids)} colaborador(es) encontrado(s)")
         return scope_ids
     
     elif dept:
         # Filtrar por departamento (comparação com strip e case-insensitive)
         dept_clean = (dept or "").strip().upper()
-        scope_ids = [
-            user_id for user_id, info in collaborators_map.items()
-            if (info.get("dept") or "").strip().upper() == dept_clean
-        ]
+        if index is not None:
+            scope_ids = index.ids_for_department(dept_clean)
+        else:
+            scope_ids = [
+                user_id for user_id, info in collaborators_map.items()
+                if (info.get("dept") or "").strip().upper() == dept_clean
+            ]
         logger.info(f"Filtro --dept '{dept}': {len(scope_ids)} colaborador(es) encontrado(s)")
         if not scope_ids:
             depts_na_planilha = set((info.get("dept") or "").strip() for info in collaborators_map.values())
@@ -68,66 +84,29 @@ def determine_scope_ids(
         return scope_ids
 
 
-def normalize_iso8601(date_str: str, default_tz: str = DEFAULT_TIMEZONE) -> str:
+# Campos pedidos a tasks.task.list na coleta: só o ID e o que forma a versão da tarefa
+TASK_VERSION_SELECT = {
+    "select[0]": "ID",
+    "select[1]": "CHANGED_DATE",
+    "select[2]": "ACTIVITY_DATE",
+    "select[3]": "TIME_SPENT_IN_LOGS",
+}
+
+
+def task_version(task: Dict[str, Any]) -> str:
     """
-    Normaliza string ISO8601 para formato aceito pela API Bitrix24.
-    
-    A API Bitrix24 aceita datas no formato ISO8601: YYYY-MM-DDTHH:MM:SS+TZ
-    Algumas versões podem aceitar sem timezone também.
+    Versão de uma tarefa da listagem, comparada com a guardada no cache de detalhes.
     
-    Args:
-        date_str: String de data no formato ISO8601
-        default_tz: Timezone padrão a adicionar (ex: "-03:00")
-        
-    Returns:
-        String ISO8601 normalizada no formato aceito pela API
+    CHANGED_DATE muda a cada edição da tarefa; ACTIVITY_DATE e TIME_SPENT_IN_LOGS entram porque
+    comentários e lançamentos de tempo podem não alterá-lo. Retorna "" quando a listagem não traz
+    CHANGED_DATE (a tarefa é sempre buscada de novo).
     """
-    if not date_str:
+    changed = normalize_task_field(task, "changedDate") or normalize_task_field(task, "CHANGED_DATE")
+    if not changed:
         return ""
-    
-    date_str = date_str.strip()
-    
-    # Se já está no formato correto com timezone completo, retornar como está
-    # Formato: YYYY-MM-DDTHH:MM:SS+TZ ou YYYY-MM-DDTHH:MM:SS-TZ
-    if len(date_str) >= 25 and ("+" in date_str[-6:] or (date_str[-6:].startswith("-") and ":" in date_str[-5:])):
-        return date_str
-    
-    # Se termina com Z, substituir por timezone padrão
-    if date_str.endswith("Z"):
-        date_str = date_str[:-1] + default_tz
-        return date_str
-    
-    # Se tem formato YYYY-MM-DDTHH:MM mas sem segundos/timezone
-    if "T" in date_str:
-        parts = date_str.split("T")
-        if len(parts) == 2:
-            date_part = parts[0]
-            time_part = parts[1]
-            
-            # Se time_part não tem segundos, adicionar :00
-            if ":" in time_part and time_part.count(":") == 1:
-                time_part = time_part + ":00"
-            
-            # Remover qualquer timezone parcial que possa estar presente
-            if "+" in time_part:
-                time_part = time_part.split("+")[0]
-            elif "-" in time_part and len(time_part.split("-")) > 2:
-                # Pode ter timezone no meio, pegar só a parte do tempo
-                time_parts = time_part.split("-")
-                if len(time_parts) > 2:
-                    time_part = "-".join(time_parts[:-1])
-            
-            # Se não tem timezone no final, adicionar
-            if not (time_part.endswith("+03:00") or time_part.endswith("-03:00") or 
-                    (len(time_part) > 6 and (time_part[-6:].startswith("+") or time_part[-6:].startswith("-")))):
-                time_part = time_part + default_tz
-            
-            return f"{date_part}T{time_part}"
-    else:
-        # Apenas data (YYYY-MM-DD), adicionar hora e timezone
-        return date_str + "T00:00:00" + default_tz
-    
-    return date_str
+    activity = normalize_task_field(task, "activityDate") or normalize_task_field(task, "ACTIVITY_DATE") or ""
+    spent = normalize_task_field(task, "timeSpentInLogs") or normalize_task_field(task, "TIME_SPENT_IN_LOGS") or ""
+    return f"{changed}|{activity}|{spent}"
 
 
 def collect_task_ids(
@@ -140,6 +119,27 @@ def collect_task_ids(
     """
     Coleta IDs únicos de tarefas onde pessoas do escopo aparecem como responsável ou participante.
     
+    Mesmo que set(collect_task_versions(...)).
+    
+    Returns:
+        Conjunto de IDs de tarefas únicos (deduplicados)
+    """
+    return set(collect_task_versions(client, scope_ids, activity_from, activity_to, status))
+
+
+def collect_task_versions(
+    client: BitrixClient,
+    scope_ids: List[int],
+    activity_from: Optional[str] = None,
+    activity_to: Optional[str] = None,
+    status: Optional[str] = None
+) -> Dict[int, str]:
+    """
+    Coleta as tarefas onde pessoas do escopo aparecem como responsável ou participante, com a versão de cada uma.
+    
+    A listagem pede só os campos de TASK_VERSION_SELECT; os detalhes ficam para enrich_tasks, que
+    usa a versão para reaproveitar as tarefas que não mudaram desde a última exportação.
+    
     Args:
         client: Instância do BitrixClient
         scope_ids: Lista de IDs do escopo
@@ -148,9 +148,9 @@ def collect_task_ids(
         status: Status da tarefa para filtrar (opcional)
         
     Returns:
-        Conjunto de IDs de tarefas únicos (deduplicados)
+        {ID da tarefa: versão (task_version)}, sem repetições
     """
-    task_ids = set()
+    task_versions: Dict[int, str] = {}
     
     # Normalizar datas se fornecidas
     # A API Bitrix24 pode aceitar datas em diferentes formatos
@@ -173,7 +173,7 @@ def collect_task_ids(
     
     for user_id in scope_ids:
         # Buscar tarefas onde o usuário é responsável
-        filters_responsible = {"filter[RESPONSIBLE_ID]": user_id}
+        filters_responsible = {"filter[RESPONSIBLE_ID]": user_id, **TASK_VERSION_SELECT}
         if activity_from:
             filters_responsible["filter[>=ACTIVITY_DATE]"] = activity_from
             logger.info(f"Filtro aplicado: filter[>=ACTIVITY_DATE] = {activity_from}")
@@ -184,7 +184,7 @@ def collect_task_ids(
             filters_responsible["filter[STATUS]"] = status
         
         # Buscar tarefas onde o usuário é participante
-        filters_accomplice = {"filter[ACCOMPLICE]": user_id}
+        filters_accomplice = {"filter[ACCOMPLICE]": user_id, **TASK_VERSION_SELECT}
         if activity_from:
             filters_accomplice["filter[>=ACTIVITY_DATE]"] = activity_from
         if activity_to:
@@ -213,7 +213,7 @@ def collect_task_ids(
                 for task in tasks:
                     task_id = normalize_task_field(task, "id") or normalize_task_field(task, "ID")
                     if task_id:
-                        task_ids.add(int(task_id))
+                        task_versions[int(task_id)] = task_version(task)
                 
                 # Verificar se há mais páginas
                 # O total pode estar em response["total"] ou response["result"]["total"]
@@ -231,6 +231,8 @@ def collect_task_ids(
                 
                 start += PAGINATION_SIZE
             
+            except CassetteMissError:
+                raise
             except Exception as e:
                 logger.warning(f"Erro ao buscar tarefas (responsável) para usuário {user_id}: {e}")
                 break
@@ -257,7 +259,7 @@ def collect_task_ids(
                 for task in tasks:
                     task_id = normalize_task_field(task, "id") or normalize_task_field(task, "ID")
                     if task_id:
-                        task_ids.add(int(task_id))
+                        task_versions[int(task_id)] = task_version(task)
                 
                 tasks_found_for_user += len(tasks)
                 
@@ -277,6 +279,8 @@ def collect_task_ids(
                 
                 start += PAGINATION_SIZE
             
+            except CassetteMissError:
+                raise
             except Exception as e:
                 logger.warning(f"Erro ao buscar tarefas (participante) para usuário {user_id}: {e}")
                 break
@@ -284,8 +288,8 @@ def collect_task_ids(
         if tasks_found_for_user > 0:
             logger.info(f"Usuário {user_id} (participante): {tasks_found_for_user} tarefas encontradas")
     
-    logger.info(f"Coletados {len(task_ids)} IDs únicos de tarefas")
-    return task_ids
+    logger.info(f"Coletados {len(task_versions)} IDs únicos de tarefas")
+    return task_versions
 
 
 def normalize_task_field(task: Dict[str, Any], field_name: str) -> Any:
@@ -314,6 +318,81 @@ def normalize_task_field(task: Dict[str, Any], field_name: str) -> Any:
     return None
 
 
+# Campos lidos de cada tarefa: nome lógico -> nomes tentados, em ordem (vale o primeiro valor não vazio).
+# Cada nome também é tentado em maiúsculas, minúsculas e capitalizado (ver normalize_task_field).
+TASK_FIELD_CHAINS = {
+    "id": ("id", "ID"),
+    "time_spent_in_logs": ("timeSpentInLogs", "TIME_SPENT_IN_LOGS"),
+    "time_estimate": ("timeEstimate", "TIME_ESTIMATE", "estimate", "ESTIMATE"),
+    "created_date": ("createdDate", "CREATED_DATE", "DATE_CREATE"),
+    "closed_date": ("closedDate", "CLOSED_DATE"),
+    "title": ("title", "TITLE"),
+    "status": ("status", "STATUS"),
+    "deadline": ("deadline", "DEADLINE"),
+    "activity_date": ("activityDate", "ACTIVITY_DATE"),
+    "responsible_id": ("responsibleId", "RESPONSIBLE_ID"),
+    "accomplices": ("accomplices", "ACCOMPLICES", "members", "MEMBERS"),
+}
+
+
+def _first_present_key(keys, field_name: str) -> Optional[str]:
+    """Mesma ordem de tentativas de normalize_task_field, sobre um conjunto de chaves."""
+    for var in (field_name, field_name.upper(), field_name.lower(), field_name.capitalize()):
+        if var in keys:
+            return var
+    return None
+
+
+class TaskFieldAccessor:
+    """
+    Leitura dos campos de TASK_FIELD_CHAINS compilada para um formato de resposta.
+    
+    O formato (conjunto de chaves) vem da primeira tarefa: para cada campo lógico, as chaves
+    que normalize_task_field encontraria são resolvidas uma única vez. Tarefas com exatamente o
+    mesmo conjunto de chaves são lidas com acessos diretos; as demais (chave ausente ou extra)
+    usam normalize_task_field, com resultado idêntico.
+    """
+    
+    def __init__(self, sample_task: Dict[str, Any]):
+        self._keys = set(sample_task.keys())
+        self._plan = []
+        for field, names in TASK_FIELD_CHAINS.items():
+            keys = tuple(k for k in (_first_present_key(self._keys, n) for n in names) if k is not None)
+            self._plan.append((field, keys))
+    
+    def extract(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Lê todos os campos de TASK_FIELD_CHAINS.
+        
+        Returns:
+            {campo lógico: primeiro valor não vazio da cadeia, ou None}
+        """
+        if task.keys() != self._keys:
+            return extract_task_fields(task)
+        values = {}
+        for field, keys in self._plan:
+            value = None
+            for key in keys:
+                value = task[key]
+                if value:
+                    break
+            values[field] = value or None
+        return values
+
+
+def extract_task_fields(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Lê os campos de TASK_FIELD_CHAINS sondando cada nome com normalize_task_field (sem formato pré-compilado)."""
+    values = {}
+    for field, names in TASK_FIELD_CHAINS.items():
+        value = None
+        for name in names:
+            value = normalize_task_field(task, name)
+            if value:
+                break
+        values[field] = value or None
+    return values
+
+
 def normalize_accomplices(accomplices: Any) -> List[int]:
     """
     Normaliza lista de participantes que pode vir como int[], dict[], string "1,2,3" ou None.
@@ -366,41 +445,149 @@ def normalize_accomplices(accomplices: Any) -> List[int]:
     return []
 
 
+def resolve_task_people(normalized_task: Dict[str, Any], collaborators_map: Dict[int, Dict[str, str]]) -> None:
+    """
+    Preenche nomes e departamentos de uma tarefa enriquecida a partir de responsible_id e accomplices_ids.
+    
+    Define "responsible_name", "accomplices_names" (IDs desconhecidos viram "USER_<id>") e
+    "departments" (departamentos das pessoas envolvidas, ordenados). Pode ser chamada de novo
+    quando o mapeamento ganhar IDs que antes eram desconhecidos.
+    
+    Args:
+        normalized_task: Tarefa no formato de enrich_tasks (alterada no lugar)
+        collaborators_map: Mapeamento user_id -> {name, dept}
+    """
+    responsible_id = normalized_task.get("responsible_id")
+    accomplices_ids = normalized_task.get("accomplices_ids") or []
+    
+    if responsible_id:
+        normalized_task["responsible_name"] = collaborators_map.get(responsible_id, {}).get("name", f"USER_{responsible_id}")
+    else:
+        normalized_task["responsible_name"] = ""
+    normalized_task["accomplices_names"] = [
+        collaborators_map.get(acc_id, {}).get("name", f"USER_{acc_id}")
+        for acc_id in accomplices_ids
+    ]
+    
+    # Coletar departamentos de todas as pessoas envolvidas
+    departments = set()
+    if responsible_id:
+        dept = collaborators_map.get(responsible_id, {}).get("dept", "")
+        if dept:
+            departments.add(dept)
+    for acc_id in accomplices_ids:
+        dept = collaborators_map.get(acc_id, {}).get("dept", "")
+        if dept:
+            departments.add(dept)
+    # Mesmos departamentos se repetem em milhares de tarefas: uma única string por combinação
+    normalized_task["departments"] = intern_text(", ".join(sorted(departments))) if departments else ""
+
+
+# Campos de TaskRecord guardados no cache de detalhes (nomes e departamentos são resolvidos a cada exportação)
+TASK_DETAIL_FIELDS = (
+    "task_id", "title", "status", "deadline", "activity_date", "created_date", "closed_date",
+    "time_spent_in_logs", "time_estimate", "responsible_id", "accomplices_ids",
+)
+
+
+def _task_detail_cache(client: BitrixClient) -> Optional[ResponseCache]:
+    cache = client.response_cache
+    if cache is None or not cache.cacheable(TASK_DETAIL_METHOD):
+        return None
+    return cache
+
+
+def _cached_task_details(
+    client: BitrixClient,
+    task_ids: List[int],
+    task_versions: Dict[int, str]
+) -> Dict[int, TaskRecord]:
+    """
+    Tarefas guardadas no cache de detalhes com a mesma versão da listagem atual.
+    
+    Returns:
+        {ID da tarefa: TaskRecord sem nomes e departamentos} só das tarefas que não mudaram
+    """
+    cache = _task_detail_cache(client)
+    versioned = [task_id for task_id in task_ids if task_versions.get(task_id)]
+    if cache is None or not versioned:
+        return {}
+    if not client.use_response_cache:
+        record_task_detail_cache("bypass", len(versioned))
+        return {}
+    
+    found = cache.get_many(client._cache_scope, [
+        (TASK_DETAIL_METHOD, {"taskId": task_id, "version": task_versions[task_id]})
+        for task_id in versioned
+    ])
+    cached = {}
+    for index, fields in found.items():
+        try:
+            record = TaskRecord(scope_involved="", **{field: fields[field] for field in TASK_DETAIL_FIELDS})
+        except (KeyError, TypeError):
+            continue
+        record.status = intern_text(record.status)
+        cached[versioned[index]] = record
+    record_task_detail_cache("hit", len(cached))
+    record_task_detail_cache("miss", len(versioned) - len(cached))
+    return cached
+
+
 def enrich_tasks(
     client: BitrixClient,
     task_ids: Set[int],
     scope_ids: List[int],
-    collaborators_map: Dict[int, Dict[str, str]]
-) -> List[Dict[str, Any]]:
+    collaborators_map: Dict[int, Dict[str, str]],
+    task_versions: Optional[Dict[int, str]] = None
+) -> List[TaskRecord]:
     """
     Enriquece tarefas com detalhes completos, normalizando campos e resolvendo IDs para nomes.
     
+    Com task_versions (de collect_task_versions), as tarefas cuja versão não mudou desde a última
+    busca vêm do cache de detalhes; só as novas ou alteradas vão a tasks.task.get.
+    
     Args:
         client: Instância do BitrixClient
         task_ids: Conjunto de IDs de tarefas
         scope_ids: Lista de IDs do escopo (para identificar "Seu_time_envolvido")
         collaborators_map: Mapeamento user_id -> {name, dept}
+        task_versions: {ID da tarefa: versão} da coleta (opcional)
         
     Returns:
-        Lista de tarefas enriquecidas
+        Lista de tarefas enriquecidas (TaskRecord, acessível como dicionário)
     """
     task_ids_list = list(task_ids)
     total = len(task_ids_list)
+    task_versions = task_versions or {}
     
     logger.info(f"Enriquecendo {total} tarefas...")
     
-    # Buscar detalhes em batch
-    commands = [
-        {"method": "tasks.task.get", "params": {"taskId": task_id}}
-        for task_id in task_ids_list
-    ]
+    records: Dict[int, TaskRecord] = _cached_task_details(client, task_ids_list, task_versions)
+    pending = [task_id for task_id in task_ids_list if task_id not in records]
+    if records:
+        logger.info(f"Cache de detalhes: {len(records)} tarefas sem alteração, {len(pending)} a buscar")
     
-    responses = client._batch(commands)
+    # Buscar detalhes em batch. Tarefas com versão conhecida mudaram (ou são novas) e vão direto ao
+    # Bitrix: o cache de respostas poderia devolver o tasks.task.get anterior à alteração.
+    detail_cache = _task_detail_cache(client)
+    validated = {task_id for task_id in pending if task_versions.get(task_id)} if detail_cache is not None else set()
+    responses: Dict[int, Any] = {}
+    for ids, send in (
+        ([task_id for task_id in pending if task_id in validated], client._send_batches),
+        ([task_id for task_id in pending if task_id not in validated], client._batch),
+    ):
+        if ids:
+            commands = [
+                {"method": "tasks.task.get", "params": {"taskId": task_id}}
+                for task_id in ids
+            ]
+            responses.update(zip(ids, send(commands)))
     
-    enriched_tasks = []
+    accessor: Optional[TaskFieldAccessor] = None
+    to_store = []
     
-    for i, response in enumerate(responses):
-        task_id = task_ids_list[i]
+    for task_id in pending:
+        response = responses.get(task_id)
         
         if not response:
             logger.warning(f"Resposta vazia para tarefa {task_id}")
@@ -420,9 +607,13 @@ def enrich_tasks(
                 logger.warning(f"Tarefa {task_id} não encontrada na resposta")
                 continue
             
-            # Normalizar campos
+            # Normalizar campos (formato detectado na primeira tarefa, leitura direta nas seguintes)
+            if accessor is None:
+                accessor = TaskFieldAccessor(task)
+            fields = accessor.extract(task)
+            
             # Garantir que task_id sempre seja um int válido
-            task_id_value = normalize_task_field(task, "id") or normalize_task_field(task, "ID") or task_id
+            task_id_value = fields["id"] or task_id
             try:
                 task_id_int = int(task_id_value)
             except (ValueError, TypeError):
@@ -430,7 +621,7 @@ def enrich_tasks(
                 task_id_int = int(task_id)
             
             # Extrair tempo total gasto (timeSpentInLogs) se disponível
-            time_spent_in_logs = normalize_task_field(task, "timeSpentInLogs") or normalize_task_field(task, "TIME_SPENT_IN_LOGS")
+            time_spent_in_logs = fields["time_spent_in_logs"]
             if time_spent_in_logs:
                 try:
                     time_spent_seconds = int(time_spent_in_logs)
@@ -440,7 +631,7 @@ def enrich_tasks(
                 time_spent_seconds = None
             
             # Extrair tempo estimado (timeEstimate) se disponível
-            estimate_raw = normalize_task_field(task, "timeEstimate") or normalize_task_field(task, "TIME_ESTIMATE") or normalize_task_field(task, "estimate") or normalize_task_field(task, "ESTIMATE")
+            estimate_raw = fields["time_estimate"]
             if estimate_raw:
                 try:
                     estimate_seconds = int(estimate_raw)
@@ -449,64 +640,48 @@ def enrich_tasks(
             else:
                 estimate_seconds = None
 
-            created_date_raw = normalize_task_field(task, "createdDate") or normalize_task_field(task, "CREATED_DATE") or normalize_task_field(task, "DATE_CREATE") or ""
-            closed_date_raw = normalize_task_field(task, "closedDate") or normalize_task_field(task, "CLOSED_DATE") or ""
-            normalized_task = {
-                "task_id": task_id_int,
-                "title": str(normalize_task_field(task, "title") or normalize_task_field(task, "TITLE") or ""),
-                "status": str(normalize_task_field(task, "status") or normalize_task_field(task, "STATUS") or ""),
-                "deadline": str(normalize_task_field(task, "deadline") or normalize_task_field(task, "DEADLINE") or ""),
-                "activity_date": str(normalize_task_field(task, "activityDate") or normalize_task_field(task, "ACTIVITY_DATE") or ""),
-                "created_date": str(created_date_raw) if created_date_raw else "",
-                "closed_date": str(closed_date_raw) if closed_date_raw else "",
-                "time_spent_in_logs": time_spent_seconds,
-                "time_estimate": estimate_seconds,
-            }
-            
-            # Resolver responsável
-            responsible_id = normalize_task_field(task, "responsibleId") or normalize_task_field(task, "RESPONSIBLE_ID")
-            if responsible_id:
-                responsible_id = int(responsible_id)
-                responsible_info = collaborators_map.get(responsible_id, {})
-                normalized_task["responsible_id"] = responsible_id
-                normalized_task["responsible_name"] = responsible_info.get("name", f"USER_{responsible_id}")
-            else:
-                normalized_task["responsible_id"] = None
-                normalized_task["responsible_name"] = ""
-            
-            # Resolver participantes (ACCOMPLICES ou MEMBERS da API)
-            accomplices_raw = (
-                normalize_task_field(task, "accomplices")
-                or normalize_task_field(task, "ACCOMPLICES")
-                or normalize_task_field(task, "members")
-                or normalize_task_field(task, "MEMBERS")
-                or []
+            created_date_raw = fields["created_date"] or ""
+            closed_date_raw = fields["closed_date"] or ""
+            responsible_id = fields["responsible_id"]
+            # Registro compacto (__slots__) com as mesmas chaves do dicionário usado antes
+            normalized_task = TaskRecord(
+                task_id=task_id_int,
+                title=str(fields["title"] or ""),
+                status=intern_text(str(fields["status"] or "")),
+                deadline=str(fields["deadline"] or ""),
+                activity_date=str(fields["activity_date"] or ""),
+                created_date=str(created_date_raw) if created_date_raw else "",
+                closed_date=str(closed_date_raw) if closed_date_raw else "",
+                time_spent_in_logs=time_spent_seconds,
+                time_estimate=estimate_seconds,
+                # Responsável e participantes (ACCOMPLICES ou MEMBERS da API)
+                responsible_id=int(responsible_id) if responsible_id else None,
+                accomplices_ids=normalize_accomplices(fields["accomplices"] or []),
+                scope_involved="",  # mantido para compatibilidade (coluna removida do Excel)
             )
-            accomplices_ids = normalize_accomplices(accomplices_raw)
-            normalized_task["accomplices_ids"] = accomplices_ids
-            normalized_task["accomplices_names"] = [
-                collaborators_map.get(acc_id, {}).get("name", f"USER_{acc_id}")
-                for acc_id in accomplices_ids
-            ]
-            normalized_task["scope_involved"] = ""  # mantido para compatibilidade (coluna removida do Excel)
-
-            # Coletar departamentos de todas as pessoas envolvidas
-            departments = set()
-            if normalized_task["responsible_id"]:
-                dept = collaborators_map.get(normalized_task["responsible_id"], {}).get("dept", "")
-                if dept:
-                    departments.add(dept)
-            for acc_id in accomplices_ids:
-                dept = collaborators_map.get(acc_id, {}).get("dept", "")
-                if dept:
-                    departments.add(dept)
-            normalized_task["departments"] = ", ".join(sorted(departments)) if departments else ""
             
-            enriched_tasks.append(normalized_task)
+            records[task_id] = normalized_task
+            if task_id in validated:
+                to_store.append((
+                    TASK_DETAIL_METHOD,
+                    {"taskId": task_id, "version": task_versions[task_id]},
+                    {field: normalized_task[field] for field in TASK_DETAIL_FIELDS},
+                ))
         
         except Exception as e:
             logger.error(f"Erro ao processar tarefa {task_id}: {e}")
             continue
     
+    if to_store:
+        detail_cache.put_many(client._cache_scope, to_store)
+    
+    enriched_tasks = []
+    for task_id in task_ids_list:
+        normalized_task = records.get(task_id)
+        if normalized_task is None:
+            continue
+        resolve_task_people(normalized_task, collaborators_map)
+        enriched_tasks.append(normalized_task)
+    
     logger.info(f"Tarefas enriquecidas: {len(enriched_tasks)}/{total}")
     return enriched_tasks
@@ -0,0 +1,122 @@
+"""Teste de gravação e reprodução (cassette) das chamadas ao Bitrix, sem acesso ao portal.
+
+Gera um portal sintético, serve-o pelo fake_bitrix_server.py e exporta um departamento em cinco etapas:
+1. sem cassette, aquecendo o cache de respostas do Bitrix (e o de detalhes das tarefas);
+2. gravando o cassette com esse mesmo cache já aquecido;
+3. reproduzindo o cassette com o servidor desligado e um cache vazio;
+4. reproduzindo com outra divisão em blocos (EXPORT_CHUNK_TASKS), ou seja, outros batches;
+5. reproduzindo outro departamento, que não foi gravado.
+As reproduções 3 e 4 precisam gerar exatamente as mesmas linhas da exportação original; a 5
+precisa falhar (CassetteMissError) em vez de gerar uma exportação parcial. Cada exportação
+roda em um processo separado, porque a configuração (modo do cassette, caches) é lida na importação.
+
+Uso:
+    python test_cassette_replay.py
+    python test_cassette_replay.py --tasks 2000 --dept COMERCIAL
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict, Optional
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _export_child(output: str, dept: str) -> None:
+    """Processo filho: exporta o departamento (linhas da exportação web) e grava contagem e hash."""
+    from bitrix_cassette import close_cassette_recorder
+    from bitrix_client import BitrixClient
+    from config import COLLABORATORS_SHEET_PATH
+    from excel_handler import read_collaborators_sheet
+    from task_processor import determine_scope_ids
+    from web_services import iter_export_rows
+
+    collaborators_map = read_collaborators_sheet(COLLABORATORS_SHEET_PATH)
+    scope_ids = determine_scope_ids(collaborators_map, dept=dept)
+    rows = [json.dumps(dict(row), sort_keys=True, default=str) for row in iter_export_rows(BitrixClient(), scope_ids, collaborators_map)]
+    close_cassette_recorder()
+    digest = hashlib.sha256("\n".join(rows).encode("utf-8")).hexdigest()
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"rows": len(rows), "sha256": digest}, f)
+
+
+def run_export(work_dir: str, name: str, dept: str, env: Dict[str, str]) -> Optional[Dict[str, object]]:
+    """Roda uma exportação em um processo filho; retorna {"rows", "sha256"} ou None se o processo falhar."""
+    output = os.path.join(work_dir, f"{name}.json")
+    child_env = dict(os.environ, BITRIX_DIRECTORY_ENABLED="0", EXPORT_PROFILE="0", **env)
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", output, "--dept", dept],
+        cwd=PROJECT_DIR, env=child_env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        print(f"  [{name}] falhou (código {proc.returncode}): {proc.stderr.strip().splitlines()[-1:]}")
+        return None
+    with open(output, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_cassette_replay(tasks: int, dept: str, other_dept: str) -> bool:
+    """Grava com o cache aquecido e reproduz com o cache vazio; retorna True se tudo sair como esperado."""
+    from fake_bitrix_server import FakeBitrixServer
+    from synthetic_portal import generate_portal
+
+    print("=" * 60)
+    print("TESTE DE GRAVACAO E REPRODUCAO (CASSETTE)")
+    print("=" * 60)
+    work_dir = tempfile.mkdtemp(prefix="cassette_replay_")
+    sheet = os.path.join(work_dir, "colaboradores.xlsx")
+    cassette = os.path.join(work_dir, "bitrix.jsonl.gz")
+    portal = generate_portal(users=max(20, tasks // 40), tasks=tasks, seed=7)
+    portal.write_collaborators_sheet(sheet)
+    base_env = {"COLABORADORES_PLANILHA": sheet, "BITRIX_CASSETTE": cassette}
+    warm_cache = {"BITRIX_RESPONSE_CACHE_PATH": os.path.join(work_dir, "warm.sqlite3")}
+
+    with FakeBitrixServer(portal) as server:
+        online = dict(base_env, BITRIX_WEBHOOK_BASE=server.webhook_base, **warm_cache)
+        original = run_export(work_dir, "original", dept, online)
+        recorded = run_export(work_dir, "gravacao", dept, dict(online, BITRIX_CASSETTE_MODE="record"))
+    replay = dict(
+        base_env, BITRIX_CASSETTE_MODE="replay", BITRIX_WEBHOOK_BASE="",
+        BITRIX_RESPONSE_CACHE_PATH=os.path.join(work_dir, "cold.sqlite3"),
+    )
+    replayed = run_export(work_dir, "reproducao", dept, replay)
+    rechunked = run_export(work_dir, "reproducao_blocos", dept, dict(replay, EXPORT_CHUNK_TASKS="37"))
+    missing = run_export(work_dir, "reproducao_nao_gravada", other_dept, replay)
+
+    print(f"Exportação original (aquece o cache): {original}")
+    print(f"Gravação com o cache aquecido:        {recorded}")
+    print(f"Reprodução com o cache vazio:         {replayed}")
+    print(f"Reprodução em blocos de 37 tarefas:   {rechunked}")
+    print(f"Reprodução de {other_dept} (não gravado):  {missing}")
+    ok = True
+    if not (original and original["rows"]) or not original == recorded == replayed == rechunked:
+        print("FALHA: a reprodução não gerou as mesmas linhas da exportação original")
+        ok = False
+    if missing is not None:
+        print("FALHA: a reprodução de requisições não gravadas não gerou erro")
+        ok = False
+    if ok:
+        print("OK")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de gravação e reprodução das chamadas ao Bitrix")
+    parser.add_argument("--tasks", type=int, default=600, help="Tarefas do portal sintético (padrão: 600)")
+    parser.add_argument("--dept", default="COMERCIAL", help="Departamento exportado (padrão: COMERCIAL)")
+    parser.add_argument("--other-dept", default="DTC", help="Departamento não gravado, cuja reprodução deve falhar (padrão: DTC)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _export_child(args.child, args.dept)
+        return
+    sys.exit(0 if test_cassette_replay(args.tasks, args.dept, args.other_dept) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -36,7 +36,7 @@ def test_export():
         
         output_path = "teste_mateus_export.xlsx"
         with open(output_path, "wb") as f:
-            f.write(excel_bytes.getvalue())
+            f.write(excel_bytes.read())
         
         print(f"[OK] Exportacao concluida!")
         print(f"   Linhas exportadas: {num_rows}")
@@ -64,7 +64,7 @@ def test_export():
         
         output_path = "teste_gi_export.xlsx"
         with open(output_path, "wb") as f:
-            f.write(excel_bytes.getvalue())
+            f.write(excel_bytes.read())
         
         print(f"[OK] Exportacao concluida!")
         print(f"   Linhas exportadas: {num_rows}")
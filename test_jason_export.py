@@ -71,7 +71,7 @@ def test_jason_export():
         # Salvar arquivo de teste
         output_path = "teste_jason_export.xlsx"
         with open(output_path, "wb") as f:
-            f.write(excel_bytes.getvalue())
+            f.write(excel_bytes.read())
         
         print(f"   Arquivo salvo em: {output_path}")
         
@@ -62,7 +62,7 @@ def test_mateus_export():
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"teste_mateus_export_{timestamp}.xlsx"
         with open(output_path, "wb") as f:
-            f.write(excel_bytes.getvalue())
+            f.write(excel_bytes.read())
         
         print(f"   Arquivo salvo em: {output_path}")
         
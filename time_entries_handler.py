@@ -3,7 +3,9 @@ import json
 import logging
 from typing import Any, Dict, List, Optional, Set
 from bitrix_client import BitrixClient
+from bitrix_cassette import CassetteMissError
 from config import BATCH_SIZE, USE_SINGLE_REQUEST_TIME_ENTRIES
+from records import TimeEntryRecord, intern_text
 
 logger = logging.getLogger(__name__)
 
@@ -75,6 +77,8 @@ def fetch_all_time_entries(client: BitrixClient, task_ids: Set[int]) -> Dict[int
             try:
                 entries = client.get_time_entries(task_id)
                 time_entries_map[task_id] = list(entries) if entries else []
+            except CassetteMissError:
+                raise
             except Exception as e:
                 logger.warning(f"get_time_entries falhou para tarefa {task_id}: {e}")
                 time_entries_map[task_id] = []
@@ -104,6 +108,8 @@ def fetch_all_time_entries(client: BitrixClient, task_ids: Set[int]) -> Dict[int
                         sample,
                     )
                     first_raw_response_logged = True
+        except CassetteMissError:
+            raise
         except Exception as e:
             logger.warning(f"Erro no batch de lançamentos de tempo: {e}")
             for task_id in batch_task_ids:
@@ -122,6 +128,8 @@ def fetch_all_time_entries(client: BitrixClient, task_ids: Set[int]) -> Dict[int
             try:
                 entries = client.get_time_entries(task_id)
                 time_entries_map[task_id] = list(entries) if entries else []
+            except CassetteMissError:
+                raise
             except Exception as e:
                 logger.debug(f"Fallback get_time_entries para tarefa {task_id}: {e}")
                 time_entries_map[task_id] = []
@@ -140,7 +148,7 @@ def fetch_all_time_entries(client: BitrixClient, task_ids: Set[int]) -> Dict[int
 def process_time_entries(
     entries: List[Dict[str, Any]], 
     collaborators_map: Dict[int, Dict[str, str]]
-) -> List[Dict[str, Any]]:
+) -> List[TimeEntryRecord]:
     """
     Processa e normaliza lançamentos de tempo.
     
@@ -149,7 +157,7 @@ def process_time_entries(
         collaborators_map: Mapeamento user_id -> {name, dept}
         
     Returns:
-        Lista de lançamentos processados, cada um com:
+        Lista de lançamentos processados (TimeEntryRecord, acessível como dicionário), cada um com:
         - user_id: ID do usuário
         - user_name: Nome do usuário (ou "USER_<id>" se não encontrado)
         - seconds: Tempo em segundos
@@ -214,15 +222,14 @@ def process_time_entries(
             user_id = None
             user_name = "Desconhecido"
         
-        processed_entry = {
-            "user_id": user_id,
-            "user_name": user_name,
-            "seconds": seconds,
-            "minutes": seconds / 60.0,
-            "hours": seconds / 3600.0,
-            "comment": str(comment),
-            "created_date": str(created_date) if created_date else ""
-        }
+        # Registro compacto: minutes/hours são calculados a partir de seconds na leitura
+        processed_entry = TimeEntryRecord(
+            user_id=user_id,
+            user_name=intern_text(user_name),
+            seconds=seconds,
+            comment=str(comment),
+            created_date=str(created_date) if created_date else "",
+        )
         
         processed.append(processed_entry)
     
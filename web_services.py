@@ -1,17 +1,27 @@
 """Serviços web para integração da lógica de exportação."""
 import logging
-import re
-from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime
-from io import BytesIO
+import tempfile
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple, BinaryIO, Iterator, Iterable
 
-from config import validate_config
+from config import (
+    validate_config, EXPORT_SPOOL_MAX_MB, EXPORT_CHUNK_TASKS, EXPORT_COLUMNAR_ROWS, EXPORT_FRAME_BATCH_TASKS
+)
 from bitrix_client import BitrixClient
-from excel_handler import read_collaborators_sheet, write_tasks_excel
-from task_processor import determine_scope_ids, collect_task_ids, enrich_tasks
+from bitrix_directory import get_bitrix_directory, fill_unseen_people
+from date_parsing import format_display_date
+from collaborators_registry import CollaboratorsSnapshot, get_collaborators_snapshot
+from export_cache import get_export_cache, build_cache_key, ttl_for_period
+from export_stats import annotate_export, export_stage, record_rows
+from export_writers import ExportWriter, get_export_writer
+from metrics import record_cache
+from records import ExportRow, intern_text
+from task_processor import determine_scope_ids, collect_task_versions, enrich_tasks
 from time_entries_handler import fetch_all_time_entries, process_time_entries, calculate_total_time
 from users_config import User
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 logger = logging.getLogger(__name__)
 
 
@@ -34,7 +44,7 @@ def format_data_conclusao(raw_status: Any, closed_date_str: Optional[str]) -> st
         return ""
     if str(raw_status).strip() != "5":
         return ""
-    return format_time_entry_date(closed_date_str or "")
+    return format_display_date(closed_date_str, "closed_date")
 
 
 def format_status(raw_status: Any) -> str:
@@ -48,29 +58,6 @@ def format_status(raw_status: Any) -> str:
     return STATUS_LABELS.get(key, key)
 
 
-def format_time_entry_date(date_str: str) -> str:
-    """Formata data do lançamento para exibição (ex: 28/04/2025 13:56)."""
-    if not date_str or not str(date_str).strip():
-        return ""
-    date_str = str(date_str).strip()
-    # ISO com timezone ou frações: usar prefixo até os segundos
-    head = date_str.replace("Z", "").split(".")[0]
-    m = re.match(r"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})", head)
-    if m:
-        date_str = m.group(1)
-    try:
-        # Bitrix pode retornar ISO (2025-04-28T13:56:00) ou "YYYY-MM-DD HH:MM:SS"
-        for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%d/%m/%Y %H:%M", "%d/%m/%Y"):
-            try:
-                dt = datetime.strptime(date_str.replace("Z", "").split(".")[0], fmt)
-                return dt.strftime("%d/%m/%Y %H:%M")
-            except ValueError:
-                continue
-    except Exception:
-        pass
-    return date_str
-
-
 def format_time(seconds: float) -> str:
     """Formata tempo em segundos para string legível (ex: "2h 30min")."""
     # Garantir que seconds seja um número (pode vir como string)
@@ -101,8 +88,13 @@ def combine_tasks_with_time_entries(
     enriched_tasks: List[Dict[str, Any]],
     time_entries_map: Dict[int, List[Dict[str, Any]]],
     collaborators_map: Dict[int, Dict[str, str]]
-) -> List[Dict[str, Any]]:
-    """Combina tarefas enriquecidas com lançamentos de tempo."""
+) -> List[ExportRow]:
+    """
+    Combina tarefas enriquecidas com lançamentos de tempo.
+
+    Cada linha é um ExportRow (acessível como dicionário): os valores da tarefa ficam numa tupla
+    compartilhada por todas as linhas dela, e só os campos do lançamento são próprios de cada linha.
+    """
     excel_rows = []
     
     for task in enriched_tasks:
@@ -118,59 +110,49 @@ def combine_tasks_with_time_entries(
             total_time = {"total_seconds": time_spent_seconds}
             logger.info(f"Tarefa {task_id}: Usando timeSpentInLogs ({time_spent_seconds}s) como fallback (webhook sem permissão para lançamentos individuais)")
         
-        # Garantir que todos os campos existam e sejam strings válidas
+        # Garantir que todos os campos existam e sejam strings válidas (ordem de TASK_COLUMNS)
         accomplices_names = task.get("accomplices_names") or []
-        participants_str = ", ".join(str(n) for n in accomplices_names) if accomplices_names else ""
-        base_row = {
-            "Task_ID": task.get("task_id", 0),
-            "Título": str(task.get("title", "")),
-            "Status": format_status(task.get("status", "")),
-            "Data de Conclusão": format_data_conclusao(task.get("status"), task.get("closed_date")),
-            "Deadline": str(task.get("deadline", "")) if task.get("deadline") else "",
-            "Criada_Em": format_time_entry_date(task.get("created_date", "") or ""),
-            "Responsável": str(task.get("responsible_name", "")),
-            "Participantes": participants_str,
-            "Tempo_Estimado": format_time(task.get("time_estimate") or 0),
-            "Tempo_Total_Gasto": format_time(total_time.get("total_seconds", 0)),
-            "Departamentos_Selecionados": str(task.get("departments", "")),
-            "Atividade_em": str(task.get("activity_date", "")) if task.get("activity_date") else ""
-        }
+        participants_str = intern_text(", ".join(str(n) for n in accomplices_names)) if accomplices_names else ""
+        task_values = (
+            task.get("task_id", 0),
+            str(task.get("title", "")),
+            format_status(task.get("status", "")),
+            format_data_conclusao(task.get("status"), task.get("closed_date")),
+            str(task.get("deadline", "")) if task.get("deadline") else "",
+            format_display_date(task.get("created_date"), "created_date"),
+            str(task.get("responsible_name", "")),
+            participants_str,
+            intern_text(format_time(task.get("time_estimate") or 0)),
+            intern_text(format_time(total_time.get("total_seconds", 0))),
+            str(task.get("departments", "")),
+            str(task.get("activity_date", "")) if task.get("activity_date") else "",
+        )
         
         if processed_entries:
             # Quem_Lançou vem estritamente do USER_ID do item de tempo (API); só exibir quem tem tempo > 0
             entries_with_time = [e for e in processed_entries if (e.get("seconds") or 0) > 0]
             if entries_with_time:
                 for entry in entries_with_time:
-                    row = base_row.copy()
-                    row["Tempo_Lançamento"] = format_time(entry["seconds"])
-                    row["Quem_Lançou"] = entry["user_name"]
-                    row["Data do lançamento"] = format_time_entry_date(entry.get("created_date", "") or "")
-                    row["Comentário_Lançamento"] = entry["comment"]
-                    excel_rows.append(row)
+                    excel_rows.append(ExportRow(task_values, (
+                        intern_text(format_time(entry["seconds"])),
+                        entry["user_name"],
+                        format_display_date(entry.get("created_date"), "entry_date"),
+                        entry["comment"],
+                    )))
             else:
                 # Todos os lançamentos tinham 0 segundos - não atribuir a ninguém
-                row = base_row.copy()
-                row["Tempo_Lançamento"] = ""
-                row["Quem_Lançou"] = ""
-                row["Data do lançamento"] = ""
-                row["Comentário_Lançamento"] = ""
-                excel_rows.append(row)
+                excel_rows.append(ExportRow(task_values))
         elif task.get("time_spent_in_logs"):
             # Não temos lançamentos individuais, mas temos tempo total - criar uma linha com o total
-            row = base_row.copy()
-            row["Tempo_Lançamento"] = format_time(task.get("time_spent_in_logs", 0))
-            row["Quem_Lançou"] = "Tempo total (detalhes não disponíveis)"
-            row["Data do lançamento"] = ""
-            row["Comentário_Lançamento"] = "Webhook sem permissão para lançamentos individuais. Mostrando tempo total da tarefa."
-            excel_rows.append(row)
+            excel_rows.append(ExportRow(task_values, (
+                intern_text(format_time(task.get("time_spent_in_logs", 0))),
+                "Tempo total (detalhes não disponíveis)",
+                "",
+                "Webhook sem permissão para lançamentos individuais. Mostrando tempo total da tarefa.",
+            )))
         else:
             # Sem lançamentos e sem tempo total
-            row = base_row.copy()
-            row["Tempo_Lançamento"] = ""
-            row["Quem_Lançou"] = ""
-            row["Data do lançamento"] = ""
-            row["Comentário_Lançamento"] = ""
-            excel_rows.append(row)
+            excel_rows.append(ExportRow(task_values))
     
     return excel_rows
 
@@ -194,7 +176,8 @@ def filter_departments_by_user_access(
         return departments
     if user.allowed_departments is None:
         return []
-    return [d for d in departments if d.upper() in [ad.upper() for ad in user.allowed_departments]]
+    allowed_upper = {ad.upper() for ad in user.allowed_departments}
+    return [d for d in departments if d.upper() in allowed_upper]
 
 
 def filter_collaborator_names_by_user_access(
@@ -206,7 +189,7 @@ def filter_collaborator_names_by_user_access(
         return sorted({info["name"] for info in collaborators_map.values() if info.get("name")})
     if user.allowed_departments is None:
         return []
-    allowed_upper = [d.upper() for d in user.allowed_departments]
+    allowed_upper = {d.upper() for d in user.allowed_departments}
     names = {
         info["name"] for info in collaborators_map.values()
         if info.get("name") and (info.get("dept") or "").strip().upper() in allowed_upper
@@ -214,121 +197,480 @@ def filter_collaborator_names_by_user_access(
     return sorted(names)
 
 
-def export_tasks_to_excel_bytes(
+def collaborator_names_for_user(snapshot: CollaboratorsSnapshot, user: User) -> List[str]:
+    """Mesmo resultado de filter_collaborator_names_by_user_access, usando os índices pré-calculados do snapshot."""
+    if user.role == "admin":
+        return snapshot.names
+    if user.allowed_departments is None:
+        return []
+    return snapshot.names_for_departments(user.allowed_departments)
+
+
+def search_collaborator_names_for_user(
+    snapshot: CollaboratorsSnapshot,
+    user: User,
+    query: str,
+    limit: int = 20
+) -> List[str]:
+    """Nomes para autocompletar (ver CollaboratorsIndex.search_names), restritos ao acesso do usuário."""
+    if user.role == "admin":
+        return snapshot.index.search_names(query, limit)
+    if user.allowed_departments is None:
+        return []
+    return snapshot.index.search_names(query, limit, departments=user.allowed_departments)
+
+
+def _check_export_request(user: User, dept: Optional[str]) -> None:
+    """Valida configuração e acesso do usuário ao departamento antes de qualquer exportação."""
+    validate_config()
+    if dept:
+        if not user.has_access_to_department(dept):
+            raise ValueError(f"Usuário não tem acesso ao departamento {dept}")
+
+
+def _lookup_export_cache(
+    user: User,
+    dept: Optional[str],
+    user_substring: Optional[str],
+    activity_from: Optional[str],
+    activity_to: Optional[str],
+    status: Optional[str],
+    collaborators_file: str,
+    export_format: str,
+    use_cache: bool
+) -> Tuple[Optional[str], Optional[Tuple[str, Dict[str, Any]]]]:
+    """
+    Calcula a chave do cache de exportações e busca uma entrada válida.
+    
+    Returns:
+        Tuple (chave ou None se o cache estiver desligado, (stream aberto, metadados) ou None)
+    """
+    cache = get_export_cache()
+    if cache is None:
+        return None, None
+    cache_key = build_cache_key(
+        user,
+        dept=dept,
+        user_substring=user_substring,
+        activity_from=activity_from,
+        activity_to=activity_to,
+        status=status,
+        collaborators_file=collaborators_file,
+        export_format=export_format
+    )
+    if not use_cache:
+        logger.info("Cache de exportações ignorado nesta solicitação")
+        annotate_export(cache="bypass")
+        record_cache("export", "bypass")
+        return cache_key, None
+    cached = cache.get(cache_key)
+    annotate_export(cache="hit" if cached else "miss")
+    record_cache("export", "hit" if cached else "miss")
+    if cached:
+        logger.info(f"Exportação servida do cache ({cached[1].get('rows', 0)} linhas, formato {export_format})")
+    return cache_key, cached
+
+
+def _store_in_export_cache(cache_key: Optional[str], output: BinaryIO, num_rows: int, activity_to: Optional[str]) -> None:
+    """Grava o resultado no cache (se habilitado) e devolve o stream posicionado no início."""
+    cache = get_export_cache()
+    if cache_key is None or cache is None:
+        return
+    output.seek(0)
+    try:
+        cache.put(cache_key, output, num_rows, ttl_for_period(activity_to))
+    except OSError as e:
+        logger.warning(f"Não foi possível gravar a exportação no cache: {e}")
+    output.seek(0)
+
+
+def _resolve_export_scope(
+    user: User,
+    dept: Optional[str],
+    user_substring: Optional[str],
+    collaborators_file: str,
+    use_cache: bool = True
+) -> Tuple[BitrixClient, Dict[int, Dict[str, str]], List[int]]:
+    """
+    Inicializa o cliente, lê a planilha e determina os IDs do escopo (respeitando o acesso do supervisor).
+    
+    Args:
+        use_cache: Com False ("Ignorar cache"), o cliente também ignora o cache de respostas do Bitrix
+    
+    Returns:
+        Tuple (cliente, mapa de colaboradores, IDs do escopo)
+    """
+    # Inicializar cliente
+    client = BitrixClient(use_response_cache=use_cache)
+    
+    # Planilha de colaboradores (registro em memória, recarregado só quando o arquivo muda)
+    snapshot = get_collaborators_snapshot(collaborators_file)
+    collaborators_map = snapshot.collaborators_map
+    
+    # Determinar escopo de IDs
+    scope_ids = determine_scope_ids(
+        collaborators_map,
+        dept=dept,
+        user_substring=user_substring,
+        index=snapshot.index
+    )
+    # Supervisores: restringir ao departamento permitido (evita ver outros mesmo escolhendo por nome)
+    if user.role != "admin" and user.allowed_departments and scope_ids:
+        allowed_ids = snapshot.index.department_ids(user.allowed_departments)
+        scope_ids = [uid for uid in scope_ids if uid in allowed_ids]
+        logger.info(f"Escopo filtrado por acesso do supervisor: {len(scope_ids)} colaborador(es)")
+    
+    logger.info(f"Escopo determinado: {len(scope_ids)} colaborador(es)")
+    if scope_ids:
+        logger.info(f"IDs do escopo: {list(scope_ids)[:10]}...")  # Mostrar primeiros 10
+    
+    return client, collaborators_map, scope_ids
+
+
+def _iter_export_chunks(
+    client: BitrixClient,
+    scope_ids: List[int],
+    collaborators_map: Dict[int, Dict[str, str]],
+    activity_from: Optional[str] = None,
+    activity_to: Optional[str] = None,
+    status: Optional[str] = None,
+    chunk_size: int = EXPORT_CHUNK_TASKS
+) -> Iterator[Tuple[List[Dict[str, Any]], Dict[int, List[Dict[str, Any]]], Dict[int, Dict[str, str]]]]:
+    """
+    Coleta os IDs de tarefas, ordena por Task_ID descendente e processa em blocos de chunk_size
+    tarefas (enriquecimento + lançamentos de tempo).
+    
+    Com o diretório do Bitrix habilitado (BITRIX_DIRECTORY_ENABLED), os nomes vêm da planilha
+    completada pelo diretório, e pessoas ainda desconhecidas de cada bloco são resolvidas em
+    uma chamada batch (em vez de "USER_<id>"). O escopo continua sendo definido só pela planilha.
+    
+    Yields:
+        Tuple (tarefas enriquecidas, {task_id: lançamentos}, mapeamento para resolver nomes)
+    """
+    if not scope_ids:
+        logger.warning("Nenhum colaborador encontrado no escopo. Retornando exportação vazia.")
+        return
+    
+    # Coletar IDs de tarefas
+    logger.info(f"Coletando tarefas com filtros: from={activity_from}, to={activity_to}, status={status}")
+    with export_stage("collect"):
+        task_versions = collect_task_versions(
+            client,
+            scope_ids,
+            activity_from=activity_from,
+            activity_to=activity_to,
+            status=status
+        )
+    
+    logger.info(f"Tarefas encontradas: {len(task_versions)} IDs únicos")
+    if task_versions:
+        logger.info(f"Exemplos de IDs de tarefas: {list(task_versions)[:10]}...")
+    
+    if not task_versions:
+        logger.warning("Nenhuma tarefa encontrada com os filtros fornecidos.")
+        return
+    
+    directory = get_bitrix_directory()
+    lookup_map = collaborators_map
+    if directory is not None:
+        with export_stage("directory"):
+            lookup_map = dict(directory.merged_map(client, collaborators_map))
+    
+    ordered_ids = sorted(task_versions, reverse=True)
+    enriched_count = 0
+    for i in range(0, len(ordered_ids), chunk_size):
+        chunk_ids = ordered_ids[i:i + chunk_size]
+        
+        # Enriquecer tarefas
+        logger.info(f"Enriquecendo tarefas {i + 1}-{i + len(chunk_ids)} de {len(ordered_ids)}...")
+        with export_stage("enrich"):
+            enriched_tasks = enrich_tasks(client, chunk_ids, scope_ids, lookup_map, task_versions=task_versions)
+        enriched_count += len(enriched_tasks)
+        if not enriched_tasks:
+            continue
+        
+        # Buscar lançamentos de tempo
+        with export_stage("time_entries"):
+            time_entries_map = fetch_all_time_entries(client, [t["task_id"] for t in enriched_tasks])
+        
+        if directory is not None:
+            with export_stage("directory"):
+                fill_unseen_people(directory, client, enriched_tasks, time_entries_map, lookup_map)
+        
+        yield enriched_tasks, time_entries_map, lookup_map
+    
+    logger.info(f"Tarefas enriquecidas: {enriched_count}")
+    if not enriched_count:
+        logger.error(f"CRÍTICO: {len(task_versions)} tarefas encontradas mas 0 foram enriquecidas!")
+        logger.error("Isso pode indicar um problema no método _batch ou no parsing das respostas.")
+
+
+def iter_export_rows(
+    client: BitrixClient,
+    scope_ids: List[int],
+    collaborators_map: Dict[int, Dict[str, str]],
+    activity_from: Optional[str] = None,
+    activity_to: Optional[str] = None,
+    status: Optional[str] = None,
+    chunk_size: int = EXPORT_CHUNK_TASKS
+) -> Iterator[Dict[str, Any]]:
+    """
+    Gera as linhas da exportação à medida que são produzidas.
+    
+    As tarefas são processadas em blocos de chunk_size (ver _iter_export_chunks), já na ordem
+    de Task_ID descendente, de modo que as linhas saem na ordem final sem precisar de todas
+    em memória.
+    
+    Yields:
+        Dicionários com as colunas de EXCEL_EXPORT_COLUMNS
+    """
+    rows_count = 0
+    for enriched_tasks, time_entries_map, lookup_map in _iter_export_chunks(
+        client, scope_ids, collaborators_map, activity_from, activity_to, status, chunk_size
+    ):
+        # Combinar tarefas com lançamentos de tempo
+        with export_stage("rows"):
+            rows = combine_tasks_with_time_entries(enriched_tasks, time_entries_map, lookup_map)
+        rows_count += len(rows)
+        yield from rows
+    
+    logger.info(f"Total de linhas geradas para exportação: {rows_count}")
+
+
+def iter_export_frame_rows(
+    client: BitrixClient,
+    scope_ids: List[int],
+    collaborators_map: Dict[int, Dict[str, str]],
+    activity_from: Optional[str] = None,
+    activity_to: Optional[str] = None,
+    status: Optional[str] = None,
+    chunk_size: int = EXPORT_CHUNK_TASKS,
+    batch_tasks: int = EXPORT_FRAME_BATCH_TASKS
+) -> Iterator[Tuple[Any, ...]]:
+    """
+    Mesmas linhas de iter_export_rows, montadas por coluna em DataFrames (export_frame).
+    
+    Os blocos de tarefas são acumulados até batch_tasks tarefas antes de cada montagem, pois
+    a montagem por coluna só compensa com alguns milhares de linhas de cada vez. Cada lote é
+    emitido como tuplas e descartado antes do próximo: nunca há mais de um lote em memória.
+    
+    Yields:
+        Tuplas na ordem de EXCEL_EXPORT_COLUMNS (aceitas por write_tasks_excel_streaming)
+    """
+    # Import local: export_frame usa as funções de formatação deste módulo
+    from export_frame import combine_tasks_frame
+    
+    rows_count = 0
+    batches = 0
+    pending_tasks: List[Dict[str, Any]] = []
+    pending_entries: Dict[int, List[Dict[str, Any]]] = {}
+    lookup_map = collaborators_map
+    for enriched_tasks, time_entries_map, lookup_map in _iter_export_chunks(
+        client, scope_ids, collaborators_map, activity_from, activity_to, status, chunk_size
+    ):
+        pending_tasks.extend(enriched_tasks)
+        pending_entries.update(time_entries_map)
+        if len(pending_tasks) >= batch_tasks:
+            with export_stage("rows"):
+                frame = combine_tasks_frame(pending_tasks, pending_entries, lookup_map)
+            pending_tasks, pending_entries = [], {}
+            rows_count += len(frame)
+            batches += 1
+            yield from frame.itertuples(index=False, name=None)
+            del frame
+    if pending_tasks:
+        with export_stage("rows"):
+            frame = combine_tasks_frame(pending_tasks, pending_entries, lookup_map)
+        rows_count += len(frame)
+        batches += 1
+        yield from frame.itertuples(index=False, name=None)
+    logger.info(f"Total de linhas geradas para exportação: {rows_count} ({batches} lote(s) por coluna)")
+
+
+def export_tasks_to_file(
     user: User,
     dept: Optional[str] = None,
     user_substring: Optional[str] = None,
     activity_from: Optional[str] = None,
     activity_to: Optional[str] = None,
     status: Optional[str] = None,
-    collaborators_file: str = "Planilha de colaboradores.xlsx"
-) -> Tuple[BytesIO, int]:
+    collaborators_file: str = "Planilha de colaboradores.xlsx",
+    export_format: str = "xlsx",
+    use_cache: bool = True
+) -> Tuple[BinaryIO, int]:
     """
-    Exporta tarefas para Excel e retorna como BytesIO.
+    Exporta tarefas no formato pedido e retorna um stream binário posicionado no início.
+    
+    O arquivo é gerado em um SpooledTemporaryFile: fica em memória até EXPORT_SPOOL_MAX_MB
+    e passa para um arquivo temporário anônimo acima disso. Exportações repetidas com os
+    mesmos filtros (e o mesmo escopo de acesso) são servidas do cache em disco enquanto
+    válidas. Com use_cache=False o cache é ignorado na leitura, mas o resultado novo
+    substitui a entrada anterior.
+    
+    O chamador é responsável por fechar o stream (ver iter_file_chunks).
     
     Returns:
-        Tuple (BytesIO do Excel, número de linhas exportadas)
+        Tuple (stream do arquivo, número de linhas exportadas)
     """
     try:
-        # Validar configuração
-        validate_config()
-        
-        # Inicializar cliente
-        client = BitrixClient()
-        
-        # Ler planilha de colaboradores
-        collaborators_map = read_collaborators_sheet(collaborators_file)
-        
-        # Verificar acesso do usuário ao departamento
-        if dept:
-            if not user.has_access_to_department(dept):
-                raise ValueError(f"Usuário não tem acesso ao departamento {dept}")
+        writer = get_export_writer(export_format)
+        _check_export_request(user, dept)
         
-        # Determinar escopo de IDs
-        scope_ids = determine_scope_ids(
-            collaborators_map,
-            dept=dept,
-            user_substring=user_substring
+        cache_key, cached = _lookup_export_cache(
+            user, dept, user_substring, activity_from, activity_to, status,
+            collaborators_file, writer.name, use_cache
         )
-        # Supervisores: restringir ao departamento permitido (evita ver outros mesmo escolhendo por nome)
-        if user.role != "admin" and user.allowed_departments and scope_ids:
-            allowed_upper = [d.upper() for d in user.allowed_departments]
-            scope_ids = [
-                uid for uid in scope_ids
-                if ((collaborators_map.get(uid) or {}).get("dept") or "").strip().upper() in allowed_upper
-            ]
-            logger.info(f"Escopo filtrado por acesso do supervisor: {len(scope_ids)} colaborador(es)")
+        if cached:
+            cached_file, meta = cached
+            record_rows(int(meta.get("rows", 0)))
+            return cached_file, int(meta.get("rows", 0))
         
-        logger.info(f"Escopo determinado: {len(scope_ids)} colaborador(es)")
-        if scope_ids:
-            logger.info(f"IDs do escopo: {list(scope_ids)[:10]}...")  # Mostrar primeiros 10
-        
-        if not scope_ids:
-            logger.warning("Nenhum colaborador encontrado no escopo. Retornando Excel vazio.")
-            excel_rows = []
+        with export_stage("scope"):
+            client, collaborators_map, scope_ids = _resolve_export_scope(user, dept, user_substring, collaborators_file, use_cache)
+        if writer.accepts_tuples and EXPORT_COLUMNAR_ROWS:
+            rows = iter_export_frame_rows(client, scope_ids, collaborators_map, activity_from, activity_to, status)
         else:
-            # Coletar IDs de tarefas
-            logger.info(f"Coletando tarefas com filtros: from={activity_from}, to={activity_to}, status={status}")
-            task_ids = collect_task_ids(
-                client,
-                scope_ids,
-                activity_from=activity_from,
-                activity_to=activity_to,
-                status=status
-            )
-            
-            logger.info(f"Tarefas encontradas: {len(task_ids)} IDs únicos")
-            if task_ids:
-                logger.info(f"Exemplos de IDs de tarefas: {list(task_ids)[:10]}...")
-            
-            if not task_ids:
-                logger.warning("Nenhuma tarefa encontrada com os filtros fornecidos.")
-                excel_rows = []
-            else:
-                # Enriquecer tarefas
-                logger.info("Enriquecendo tarefas com detalhes...")
-                enriched_tasks = enrich_tasks(client, task_ids, scope_ids, collaborators_map)
-                logger.info(f"Tarefas enriquecidas: {len(enriched_tasks)}")
-                
-                if not enriched_tasks:
-                    logger.error(f"CRÍTICO: {len(task_ids)} tarefas encontradas mas 0 foram enriquecidas!")
-                    logger.error("Isso pode indicar um problema no método _batch ou no parsing das respostas.")
-                    excel_rows = []
-                else:
-                    # Buscar lançamentos de tempo
-                    logger.info("Buscando lançamentos de tempo...")
-                    time_entries_map = fetch_all_time_entries(client, task_ids)
-                    logger.info(f"Lançamentos encontrados para {len(time_entries_map)} tarefas")
-                    
-                    # Combinar tarefas com lançamentos de tempo
-                    logger.info("Combinando tarefas com lançamentos de tempo...")
-                    excel_rows = combine_tasks_with_time_entries(
-                        enriched_tasks,
-                        time_entries_map,
-                        collaborators_map
-                    )
-                    logger.info(f"Total de linhas geradas para Excel: {len(excel_rows)}")
-        
-        # Gerar Excel em memória
-        output = BytesIO()
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        temp_filename = f"temp_export_{timestamp}.xlsx"
-        
-        # Escrever Excel
-        write_tasks_excel(excel_rows, temp_filename)
-        
-        # Ler arquivo temporário e copiar para BytesIO
-        with open(temp_filename, "rb") as f:
-            output.write(f.read())
-        
-        # Limpar arquivo temporário
-        import os
-        if os.path.exists(temp_filename):
-            os.remove(temp_filename)
+            rows = iter_export_rows(client, scope_ids, collaborators_map, activity_from, activity_to, status)
+        # Gerador repassado direto ao writer (XLSX em streaming, Parquet em row groups): sem lista
+        counter = {"rows": 0}
+        rows = _count_rows(rows, counter)
         
+        # Gerar arquivo em buffer (memória até o limite, depois arquivo temporário anônimo)
+        output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_MB * 1024 * 1024)
+        with export_stage("write"):
+            writer.write(rows, output)
         output.seek(0)
-        return output, len(excel_rows)
+        num_rows = counter["rows"]
+        record_rows(num_rows)
+        
+        with export_stage("cache_store"):
+            _store_in_export_cache(cache_key, output, num_rows, activity_to)
+        return output, num_rows
         
     except Exception as e:
         logger.error(f"Erro durante exportação: {e}", exc_info=True)
         raise
+
+
+def export_tasks_to_excel_bytes(
+    user: User,
+    dept: Optional[str] = None,
+    user_substring: Optional[str] = None,
+    activity_from: Optional[str] = None,
+    activity_to: Optional[str] = None,
+    status: Optional[str] = None,
+    collaborators_file: str = "Planilha de colaboradores.xlsx",
+    use_cache: bool = True
+) -> Tuple[BinaryIO, int]:
+    """
+    Exporta tarefas para Excel (atalho de export_tasks_to_file com export_format="xlsx").
+    
+    Returns:
+        Tuple (stream do Excel, número de linhas exportadas)
+    """
+    return export_tasks_to_file(
+        user,
+        dept=dept,
+        user_substring=user_substring,
+        activity_from=activity_from,
+        activity_to=activity_to,
+        status=status,
+        collaborators_file=collaborators_file,
+        export_format="xlsx",
+        use_cache=use_cache
+    )
+
+
+def export_tasks_streaming(
+    user: User,
+    dept: Optional[str] = None,
+    user_substring: Optional[str] = None,
+    activity_from: Optional[str] = None,
+    activity_to: Optional[str] = None,
+    status: Optional[str] = None,
+    collaborators_file: str = "Planilha de colaboradores.xlsx",
+    export_format: str = "csv",
+    use_cache: bool = True
+) -> Iterator[bytes]:
+    """
+    Exporta tarefas em um formato com streaming (CSV, NDJSON), gerando bytes à medida que
+    as linhas são produzidas.
+    
+    Validação de acesso, cache e escopo são resolvidos antes de retornar (erros aparecem
+    antes de a resposta HTTP começar); a coleta no Bitrix24 acontece durante a iteração.
+    O conteúdo também é gravado no cache quando a iteração termina por completo.
+    
+    Returns:
+        Iterador de blocos de bytes
+        
+    Raises:
+        ValueError: Formato sem suporte a streaming, ou usuário sem acesso ao departamento
+    """
+    writer = get_export_writer(export_format)
+    if not writer.streaming:
+        raise ValueError(f"Formato {writer.name} não suporta streaming; use export_tasks_to_file")
+    _check_export_request(user, dept)
+    
+    cache_key, cached = _lookup_export_cache(
+        user, dept, user_substring, activity_from, activity_to, status,
+        collaborators_file, writer.name, use_cache
+    )
+    if cached:
+        record_rows(int(cached[1].get("rows", 0)))
+        return iter_file_chunks(cached[0])
+    
+    with export_stage("scope"):
+        client, collaborators_map, scope_ids = _resolve_export_scope(user, dept, user_substring, collaborators_file, use_cache)
+    rows = iter_export_rows(client, scope_ids, collaborators_map, activity_from, activity_to, status)
+    return _stream_rows(writer, rows, cache_key, activity_to)
+
+
+def _count_rows(rows: Iterable[Any], counter: Dict[str, int]) -> Iterator[Any]:
+    """Repassa as linhas sem materializá-las, contando-as em counter["rows"]."""
+    for row in rows:
+        counter["rows"] += 1
+        yield row
+
+
+def _stream_rows(
+    writer: ExportWriter,
+    rows: Iterator[Dict[str, Any]],
+    cache_key: Optional[str],
+    activity_to: Optional[str]
+) -> Iterator[bytes]:
+    """Emite os bytes do writer e, se a exportação terminar por completo, grava uma cópia no cache."""
+    counter = {"rows": 0}
+    
+    def _counted() -> Iterator[Dict[str, Any]]:
+        yield from _count_rows(rows, counter)
+        record_rows(counter["rows"])
+    
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_MB * 1024 * 1024) if cache_key else None
+    completed = False
+    try:
+        for chunk in writer.iter_bytes(_counted()):
+            if spool is not None:
+                spool.write(chunk)
+            yield chunk
+        completed = True
+        logger.info(f"Exportação em streaming concluída ({writer.name}, {counter['rows']} linhas)")
+    except Exception as e:
+        logger.error(f"Erro durante exportação em streaming: {e}", exc_info=True)
+        raise
+    finally:
+        if spool is not None:
+            if completed:
+                _store_in_export_cache(cache_key, spool, counter["rows"], activity_to)
+            spool.close()
+
+
+def iter_file_chunks(stream: BinaryIO, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Lê o stream em blocos (para StreamingResponse) e o fecha ao final."""
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        stream.close()